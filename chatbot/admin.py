@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatSession, ChatMessage, BuyerCompany, PolicyViolation
+from .models import ChatSession, ChatMessage, BuyerCompany, PolicyViolation, TranslationMemory, LLMUsage, CaseTypeExample
 
 @admin.register(ChatSession)
 class ChatSessionAdmin(admin.ModelAdmin):
@@ -22,3 +22,20 @@ class BuyerCompanyAdmin(admin.ModelAdmin):
 class PolicyViolationAdmin(admin.ModelAdmin):
     list_display = ('id', 'session', 'buyer_company')
     search_fields = ('buyer_company', 'violation_text')
+
+@admin.register(TranslationMemory)
+class TranslationMemoryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'language', 'source_text', 'updated_at')
+    list_filter = ('language',)
+    search_fields = ('source_text', 'translation')
+
+@admin.register(LLMUsage)
+class LLMUsageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'session', 'call_site', 'model', 'prompt_tokens', 'completion_tokens', 'latency_ms', 'created_at')
+    list_filter = ('call_site', 'case_type', 'conversation_state')
+
+@admin.register(CaseTypeExample)
+class CaseTypeExampleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'case_type', 'text', 'created_at')
+    list_filter = ('case_type',)
+    search_fields = ('text',)
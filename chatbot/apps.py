@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ChatbotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chatbot"
+
+    def ready(self):
+        # Keep the dashboard counters in step with session, buyer and violation writes
+        from . import signals  # noqa: F401
+
+        # Warn when the conversation history cache is not shared with external report workers
+        from . import checks  # noqa: F401
+
+        # Count and time every database query for the request metrics
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_timer
+        connection_created.connect(install_query_timer, dispatch_uid="chatbot_query_timer")
@@ -0,0 +1,361 @@
+"""Async implementation of the chat turn pipeline.
+
+AsyncChatViewManager handles the same conversation states as
+ChatViewManager, but every LLM request is awaited on the shared async client
+and database access goes through Django's async ORM (acreate, aget, asave).
+Under an ASGI server a single worker process can therefore keep hundreds of
+conversations in flight while they wait on OpenRouter, without a thread per
+request. Select it with CHAT_VIEW_MODE=async.
+
+The remaining synchronous pieces (loading the Django session, vector search
+and the embedding classifier) run through sync_to_async.
+"""
+import asyncio
+import copy
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .history_cache import get_history_cache
+from .llm_scheduler import LLMUnavailable
+from .llm_usage import usage_scope
+from .report_jobs import get_report_queue
+from .responses import BOT_RESPONSES
+from .session_manager import SessionManager
+from .translation_memory import get_translation_memory
+from .views import BaseViewManager
+
+
+class AsyncChatViewManager(BaseViewManager):
+    """Async manager for chat-related views and handlers"""
+
+    def __init__(self):
+        super().__init__()
+        self.session_manager = SessionManager()
+        self.history_cache = get_history_cache()
+        self.report_queue = get_report_queue()
+
+    @method_decorator(csrf_exempt)
+    @method_decorator(require_POST)
+    async def chat_message(self, request):
+        """Handle incoming chat messages"""
+        data = json.loads(request.body)
+        user_message = data.get('message', '')
+        new_session = data.get('new_session', False)
+
+        # Loads the Django session as well, so later request.session access needs no query
+        session_state = await sync_to_async(lambda: copy.deepcopy(dict(request.session.items())))()
+        turn = {'session_state': session_state, 'message': None}
+        session = await sync_to_async(self.session_manager.get_or_create_session)(
+            request, user_message, force_new=new_session
+        )
+        if not session:
+            return JsonResponse({
+                'error': 'Failed to create or retrieve session. Please try again.'
+            }, status=500)
+
+        if user_message:
+            turn['message'] = await self.history_cache.aappend(session, 'user', user_message)
+
+        return await self.route_turn(request, session, user_message, new_session, turn)
+
+    async def route_turn(self, request, session, user_message, new_session, turn):
+        """Route a turn to the handler of the current conversation state"""
+        # LLM usage of the turn is accounted to this session and its state at each call
+        with usage_scope(request.session):
+            try:
+                response = await self.handle_turn(request, session, user_message, new_session)
+            except LLMUnavailable as e:
+                await self.discard_turn(request, session, turn)
+                return await self.llm_unavailable(session, e)
+        # Older messages are summarised once the turn is answered, so it never waits for the summary
+        self.utils_manager.start_history_summary(session, await self.history_cache.aget(session))
+        return response
+
+    async def discard_turn(self, request, session, turn):
+        """Undo a turn the LLM could not answer; see ChatViewManager.discard_turn"""
+        if session.id != turn['session_state'].get('chat_session_id'):
+            await self.history_cache.ainvalidate(session.id)
+            await session.adelete()
+        elif turn['message'] is not None:
+            await self.history_cache.adiscard_from(turn['message'])
+        request.session.clear()
+        request.session.update(turn['session_state'])
+        await sync_to_async(request.session.save)()
+
+    async def handle_turn(self, request, session, user_message, new_session):
+        """Call the handler of the current conversation state"""
+        if new_session or request.session.get('conversation_state') == 'language_detection':
+            return await self.handle_language_detection(request, session, user_message)
+
+        conversation_state = request.session.get('conversation_state', 'language_detection')
+
+        if conversation_state == 'location_detection':
+            return await self.handle_location_detection(request, session, user_message)
+        elif conversation_state == 'gender_nationality_detection':
+            return await self.handle_gender_nationality_detection(request, session, user_message)
+        elif conversation_state == 'case_description':
+            return await self.handle_case_description(request, session, user_message)
+        elif conversation_state == 'case_handling':
+            return await self.handle_case_conversation(request, session, user_message)
+        else:
+            return await self.handle_fallback(session, user_message)
+
+    async def llm_unavailable(self, session, error):
+        """Ask the user to send the message again when the LLM could not answer in time"""
+        bot_response = BOT_RESPONSES['LLM_BUSY']
+        if self.needs_translation(session):
+            # Only a stored translation will do: translating needs the LLM that just failed
+            bot_response = await get_translation_memory().alookup(bot_response, session.language) or bot_response
+        response = JsonResponse({'message': bot_response, 'retry': True}, status=503)
+        response['Retry-After'] = str(math.ceil(error.retry_after or settings.LLM_RETRY_MAX_DELAY))
+        return response
+
+    def needs_translation(self, session):
+        return bool(session.language and session.language.lower() != 'english')
+
+    async def to_english(self, session, user_message):
+        """The user message in English"""
+        if self.needs_translation(session):
+            return await self.utils_manager.atranslate_to_English(user_message)
+        return user_message
+
+    async def reply(self, session, bot_response, use_memory=True, **extra):
+        """Translate a bot response if needed, save it and return it as JSON"""
+        if self.needs_translation(session):
+            bot_response = await self.utils_manager.atranslation_from_English(
+                bot_response, session.language, use_memory=use_memory
+            )
+        await self.history_cache.aappend(session, 'assistant', bot_response)
+        return JsonResponse({'message': bot_response, **extra})
+
+    def reply_language(self, request, session):
+        """The language to generate replies in directly, or None to generate in English and translate"""
+        if request.session.get('reply_language_mode') == 'translate':
+            return None
+        return self.utils_manager.native_reply_language(session.language)
+
+    async def generated_reply(self, request, session, bot_response, reply_language, **extra):
+        """Save and return a generated reply, translating it unless it is already in the user's language"""
+        if reply_language:
+            if self.utils_manager.is_reply_in_language(bot_response, reply_language):
+                await self.history_cache.aappend(session, 'assistant', bot_response)
+                return JsonResponse({'message': bot_response, **extra})
+            request.session['reply_language_mode'] = 'translate'
+        return await self.reply(session, bot_response, use_memory=False, **extra)
+
+    async def handle_language_detection(self, request, session, user_message):
+        """Handle language detection phase"""
+        if session.language:
+            request.session['conversation_state'] = 'location_detection'
+            return await self.handle_location_detection(request, session, user_message)
+
+        detected_language = await self.utils_manager.aidentify_language(user_message)
+
+        if detected_language and detected_language.lower() not in ['none', 'unknown', '']:
+            session.language = detected_language
+            await session.asave()
+            request.session['conversation_state'] = 'location_detection'
+            return await self.reply(session, BOT_RESPONSES['ASK_LOCATION'])
+        else:
+            # Language detection failed, ask explicitly (in English)
+            bot_response = BOT_RESPONSES['ASK_LANGUAGE']
+            await self.history_cache.aappend(session, 'assistant', bot_response)
+            return JsonResponse({'message': bot_response})
+
+    async def handle_location_detection(self, request, session, user_message):
+        """Handle location detection phase"""
+        translated_message = await self.to_english(session, user_message)
+
+        if session.location:
+            request.session['conversation_state'] = 'gender_nationality_detection'
+            return await self.reply(session, BOT_RESPONSES['LOCATION_RECEIVED'].format(location=session.location), use_memory=False)
+
+        detected_location = await self.utils_manager.aextract_location(translated_message)
+
+        if detected_location and detected_location.lower() not in ['none', 'unknown', '', 'null']:
+            session.location = detected_location
+            await session.asave()
+            request.session['conversation_state'] = 'gender_nationality_detection'
+            return await self.reply(session, BOT_RESPONSES['LOCATION_RECEIVED'].format(location=detected_location), use_memory=False)
+        else:
+            return await self.reply(session, BOT_RESPONSES['LOCATION_MISSING'])
+
+    async def handle_gender_nationality_detection(self, request, session, user_message):
+        """Handle gender and nationality detection phase"""
+        translated_message = await self.to_english(session, user_message)
+
+        if session.gender and session.nationality:
+            request.session['conversation_state'] = 'case_description'
+            return await self.reply(session, BOT_RESPONSES['PROFILE_RECEIVED'].format(
+                gender=session.gender, nationality=session.nationality
+            ), use_memory=False)
+
+        detected_gender, detected_nationality = await asyncio.gather(
+            self.utils_manager.aextract_gender(translated_message),
+            self.utils_manager.aextract_nationality(translated_message),
+        )
+
+        updated = False
+        if detected_gender and detected_gender.lower() not in ['none', 'unknown', '', 'null']:
+            session.gender = detected_gender
+            updated = True
+        if detected_nationality and detected_nationality.lower() not in ['none', 'unknown', '', 'null']:
+            session.nationality = detected_nationality
+            updated = True
+        if updated:
+            await session.asave()
+
+        if session.gender and session.nationality:
+            request.session['conversation_state'] = 'case_description'
+            return await self.reply(session, BOT_RESPONSES['PROFILE_RECEIVED'].format(
+                gender=session.gender, nationality=session.nationality
+            ), use_memory=False)
+
+        missing_info = []
+        if not session.gender:
+            missing_info.append("gender")
+        if not session.nationality:
+            missing_info.append("nationality")
+        return await self.reply(session, BOT_RESPONSES['PROFILE_MISSING'].format(missing_str=" and ".join(missing_info)))
+
+    async def handle_case_description(self, request, session, user_message):
+        """Handle case description phase"""
+        translated_message = await self.to_english(session, user_message)
+
+        if request.session.get('case_type'):
+            request.session['conversation_state'] = 'case_handling'
+            return await self.handle_case_conversation(request, session, user_message)
+
+        detected_case_type = await self.utils_manager.aidentify_case_type(translated_message)
+        case_info = self.utils_manager.get_graph_for_case(detected_case_type)
+        if not case_info:
+            return await self.reply(session, BOT_RESPONSES['CASE_TYPE_UNKNOWN'])
+
+        case_type, G = case_info
+        session.case_type = case_type
+        await session.asave()
+
+        request.session['case_type'] = case_type
+        request.session['current_node'] = 'start'
+        request.session['conversation_state'] = 'case_handling'
+
+        history = await self.history_cache.aget(session)
+        prompt_history = await self.utils_manager.aget_prompt_history(session, history)
+
+        reply_language = self.reply_language(request, session)
+        messages = self.utils_manager.case_node_messages(case_type, 'start', G, prompt_history, translated_message, reply_language)
+        bot_response = await self.utils_manager.aquery_ollama(messages, call_site='build_prompt')
+        return await self.generated_reply(request, session, bot_response, reply_language)
+
+    async def handle_case_conversation(self, request, session, user_message):
+        """Handle case conversation phase"""
+        case_type = request.session.get('case_type')
+        current_node = request.session.get('current_node', 'start')
+        is_legal_inquiry = bool(case_type and case_type.lower() == 'legal rights inquiry')
+        reply_language = self.reply_language(request, session)
+
+        # Replies written in the user's language take the message as it is; the knowledge
+        # base search still needs English
+        translated_message = user_message
+        if is_legal_inquiry or not reply_language:
+            translated_message = await self.to_english(session, user_message)
+
+        if is_legal_inquiry:
+            return await self.handle_legal_rights_inquiry(request, session, user_message, translated_message)
+
+        case_info = self.utils_manager.get_graph_for_case(case_type) if case_type else None
+        if not case_info:
+            return await self.handle_fallback(session, user_message)
+
+        case_type, G = case_info
+        history = await self.history_cache.aget(session)
+        prompt_history = await self.utils_manager.aget_prompt_history(session, history)
+
+        if settings.CASE_TURN_MODE == 'combined':
+            turn = await self.utils_manager.acombined_case_turn(
+                history, current_node, G, prompt_history, translated_message, reply_language=reply_language
+            )
+            if turn is not None:
+                return await self.finish_combined_turn(request, session, turn, current_node, G, history, prompt_history, reply_language)
+
+        if current_node == 'collect_basic_info':
+            is_navigate, industrial_sector = await asyncio.gather(
+                self.utils_manager.acheck_navigation_to_next_state(history, current_node, G),
+                self.utils_manager.aextract_industrial_sector(translated_message),
+            )
+            if industrial_sector:
+                session.industrial_sector = industrial_sector
+                await session.asave()
+        else:
+            is_navigate = await self.utils_manager.acheck_navigation_to_next_state(history, current_node, G)
+
+        next_node = G.next_node(current_node) if is_navigate == "Yes" else None
+        if next_node:
+            request.session['current_node'] = next_node
+
+            if next_node == "generate_report":
+                messages = self.utils_manager.case_node_messages(case_type, current_node, G, prompt_history, translated_message, reply_language)
+                bot_response = await self.utils_manager.aquery_ollama(messages, call_site='build_prompt')
+                return await self.reply_and_enqueue_report(request, session, bot_response, history, prompt_history, reply_language)
+
+            messages = self.utils_manager.cohesive_transition_messages(
+                current_node, next_node, G, prompt_history, translated_message, reply_language
+            )
+            bot_response = await self.utils_manager.aquery_ollama(messages, call_site='cohesive_transition')
+        else:
+            # Stay on current node (or no next step), just respond to user input
+            messages = self.utils_manager.case_node_messages(case_type, current_node, G, prompt_history, translated_message, reply_language)
+            bot_response = await self.utils_manager.aquery_ollama(messages, call_site='build_prompt')
+
+        return await self.generated_reply(request, session, bot_response, reply_language)
+
+    async def finish_combined_turn(self, request, session, turn, current_node, G, history, prompt_history, reply_language=None):
+        """Apply a validated combined turn: slot values, navigation and the reply"""
+        if turn['slots']:
+            # Slot names are ChatSession fields declared on the node in case_graphs.json
+            for field, value in turn['slots'].items():
+                setattr(session, field, value)
+            await session.asave()
+
+        next_node = G.next_node(current_node) if turn['advance'] else None
+        if next_node:
+            request.session['current_node'] = next_node
+        if next_node == "generate_report":
+            return await self.reply_and_enqueue_report(request, session, turn['reply'], history, prompt_history, reply_language)
+        return await self.generated_reply(request, session, turn['reply'], reply_language)
+
+    async def reply_and_enqueue_report(self, request, session, bot_response, history, prompt_history, reply_language=None):
+        """Send the acknowledgement and start report generation as a background job"""
+        job = await self.report_queue.aenqueue(session, history, prompt_history)
+        return await self.generated_reply(request, session, bot_response, reply_language, report_job={
+            'id': str(job.id),
+            'status': job.status,
+            'status_url': reverse('report_status', args=[job.id]),
+        })
+
+    async def handle_legal_rights_inquiry(self, request, session, user_message, translated_message):
+        """Handle legal rights inquiry using RAG approach"""
+        current_node = request.session.get('current_node')
+        if current_node not in ('start', 'rag_response'):
+            return await self.handle_fallback(session, user_message)
+
+        request.session['current_node'] = 'rag_response'
+        reply_language = self.reply_language(request, session)
+        history = await self.history_cache.aget(session)
+        prompt_history = await self.utils_manager.aget_prompt_history(session, history)
+        bot_response = await self.utils_manager.arespond_based_on_the_context_agent(
+            translated_message, history, prompt_history=prompt_history, reply_language=reply_language
+        )
+        return await self.generated_reply(request, session, bot_response, reply_language)
+
+    async def handle_fallback(self, session, user_message):
+        """Handle fallback responses"""
+        return await self.reply(session, BOT_RESPONSES['FALLBACK'])
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from .models import CaseTypeExample
+
+logger = logging.getLogger(__name__)
+
+
+class CaseTypeClassifier:
+    """Nearest-centroid case type classifier over sentence embeddings.
+
+    Each case type's centroid is the mean of its normalized exemplar
+    embeddings: the seed examples from case_graphs.json plus the
+    CaseTypeExample rows staff have confirmed. Case types the classifier or
+    the LLM assigned to sessions are never used, so the classifier does not
+    learn from its own predictions. A prediction carries the cosine
+    similarity of the best centroid and its margin over the runner-up, so
+    ambiguous inputs can be sent to the LLM.
+
+    The first classification builds the centroids. After that they are
+    rebuilt every CASE_CLASSIFIER_REFRESH_SECONDS on a background thread,
+    while requests keep using the previous ones.
+    """
+
+    def __init__(self, runtime, case_graphs):
+        self.runtime = runtime
+        self.case_graphs = case_graphs
+        self._lock = threading.Lock()
+        self._model = None  # (labels, centroids), replaced as a whole
+        self._built_at = 0.0
+        self._refresh_thread = None
+
+    def _exemplars(self):
+        """Collect (case_type, text) pairs from the seed examples and confirmed examples."""
+        exemplars = [
+            (graph.case_type, example)
+            for graph in self.case_graphs.values()
+            for example in graph.examples
+        ]
+
+        per_type = settings.CASE_CLASSIFIER_EXAMPLES_PER_TYPE
+        if per_type:
+            for graph in self.case_graphs.values():
+                texts = (
+                    CaseTypeExample.objects
+                    .filter(case_type__iexact=graph.case_type)
+                    .order_by('-created_at')
+                    .values_list('text', flat=True)[:per_type]
+                )
+                exemplars.extend((graph.case_type, text) for text in texts)
+        return exemplars
+
+    def _build(self):
+        """Compute the centroids without touching the ones in use. Returns (labels, centroids)."""
+        exemplars = self._exemplars()
+        vectors = np.asarray(self.runtime.embeddings.embed_documents([text for _, text in exemplars]))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        labels = []
+        centroids = []
+        for graph in self.case_graphs.values():
+            rows = [i for i, (case_type, _) in enumerate(exemplars) if case_type == graph.case_type]
+            if not rows:
+                continue
+            centroid = vectors[rows].mean(axis=0)
+            labels.append(graph.case_type)
+            centroids.append(centroid / np.linalg.norm(centroid))
+
+        logger.info(f"Case type classifier built from {len(exemplars)} exemplars")
+        return labels, np.vstack(centroids)
+
+    def _ensure_built(self):
+        """Return the centroids in use, building them first if there are none yet."""
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._build()
+                    self._built_at = time.monotonic()
+                model = self._model
+        elif time.monotonic() - self._built_at > settings.CASE_CLASSIFIER_REFRESH_SECONDS:
+            self._start_refresh()
+        return model
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh, name="case-classifier-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh(self):
+        try:
+            model = self._build()
+            with self._lock:
+                self._model = model
+                self._built_at = time.monotonic()
+        except Exception:
+            logger.exception("Could not rebuild the case type classifier")
+            # Keep the current centroids and try again after the next refresh interval
+            with self._lock:
+                self._built_at = time.monotonic()
+        finally:
+            # The thread ends here, so its database connections would never be reused
+            connections.close_all()
+
+    def rebuild(self):
+        """Recompute the centroids now, e.g. after staff confirmed many new examples."""
+        model = self._build()
+        with self._lock:
+            self._model = model
+            self._built_at = time.monotonic()
+
+    def classify(self, text):
+        """
+        Classify a problem description.
+
+        Args:
+            text (str): The user's description of their problem
+
+        Returns:
+            tuple: (case_type, similarity, margin) where margin is the similarity gap to the runner-up
+        """
+        labels, centroids = self._ensure_built()
+        query = np.asarray(self.runtime.embeddings.embed_query(text))
+        query /= np.linalg.norm(query)
+
+        similarities = centroids @ query
+        order = np.argsort(similarities)[::-1]
+        best = similarities[order[0]]
+        runner_up = similarities[order[1]] if len(order) > 1 else -1.0
+        return labels[order[0]], float(best), float(best - runner_up)
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_case_classifier(runtime, case_graphs):
+    """Return the process-wide case type classifier, creating it on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = CaseTypeClassifier(runtime, case_graphs)
+    return _classifier
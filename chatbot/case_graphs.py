@@ -0,0 +1,102 @@
+import json
+import threading
+from pathlib import Path
+from types import MappingProxyType
+
+CASE_GRAPHS_PATH = Path(__file__).resolve().parent / "data" / "case_graphs.json"
+
+
+class CaseGraph:
+    """Immutable transition table for one case type.
+
+    Each node maps to its prompt text and to the node that follows it, which is
+    all the conversation flow needs: the text for prompts and the single next
+    step once the user has answered. A node may also declare slots: ChatSession
+    fields, with a description, that can be filled from the user's answer.
+    """
+
+    __slots__ = ("case_type", "description", "examples", "start", "_texts", "_next", "_slots")
+
+    def __init__(self, case_type, nodes, edges, description="", examples=(), start="start"):
+        texts = {node_id: info["text"] for node_id, info in nodes.items()}
+        slots = {node_id: MappingProxyType(dict(info["slots"])) for node_id, info in nodes.items() if info.get("slots")}
+        if start not in texts:
+            raise ValueError(f"Case graph '{case_type}' has no '{start}' node")
+
+        transitions = {}
+        for src, dst in edges:
+            if src not in texts or dst not in texts:
+                raise ValueError(f"Case graph '{case_type}' has an edge to an unknown node: {src} -> {dst}")
+            # Like the conversation flow always did, the first listed edge wins
+            transitions.setdefault(src, dst)
+
+        object.__setattr__(self, "case_type", case_type)
+        object.__setattr__(self, "description", description)
+        object.__setattr__(self, "examples", tuple(examples))
+        object.__setattr__(self, "start", start)
+        object.__setattr__(self, "_texts", MappingProxyType(texts))
+        object.__setattr__(self, "_next", MappingProxyType(transitions))
+        object.__setattr__(self, "_slots", MappingProxyType(slots))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CaseGraph is immutable")
+
+    @property
+    def nodes(self):
+        return tuple(self._texts)
+
+    def text(self, node):
+        """Return the prompt text for a node."""
+        return self._texts[node]
+
+    def slots(self, node):
+        """Return the slots of a node as a field name -> description mapping (empty if none)."""
+        return self._slots.get(node, MappingProxyType({}))
+
+    def next_node(self, node):
+        """Return the node that follows the given one, or None at the end of the flow."""
+        return self._next.get(node)
+
+    def __repr__(self):
+        return f"<CaseGraph {self.case_type!r} ({len(self._texts)} nodes)>"
+
+
+def load_case_graphs(path=CASE_GRAPHS_PATH):
+    """
+    Compile the case graph definition file.
+
+    Args:
+        path (str or Path): JSON file with a "case_graphs" list of {case_type, description, examples, nodes, edges};
+            each node is {text, slots (optional)}
+
+    Returns:
+        MappingProxyType: Lower-cased case type -> CaseGraph, in definition order
+    """
+    with open(path, encoding="utf-8") as f:
+        definitions = json.load(f)["case_graphs"]
+
+    graphs = {}
+    for data in definitions:
+        graph = CaseGraph(
+            data["case_type"],
+            data["nodes"],
+            data["edges"],
+            description=data.get("description", ""),
+            examples=data.get("examples", ()),
+        )
+        graphs[graph.case_type.lower()] = graph
+    return MappingProxyType(graphs)
+
+
+_graphs = None
+_graphs_lock = threading.Lock()
+
+
+def get_case_graphs():
+    """Return the process-wide compiled case graphs, loading them on first use."""
+    global _graphs
+    if _graphs is None:
+        with _graphs_lock:
+            if _graphs is None:
+                _graphs = load_case_graphs()
+    return _graphs
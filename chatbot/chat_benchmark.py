@@ -0,0 +1,201 @@
+"""End-to-end chat turn benchmark with per-turn budgets.
+
+Scripted conversations (data/benchmark_conversations.json), one or more per
+case graph, are sent turn by turn through ChatViewManager.chat_message while
+the LLM client talks to an in-process MockLLMServer. For every turn the
+benchmark records wall time, LLM calls, approximate prompt tokens, database
+queries and peak Python memory. Each conversation's worst turn is then
+checked against data/benchmark_budgets.json. A budget is exceeded, for
+example, when an extra translation hop adds a call or an N+1 query adds
+queries.
+
+A conversation ends when its script runs out or a report job is started;
+the report itself runs in the background and is not part of the turns, and
+neither are the history summaries, which are run between turns.
+"""
+import json
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from . import llm_client, llm_usage
+from .llm_scheduler import LLMScheduler
+from .mock_llm import MockLLMServer, load_rules
+from .models import ChatSession
+from .views import ChatViewManager
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+CONVERSATIONS_PATH = DATA_DIR / "benchmark_conversations.json"
+BUDGETS_PATH = DATA_DIR / "benchmark_budgets.json"
+
+# Sent after a script's messages while the case flow still asks for more
+FOLLOW_UP_MESSAGE = "Yes, that is everything I can share."
+
+METRICS = ('seconds', 'llm_calls', 'prompt_tokens', 'queries', 'peak_memory_kb')
+
+
+def load_conversations(path=CONVERSATIONS_PATH):
+    """Load the scripted conversations: a "conversations" list of {name, case_type, messages}."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)["conversations"]
+
+
+def load_budgets(path=BUDGETS_PATH):
+    """Load the budgets: per-turn maxima under "default", overridden per conversation name."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def budget_for(budgets, name):
+    """Return the per-turn budget of one conversation."""
+    return {**budgets["default"], **budgets.get("conversations", {}).get(name, {})}
+
+
+class ChatTurnBenchmark:
+    """
+    Run scripted conversations through the sync chat pipeline against a mock LLM.
+
+    Args:
+        rules (list): Mock LLM synthesis rules, defaults to data/mock_llm_rules.json
+        max_follow_ups (int): Follow-up messages allowed after a script before giving up
+    """
+
+    def __init__(self, rules=None, max_follow_ups=10):
+        self.rules = load_rules() if rules is None else rules
+        self.max_follow_ups = max_follow_ups
+
+    def run(self, conversations):
+        """
+        Run conversations one after another.
+
+        Returns:
+            list: One {name, case_type, turns, errors[, error]} dict per conversation; each turn is
+                  a dict of METRICS
+        """
+        server = MockLLMServer(('127.0.0.1', 0), rules=self.rules)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        # No client-side rate limit: the mock answers as fast as it can
+        client = llm_client.LLMClient(base_url=server.base_url, scheduler=LLMScheduler(requests_per_minute=0))
+
+        # Report jobs are only enqueued; in-process workers would add LLM calls to the turns.
+        # Usage rows are queued as usual but never written: the sessions are deleted afterwards
+        with (
+            mock.patch.object(llm_client, '_client', client),
+            mock.patch.object(llm_usage, '_recorder', llm_usage.UsageRecorder()),
+            override_settings(REPORT_WORKER_MODE='external'),
+        ):
+            manager = ChatViewManager()
+            tracemalloc.start()
+            try:
+                # One unmeasured turn takes the process's one-off loading out of the first conversation
+                if conversations:
+                    self.run_conversation(manager, server, {**conversations[0], 'messages': conversations[0]['messages'][:1]})
+                return [self.run_conversation(manager, server, conversation) for conversation in conversations]
+            finally:
+                tracemalloc.stop()
+                server.shutdown()
+                server.server_close()
+
+    def run_conversation(self, manager, server, conversation):
+        # The mock identifies the scripted case type; other rules stay as configured
+        server.rules = [
+            {"contains": "identify the type of legal case", "response": conversation["case_type"]}
+        ] + self.rules
+        factory = RequestFactory()
+        store = SessionStore()
+        result = {'name': conversation['name'], 'case_type': conversation['case_type'], 'turns': [], 'errors': 0}
+        messages = conversation['messages'] + [FOLLOW_UP_MESSAGE] * self.max_follow_ups
+
+        try:
+            for index, message in enumerate(messages):
+                request = factory.post(
+                    '/chat/message/',
+                    data=json.dumps({'message': message, 'new_session': index == 0}),
+                    content_type='application/json',
+                )
+                request.session = store
+                try:
+                    response, turn = self.measure(manager, server, request)
+                except Exception as e:
+                    result['errors'] += 1
+                    result['error'] = f"turn {index + 1}: {e!r}"
+                    break
+                result['turns'].append(turn)
+                # The session middleware would save the session after the response
+                store.save()
+
+                if response.status_code != 200:
+                    result['errors'] += 1
+                    break
+                if 'report_job' in json.loads(response.content):
+                    break
+                if index + 1 >= len(conversation['messages']) and not self.expects_more(store, manager):
+                    break
+        finally:
+            ChatSession.objects.filter(id=store.get('chat_session_id')).delete()
+        return result
+
+    def expects_more(self, store, manager):
+        """Whether the case flow still has questions once the script has run out"""
+        case_info = manager.utils_manager.get_graph_for_case(store.get('case_type') or '')
+        if not case_info or store.get('conversation_state') != 'case_handling':
+            return False
+        _, G = case_info
+        return G.next_node(store.get('current_node', 'start')) is not None
+
+    def measure(self, manager, server, request):
+        calls_before, tokens_before = server.usage()
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        summaries = []
+        with (
+            mock.patch.object(manager.utils_manager, 'start_history_summary', lambda *args: summaries.append(args)),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            started = time.perf_counter()
+            response = manager.chat_message(request)
+            seconds = time.perf_counter() - started
+        calls_after, tokens_after = server.usage()
+        # Like reports, history summaries run in the background after the turn and are not part of it
+        for args in summaries:
+            thread = manager.utils_manager.start_history_summary(*args)
+            if thread is not None:
+                thread.join()
+        return response, {
+            'seconds': seconds,
+            'llm_calls': calls_after - calls_before,
+            'prompt_tokens': tokens_after - tokens_before,
+            'queries': len(queries),
+            'peak_memory_kb': (tracemalloc.get_traced_memory()[1] - memory_before) // 1024,
+        }
+
+
+def check_budgets(results, budgets):
+    """
+    Compare each conversation's worst turn with its budget.
+
+    Returns:
+        list: Human-readable descriptions of exceeded budgets and failed turns
+    """
+    violations = []
+    for result in results:
+        budget = budget_for(budgets, result['name'])
+        if result['errors']:
+            violations.append(f"{result['name']}: failed turn {result.get('error', '')}".rstrip())
+        for metric in METRICS:
+            if metric not in budget or not result['turns']:
+                continue
+            worst = max(result['turns'], key=lambda turn: turn[metric])
+            if worst[metric] > budget[metric]:
+                turn_number = result['turns'].index(worst) + 1
+                violations.append(
+                    f"{result['name']}: turn {turn_number} {metric} {worst[metric]:g} exceeds budget {budget[metric]:g}"
+                )
+    return violations
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_history_cache_is_shared(app_configs, **kwargs):
+    """External report workers write chat messages, so the history cache must be shared with them."""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.REPORT_WORKER_MODE == "external" and backend == "django.core.cache.backends.locmem.LocMemCache":
+        return [Warning(
+            "Conversation histories are cached per process, so report messages written by external "
+            "report workers are missing from them until HISTORY_CACHE_TIMEOUT expires.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis or Memcached.",
+            id="chatbot.W001",
+        )]
+    return []
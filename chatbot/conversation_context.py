@@ -0,0 +1,62 @@
+"""Helpers for keeping prompt history bounded as conversations grow.
+
+Prompts are built from a rolling summary of the older messages plus the most
+recent messages, trimmed to a token budget, instead of the full message list.
+"""
+
+# Rough characters-per-token ratio used for budgeting; no tokenizer is needed
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text."""
+    return len(str(text)) // CHARS_PER_TOKEN + 1
+
+
+def split_history(history, recent_messages):
+    """
+    Split the message list into older messages and the recent window.
+
+    Args:
+        history (list): List of message dictionaries
+        recent_messages (int): Number of messages to keep verbatim
+
+    Returns:
+        tuple: (older, recent) lists of message dictionaries
+    """
+    if recent_messages <= 0:
+        return list(history), []
+    if len(history) <= recent_messages:
+        return [], list(history)
+    return list(history[:-recent_messages]), list(history[-recent_messages:])
+
+
+def format_prompt_history(summary, messages, token_budget):
+    """
+    Render the summary and messages for interpolation into a prompt.
+
+    Messages are kept newest-first until the token budget is spent, so the
+    latest message is always included. With no summary and no trimming the
+    output is the same as str(messages).
+
+    Args:
+        summary (str): Rolling summary of earlier messages, may be empty
+        messages (list): Message dictionaries not covered by the summary
+        token_budget (int): Approximate token cap for the rendered history
+
+    Returns:
+        str: The history text for the prompt
+    """
+    remaining = token_budget - (estimate_tokens(summary) if summary else 0)
+    kept = []
+    for message in reversed(messages):
+        cost = estimate_tokens(message["content"])
+        if kept and cost > remaining:
+            break
+        kept.append({"role": message["role"], "content": message["content"]})
+        remaining -= cost
+    kept.reverse()
+
+    if summary:
+        return f"Summary of earlier conversation: {summary}\nRecent messages: {kept}"
+    return str(kept)
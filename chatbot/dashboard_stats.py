@@ -0,0 +1,233 @@
+"""Materialized counters behind the dashboard.
+
+Every ChatSession, BuyerCompany and PolicyViolation row contributes to a set
+of (dimension, key) counters, e.g. ("day", "2025-06-01") or ("company",
+"Nike"). The signal handlers in signals.py apply the difference between a
+row's old and new contributions whenever it is saved or deleted, so the
+dashboard reads a few hundred counter rows instead of every session.
+
+Writes that bypass model signals (bulk_create, QuerySet.update) must call
+record_created() themselves or be followed by `manage.py rebuild_dashboard_stats`.
+"""
+import json
+from collections import Counter
+from types import SimpleNamespace
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+DIMENSIONS = {
+    'total': "Totals: sessions, violations and incidents",
+    'day': "Sessions started per day (YYYY-MM-DD)",
+    'location': "Sessions per user location",
+    'industry': "Sessions per industrial sector",
+    'demographic': "Sessions per nationality and gender",
+    'case_type': "Sessions per case type",
+    'factory': "Sessions per factory",
+    'company': "Sessions linked to each buyer company",
+    'company_violations': "Policy violations found for each buyer company",
+    'category': "Policy violations per policy category",
+}
+
+# Fields each model's contributions are derived from
+SESSION_FIELDS = ('created_at', 'location', 'industrial_sector', 'nationality', 'gender', 'case_type', 'factory_name')
+BUYER_FIELDS = ('name',)
+VIOLATION_FIELDS = ('buyer_company', 'incidents', 'policy_violations')
+
+
+def _as_list(value):
+    """Return a JSON list column as a list, whether stored as text or decoded already."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+def session_contributions(session):
+    """Counters a ChatSession adds to."""
+    contributions = Counter({
+        ('total', 'sessions'): 1,
+        ('location', session.location or 'Unknown'): 1,
+        ('industry', session.industrial_sector or 'Other'): 1,
+        ('demographic', f"{session.nationality or 'Unknown'} - {session.gender or 'Unknown'}"): 1,
+        ('case_type', session.case_type or 'Unclassified'): 1,
+        ('factory', session.factory_name or ''): 1,
+    })
+    if session.created_at:
+        contributions[('day', session.created_at.date().isoformat())] += 1
+    return contributions
+
+
+def buyer_contributions(buyer):
+    """Counters a BuyerCompany adds to."""
+    return Counter({('company', buyer.name): 1})
+
+
+def violation_contributions(violation):
+    """Counters a PolicyViolation adds to."""
+    contributions = Counter({
+        ('total', 'violations'): 1,
+        ('company_violations', violation.buyer_company): 1,
+    })
+    incidents = len(_as_list(violation.incidents))
+    if incidents:
+        contributions[('total', 'incidents')] += incidents
+    for policy_violation in _as_list(violation.policy_violations):
+        category = policy_violation.get('policy_category') if isinstance(policy_violation, dict) else None
+        if not isinstance(category, str):
+            category = None
+        # Categories are free text from the LLM; keep them within DashboardStat.key
+        contributions[('category', (category or 'General Violation')[:255])] += 1
+    return contributions
+
+
+CONTRIBUTIONS = {
+    'ChatSession': (SESSION_FIELDS, session_contributions),
+    'BuyerCompany': (BUYER_FIELDS, buyer_contributions),
+    'PolicyViolation': (VIOLATION_FIELDS, violation_contributions),
+}
+
+
+def contributions_for(instance):
+    """
+    Compute the counters a model instance contributes to.
+
+    Args:
+        instance (Model): A ChatSession, BuyerCompany or PolicyViolation
+
+    Returns:
+        Counter: (dimension, key) -> amount
+    """
+    return CONTRIBUTIONS[type(instance).__name__][1](instance)
+
+
+def tracked_fields(instance):
+    return CONTRIBUTIONS[type(instance).__name__][0]
+
+
+def remember_values(instance):
+    """Keep the tracked field values of a row, or None when some were deferred."""
+    loaded = instance.__dict__
+    fields = tracked_fields(instance)
+    # Deferred fields are looked up on save instead; loading them here would cost a query per row
+    instance._stats_values = {name: loaded[name] for name in fields} if all(name in loaded for name in fields) else None
+
+
+def remembered_contributions(instance):
+    """
+    Compute the counters a row contributed to when it was loaded or last saved.
+
+    Returns:
+        Counter: (dimension, key) -> amount, or None when the row's values were not remembered
+    """
+    values = getattr(instance, '_stats_values', None)
+    if values is None:
+        return None
+    return CONTRIBUTIONS[type(instance).__name__][1](SimpleNamespace(**values))
+
+
+class DashboardStatsModel(models.Model):
+    """Base of the models the dashboard counts.
+
+    Rows loaded from the database keep their tracked field values (plain
+    references, nothing is computed), so the signal handlers can work out
+    what a row counted towards before it was changed. The counters
+    themselves are only computed on save or delete, never on read paths.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        remember_values(instance)
+        return instance
+
+
+def apply_deltas(deltas):
+    """
+    Add the given amounts to the counters, creating missing counter rows.
+
+    Args:
+        deltas (Counter): (dimension, key) -> signed amount
+    """
+    from .models import DashboardStat
+
+    with transaction.atomic():
+        for (dimension, key), delta in deltas.items():
+            if not delta:
+                continue
+            counters = DashboardStat.objects.filter(dimension=dimension, key=key)
+            if counters.update(count=F('count') + delta):
+                continue
+            try:
+                # Savepoint, so losing a creation race does not break the outer transaction
+                with transaction.atomic():
+                    DashboardStat.objects.create(dimension=dimension, key=key, count=delta)
+            except IntegrityError:
+                counters.update(count=F('count') + delta)
+
+
+def record_created(instances):
+    """Count rows that were written without model signals, e.g. by bulk_create."""
+    deltas = Counter()
+    for instance in instances:
+        deltas.update(contributions_for(instance))
+    apply_deltas(deltas)
+
+
+def rebuild_stats(batch_size=2000):
+    """
+    Recompute every counter from the source tables.
+
+    Args:
+        batch_size (int): Rows fetched per database round trip
+
+    Returns:
+        int: Number of counter rows written
+    """
+    from .models import BuyerCompany, ChatSession, DashboardStat, PolicyViolation
+
+    totals = Counter()
+    sources = (
+        (ChatSession, SESSION_FIELDS, session_contributions),
+        (BuyerCompany, BUYER_FIELDS, buyer_contributions),
+        (PolicyViolation, VIOLATION_FIELDS, violation_contributions),
+    )
+    for model, fields, contributions in sources:
+        for instance in model.objects.only(*fields).iterator(chunk_size=batch_size):
+            totals.update(contributions(instance))
+
+    stats = [
+        DashboardStat(dimension=dimension, key=key, count=count)
+        for (dimension, key), count in totals.items()
+        if count
+    ]
+    with transaction.atomic():
+        DashboardStat.objects.all().delete()
+        DashboardStat.objects.bulk_create(stats, batch_size=batch_size)
+    return len(stats)
+
+
+def load_dashboard_stats():
+    """
+    Read all counters, grouped by dimension.
+
+    Returns:
+        dict: dimension -> {key: count}, keys ordered by descending count
+    """
+    from .models import DashboardStat
+
+    stats = {dimension: {} for dimension in DIMENSIONS}
+    for dimension, key, count in (
+        DashboardStat.objects.filter(count__gt=0)
+        .order_by('dimension', '-count', 'key')
+        .values_list('dimension', 'key', 'count')
+    ):
+        stats.setdefault(dimension, {})[key] = count
+    return stats
@@ -1,28 +1,120 @@
+import base64
+import binascii
+from datetime import datetime, time, timedelta
+
 from django import forms
-from .models import ChatSession
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from .case_graphs import get_case_graphs
+from .models import BuyerCompany, ChatSession
 
 class ChatForm(forms.Form):
     message = forms.CharField(widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Type your message...'}))
 
+def encode_cursor(session):
+    """Encode a session's position in the (-created_at, -id) ordering as an opaque cursor."""
+    raw = f"{session.created_at.isoformat()}|{session.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): Opaque cursor from a previous page
+
+    Returns:
+        tuple: (created_at, id) of the last session on the previous page
+    """
+    try:
+        created_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(session_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise forms.ValidationError("Invalid cursor.")
+
+def start_of_day(day):
+    """Return the first moment of a date in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 class FilterForm(forms.Form):
     case_type = forms.ChoiceField(
-        choices=[
-            ('', 'All Case Types'),
-            ('Lender Harassment', 'Lender Harassment'),
-            ('Employer Exploitation', 'Employer Exploitation'),
-            ('Excessive Interest Rate', 'Excessive Interest Rate'),
-            ('Recruitment Agency Harassment', 'Recruitment Agency Harassment'),
-        ],
+        choices=[('', 'All Case Types')],
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
-    
+
     factory_name = forms.CharField(
         required=False,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Filter by factory name'})
     )
-    
+
     buyer_company = forms.CharField(
         required=False,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Filter by buyer company'})
-    )
\ No newline at end of file
+    )
+
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Offer every case type that has a conversation graph
+        self.fields['case_type'].choices = [('', 'All Case Types')] + [
+            (graph.case_type, graph.case_type) for graph in get_case_graphs().values()
+        ]
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data.get('cursor')
+        return decode_cursor(cursor) if cursor else None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned_data
+
+    def filter_queryset(self, queryset):
+        """
+        Apply the filters and the keyset cursor to a ChatSession queryset.
+
+        Args:
+            queryset (QuerySet): ChatSession queryset to narrow down
+
+        Returns:
+            QuerySet: Filtered sessions ordered newest first, starting after the cursor
+        """
+        data = self.cleaned_data
+        if data.get('case_type'):
+            queryset = queryset.filter(case_type=data['case_type'])
+        if data.get('factory_name'):
+            queryset = queryset.filter(factory_name__icontains=data['factory_name'])
+        if data.get('buyer_company'):
+            # Exists rather than a join, so sessions with several matching buyers appear once
+            queryset = queryset.filter(Exists(BuyerCompany.objects.filter(
+                session=OuterRef('pk'),
+                name__icontains=data['buyer_company'],
+            )))
+        # Plain datetime ranges rather than __date lookups, so the created_at indexes can be used
+        if data.get('date_from'):
+            queryset = queryset.filter(created_at__gte=start_of_day(data['date_from']))
+        if data.get('date_to'):
+            queryset = queryset.filter(created_at__lt=start_of_day(data['date_to'] + timedelta(days=1)))
+        if data.get('cursor'):
+            created_at, session_id = data['cursor']
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=session_id)
+            )
+        return queryset.order_by('-created_at', '-id')
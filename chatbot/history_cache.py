@@ -0,0 +1,173 @@
+"""Per-session conversation history kept in Django's cache framework.
+
+Turn handlers write messages through ConversationHistoryCache.append(), which
+saves the ChatMessage and adds it to the cached history, so reading the
+history on the next turn costs no query. On a cache miss the history is
+loaded with a single values_list('role', 'content') query.
+
+Each message is cached under its own key, and the session's key holds the
+message count. append() claims the next slot with cache.incr(), which is
+atomic, so a chat turn and a report job writing to the same session at the
+same time both keep their message; there is no read-modify-write of the whole
+list.
+
+The cache must be shared by every process that writes messages: all web
+workers and, with REPORT_WORKER_MODE=external, the report workers. Configure
+a shared backend with CACHE_BACKEND and CACHE_LOCATION (Redis or Memcached).
+The default local-memory cache is per process and is only correct when a
+single process serves the chat; the chatbot.W001 check warns about it when
+report workers run externally.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ChatMessage
+
+
+class ConversationHistoryCache:
+    """Cached {"role", "content"} dicts per chat session, one cache entry per message."""
+
+    key_prefix = "chatbot:history"
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout if timeout is not None else settings.HISTORY_CACHE_TIMEOUT
+
+    def _key(self, session_id):
+        return f"{self.key_prefix}:{session_id}"
+
+    def _message_key(self, session_id, index):
+        return f"{self.key_prefix}:{session_id}:{index}"
+
+    def _rows(self, session_id):
+        return (
+            ChatMessage.objects
+            .filter(session_id=session_id)
+            .order_by('timestamp', 'id')
+            .values_list('role', 'content')
+        )
+
+    def _cached(self, keys, messages):
+        # A message that expired, or whose slot is still being written, sends the caller to the database
+        if len(messages) != len(keys):
+            return None
+        return [messages[key] for key in keys]
+
+    def _entries(self, session_id, history):
+        return {self._message_key(session_id, index): message for index, message in enumerate(history)}
+
+    def get(self, session):
+        """
+        Return the conversation history of a session.
+
+        Args:
+            session (ChatSession): The chat session
+
+        Returns:
+            list: Message dictionaries with 'role' and 'content', oldest first
+        """
+        count = cache.get(self._key(session.id))
+        if count is not None:
+            keys = [self._message_key(session.id, index) for index in range(count)]
+            history = self._cached(keys, cache.get_many(keys))
+            if history is not None:
+                return history
+        history = [{"role": role, "content": content} for role, content in self._rows(session.id)]
+        cache.set_many(self._entries(session.id, history), self.timeout)
+        # The count goes in last, so readers never see it before the messages it counts
+        cache.set(self._key(session.id), len(history), self.timeout)
+        return history
+
+    def append(self, session, role, content):
+        """
+        Save a message and add it to the cached history.
+
+        Args:
+            session (ChatSession): The chat session
+            role (str): 'user' or 'assistant'
+            content (str): The message text
+
+        Returns:
+            ChatMessage: The saved message
+        """
+        message = ChatMessage.objects.create(session=session, role=role, content=content)
+        self.add_to_cached(session.id, role, content)
+        return message
+
+    def add_to_cached(self, session_id, role, content):
+        """
+        Add an already saved message to the cached history, e.g. once its transaction has committed.
+
+        Args:
+            session_id (int): The chat session id
+            role (str): 'user' or 'assistant'
+            content (str): The message text
+        """
+        try:
+            # incr is atomic, so concurrent writers each claim their own slot
+            index = cache.incr(self._key(session_id)) - 1
+        except ValueError:
+            # Nothing cached yet: the next get() loads the history including this message
+            return
+        cache.set(self._message_key(session_id, index), {"role": role, "content": content}, self.timeout)
+
+    async def aget(self, session):
+        """Async variant of get."""
+        count = await cache.aget(self._key(session.id))
+        if count is not None:
+            keys = [self._message_key(session.id, index) for index in range(count)]
+            history = self._cached(keys, await cache.aget_many(keys))
+            if history is not None:
+                return history
+        history = [{"role": role, "content": content} async for role, content in self._rows(session.id)]
+        await cache.aset_many(self._entries(session.id, history), self.timeout)
+        await cache.aset(self._key(session.id), len(history), self.timeout)
+        return history
+
+    async def aappend(self, session, role, content):
+        """Async variant of append."""
+        message = await ChatMessage.objects.acreate(session=session, role=role, content=content)
+        try:
+            index = await cache.aincr(self._key(session.id)) - 1
+        except ValueError:
+            return message
+        await cache.aset(self._message_key(session.id, index), {"role": role, "content": content}, self.timeout)
+        return message
+
+    def discard_from(self, message):
+        """
+        Delete a message and every later message of its session, e.g. those of a failed turn.
+
+        Args:
+            message (ChatMessage): The first message to delete
+        """
+        ChatMessage.objects.filter(session_id=message.session_id, id__gte=message.id).delete()
+        self.invalidate(message.session_id)
+
+    async def adiscard_from(self, message):
+        """Async variant of discard_from."""
+        await ChatMessage.objects.filter(session_id=message.session_id, id__gte=message.id).adelete()
+        await self.ainvalidate(message.session_id)
+
+    def invalidate(self, session_id):
+        """Drop the cached history of a session, e.g. after it was deleted."""
+        cache.delete(self._key(session_id))
+
+    async def ainvalidate(self, session_id):
+        """Async variant of invalidate."""
+        await cache.adelete(self._key(session_id))
+
+
+_history_cache = None
+_history_cache_lock = threading.Lock()
+
+
+def get_history_cache():
+    """Return the process-wide conversation history cache."""
+    global _history_cache
+    if _history_cache is None:
+        with _history_cache_lock:
+            if _history_cache is None:
+                _history_cache = ConversationHistoryCache()
+    return _history_cache
@@ -0,0 +1,261 @@
+"""Offline language identification for the languages PoBot supports.
+
+Burmese and Thai are recognised from their Unicode script blocks, Vietnamese
+from its distinctive Latin diacritics, and English versus Bahasa Indonesia
+with a small character trigram model trained on the seed texts below. A
+one- or two-word reply naming a language ("English", "Tiếng Việt") is matched
+directly. Every result carries a confidence score so callers can fall back to
+the LLM when the local answer is uncertain.
+
+Other Latin-script languages are rejected rather than forced into English or
+Bahasa Indonesia: the trigram model also knows a few close neighbours
+(Tagalog, Malay, Spanish), and text that fits none of its languages well is
+left unidentified.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+ENGLISH = 'English'
+INDONESIAN = 'Bahasa Indonesia'
+BURMESE = 'Burmese'
+VIETNAMESE = 'Vietnamese'
+THAI = 'Thai'
+
+# Names users may type when asked which language they prefer
+LANGUAGE_NAMES = {
+    'english': ENGLISH,
+    'inggris': ENGLISH,
+    'bahasa indonesia': INDONESIAN,
+    'indonesia': INDONESIAN,
+    'indonesian': INDONESIAN,
+    'bahasa': INDONESIAN,
+    'burmese': BURMESE,
+    'myanmar': BURMESE,
+    'မြန်မာ': BURMESE,
+    'မြန်မာစာ': BURMESE,
+    'vietnamese': VIETNAMESE,
+    'tiếng việt': VIETNAMESE,
+    'tieng viet': VIETNAMESE,
+    'thai': THAI,
+    'ไทย': THAI,
+    'ภาษาไทย': THAI,
+}
+
+SCRIPT_RANGES = {
+    BURMESE: (0x1000, 0x109F),
+    THAI: (0x0E00, 0x0E7F),
+}
+
+VIETNAMESE_CHARS = set(
+    "ăâđêôơưạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ"
+)
+
+SEED_TEXTS = {
+    ENGLISH: """
+        I work in an electronics factory in Taiwan. My employer does not pay overtime and the agency is
+        holding my passport. I had to pay a very high placement fee to the recruitment agency. What should
+        I do? Please help me. We work twelve hours every day without a break. The broker asks for money
+        every month and threatens to send me home. I want to know my rights as a migrant worker. Thank you
+        for your help. The company makes shoes and clothes for big brands. I live in the factory dormitory
+        with other workers. The loan from the lender has a very high interest rate and I am scared. Hello,
+        my name is Maria. I have a question about my contract and my salary. They took my documents and
+        said I cannot leave until I pay the debt. The supervisor shouts at us and there is no water.
+    """,
+    INDONESIAN: """
+        Saya bekerja di pabrik elektronik di Taiwan. Majikan saya tidak membayar gaji lembur dan paspor saya
+        ditahan oleh agen. Saya harus membayar biaya penempatan yang sangat mahal kepada agensi. Apa yang
+        harus saya lakukan? Tolong bantu saya. Kami bekerja dua belas jam setiap hari tanpa istirahat. Agen
+        meminta uang setiap bulan dan mengancam akan memulangkan saya. Saya ingin tahu hak saya sebagai
+        pekerja migran. Terima kasih atas bantuan anda. Perusahaan itu membuat sepatu dan pakaian untuk merek
+        besar. Saya tinggal di asrama pabrik bersama pekerja lain. Pinjaman dari pemberi pinjaman bunganya
+        sangat tinggi dan saya takut. Halo, nama saya Siti. Saya punya pertanyaan tentang kontrak dan gaji
+        saya. Mereka mengambil dokumen saya dan bilang saya tidak boleh pergi sebelum melunasi utang.
+        Terima kasih sudah menghubungi kami. Bisakah Anda memberi tahu di kota mana Anda bekerja? Apakah
+        majikan atau agensi Anda menahan paspor atau kartu identitas Anda? Sudah berapa lama Anda bekerja di
+        perusahaan ini? Mohon ceritakan apa yang terjadi. Informasi ini membantu kami menemukan merek yang
+        membeli dari pabrik Anda. Silakan jelaskan masalah yang Anda alami. Kami sedang menyiapkan laporan
+        Anda, mohon tunggu sebentar. Laporan Anda sudah selesai dan bisa dilihat di dasbor.
+    """,
+    VIETNAMESE: """
+        Tôi làm việc tại một nhà máy điện tử ở Đài Loan. Chủ không trả tiền làm thêm giờ và công ty môi giới
+        giữ hộ chiếu của tôi. Tôi phải trả phí môi giới rất cao. Tôi nên làm gì? Xin hãy giúp tôi. Chúng tôi
+        làm việc mười hai tiếng mỗi ngày mà không được nghỉ. Công ty môi giới đòi tiền hàng tháng và đe dọa
+        sẽ đưa tôi về nước. Tôi muốn biết quyền lợi của mình với tư cách là lao động nhập cư. Cảm ơn bạn đã
+        giúp đỡ. Công ty đó làm giày và quần áo cho các thương hiệu lớn. Tôi sống trong ký túc xá của nhà máy.
+        Khoản vay có lãi suất rất cao và tôi rất sợ. Xin chào, tôi tên là Lan. Tôi có câu hỏi về hợp đồng và
+        tiền lương của tôi. Họ lấy giấy tờ của tôi và nói tôi không được đi cho đến khi trả hết nợ.
+    """,
+}
+
+# Latin-script languages PoBot does not identify locally. They are modelled only so that a
+# message in one of them is not forced into English or Bahasa Indonesia; when one of them
+# scores best the LLM decides
+OTHER_SEED_TEXTS = {
+    'Tagalog': """
+        Nagtatrabaho ako sa isang pabrika ng electronics sa Taiwan. Hindi binabayaran ng amo ko ang overtime
+        at hawak ng ahensya ang pasaporte ko. Kailangan kong magbayad ng napakamahal na placement fee sa
+        ahensya. Ano ang dapat kong gawin? Tulungan po ninyo ako. Labindalawang oras kaming nagtatrabaho
+        araw-araw nang walang pahinga. Humihingi ng pera ang broker buwan-buwan at nagbabanta na pauuwiin
+        ako. Gusto kong malaman ang mga karapatan ko bilang migranteng manggagawa. Salamat po sa tulong ninyo.
+        Gumagawa ang kumpanya ng sapatos at damit para sa malalaking brand. Nakatira ako sa dormitoryo ng
+        pabrika kasama ang ibang mga manggagawa. Napakataas ng interes ng utang at natatakot ako. Kumusta,
+        ang pangalan ko ay Maria. May tanong ako tungkol sa kontrata at sahod ko. Kinuha nila ang mga
+        dokumento ko at sinabi na hindi ako puwedeng umalis hangga't hindi ko nababayaran ang utang.
+    """,
+    'Malay': """
+        Saya bekerja di kilang elektronik di Taiwan. Majikan saya tidak membayar kerja lebih masa dan ejen
+        menyimpan pasport saya. Saya terpaksa membayar yuran penempatan yang sangat mahal kepada ejen.
+        Apakah yang patut saya buat? Tolong bantu saya. Kami bekerja dua belas jam setiap hari tanpa rehat.
+        Ejen meminta wang setiap bulan dan mengugut untuk menghantar saya pulang. Saya mahu tahu hak saya
+        sebagai pekerja asing. Terima kasih atas bantuan anda. Syarikat itu membuat kasut dan pakaian untuk
+        jenama besar. Saya tinggal di asrama kilang bersama pekerja lain. Pinjaman daripada pemberi pinjaman
+        mempunyai kadar faedah yang sangat tinggi dan saya takut. Helo, nama saya Aminah. Saya ada soalan
+        tentang kontrak dan gaji saya. Mereka mengambil dokumen saya dan berkata saya tidak boleh keluar
+        sehingga saya membayar hutang. Terima kasih kerana menghubungi kami. Boleh anda beritahu di bandar
+        mana anda bekerja? Adakah majikan atau ejen anda menyimpan pasport atau kad pengenalan anda? Sudah
+        berapa lama anda bekerja dengan syarikat ini? Sila ceritakan apa yang berlaku. Maklumat ini membantu
+        kami mencari jenama yang membeli daripada kilang anda. Sila terangkan masalah yang anda hadapi. Kami
+        sedang menyediakan laporan anda, sila tunggu sebentar. Laporan anda sudah siap.
+    """,
+    'Spanish': """
+        Trabajo en una fábrica de electrónica en Taiwán. Mi empleador no paga las horas extra y la agencia
+        tiene mi pasaporte. Tuve que pagar una comisión de colocación muy alta a la agencia de reclutamiento.
+        ¿Qué debo hacer? Por favor, ayúdenme. Trabajamos doce horas todos los días sin descanso. El
+        intermediario pide dinero cada mes y amenaza con enviarme a casa. Quiero conocer mis derechos como
+        trabajador migrante. Gracias por su ayuda. La empresa fabrica zapatos y ropa para grandes marcas.
+        Vivo en el dormitorio de la fábrica con otros trabajadores. El préstamo tiene un interés muy alto y
+        tengo miedo. Hola, me llamo María. Tengo una pregunta sobre mi contrato y mi salario. Se llevaron
+        mis documentos y dijeron que no puedo irme hasta pagar la deuda.
+    """,
+}
+
+# Evidence from more than this many trigrams does not raise the confidence further,
+# so long messages are not scored as near-certain purely because of their length
+MAX_EVIDENCE_TRIGRAMS = 30
+
+# Trigram scores for messages shorter than this many words are scaled down; a single
+# word is as likely to be a place or a name as a word of the user's language
+MIN_CONFIDENT_WORDS = 3
+
+# Average trigram log-likelihood below which a message is taken to be in none of the
+# modelled languages; messages in them mostly score above -7, others about -7.3 or lower
+MIN_MEAN_LOG_LIKELIHOOD = -7.1
+
+
+def _clean(text):
+    text = unicodedata.normalize('NFC', str(text)).lower()
+    return re.sub(r"[^\w\s]|\d|_", " ", text)
+
+
+def _trigrams(text):
+    padded = f"  {' '.join(text.split())}  "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class TrigramModel:
+    """Add-one smoothed character trigram model per language."""
+
+    def __init__(self, seed_texts):
+        self.counts = {}
+        self.totals = {}
+        vocabulary = set()
+        for language, text in seed_texts.items():
+            counts = Counter(_trigrams(_clean(text)))
+            self.counts[language] = counts
+            self.totals[language] = sum(counts.values())
+            vocabulary.update(counts)
+        self.vocabulary_size = len(vocabulary) + 1
+
+    def posteriors(self, text):
+        """
+        Score the text against every language.
+
+        Args:
+            text (str): Text to classify
+
+        Returns:
+            dict: language -> posterior probability (uniform prior)
+        """
+        grams = _trigrams(_clean(text))
+        if not grams:
+            return {}
+
+        log_likelihoods = {language: self._log_likelihood(grams, language) for language in self.counts}
+        scale = min(1.0, MAX_EVIDENCE_TRIGRAMS / len(grams))
+        best = max(log_likelihoods.values())
+        weights = {lang: math.exp((ll - best) * scale) for lang, ll in log_likelihoods.items()}
+        total = sum(weights.values())
+        return {lang: weight / total for lang, weight in weights.items()}
+
+    def mean_log_likelihood(self, text, language):
+        """
+        Average log-likelihood per trigram of the text under one language.
+
+        Unlike the posteriors this does not depend on the other languages, so it
+        shows when a text fits none of them.
+
+        Returns:
+            float or None: The average, None for text without trigrams
+        """
+        grams = _trigrams(_clean(text))
+        if not grams:
+            return None
+        return self._log_likelihood(grams, language) / len(grams)
+
+    def _log_likelihood(self, grams, language):
+        counts = self.counts[language]
+        denominator = self.totals[language] + self.vocabulary_size
+        return sum(math.log((counts[g] + 1) / denominator) for g in grams)
+
+
+_model = TrigramModel({**SEED_TEXTS, **OTHER_SEED_TEXTS})
+
+
+def _script_share(text, start, end):
+    letters = [ch for ch in text if ch.isalpha() or unicodedata.category(ch).startswith('M')]
+    if not letters:
+        return 0.0
+    return sum(1 for ch in letters if start <= ord(ch) <= end) / len(letters)
+
+
+def detect_language(text):
+    """
+    Identify the language of a message without calling the LLM.
+
+    Args:
+        text (str): The user's message
+
+    Returns:
+        tuple: (language name or None, confidence between 0 and 1)
+    """
+    if not text or not str(text).strip():
+        return None, 0.0
+
+    normalized = unicodedata.normalize('NFC', str(text)).strip().lower()
+    name = re.sub(r"[^\w\s]", "", normalized).strip()
+    if name in LANGUAGE_NAMES:
+        return LANGUAGE_NAMES[name], 0.99
+
+    for language, (start, end) in SCRIPT_RANGES.items():
+        share = _script_share(normalized, start, end)
+        if share >= 0.5:
+            return language, round(min(0.99, share), 3)
+
+    letters = [ch for ch in normalized if ch.isalpha()]
+    if letters:
+        vietnamese_share = sum(1 for ch in letters if ch in VIETNAMESE_CHARS) / len(letters)
+        if vietnamese_share >= 0.05:
+            return VIETNAMESE, round(min(0.99, 0.8 + vietnamese_share), 3)
+
+    posteriors = _model.posteriors(normalized)
+    if not posteriors:
+        return None, 0.0
+    language = max(posteriors, key=posteriors.get)
+    # Text that is closest to an unsupported language, or that fits none of the seed texts
+    # well, is left to the LLM rather than forced into English or Bahasa Indonesia
+    if language in OTHER_SEED_TEXTS or _model.mean_log_likelihood(normalized, language) < MIN_MEAN_LOG_LIKELIHOOD:
+        return None, 0.0
+    word_factor = min(1.0, len(normalized.split()) / MIN_CONFIDENT_WORDS)
+    return language, round(min(0.99, posteriors[language] * word_factor), 3)
@@ -0,0 +1,230 @@
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.conf import settings
+from openai import APIError, AsyncOpenAI
+
+from .llm_scheduler import INTERACTIVE, LLMScheduler, LLMUnavailable
+
+DEFAULT_MODEL = "google/gemma-3n-e4b-it:free"
+
+
+class LLMClient:
+    """Pooled, asynchronous client for OpenRouter chat completions.
+
+    All HTTP traffic goes through one ``AsyncOpenAI`` instance backed by a
+    keep-alive ``httpx`` connection pool. The client owns a private event loop
+    running on a daemon thread, so synchronous callers (the Django views) can
+    submit requests with ``complete`` while async callers can ``await``
+    ``acomplete`` directly on the same pool. Requests are admitted, prioritised
+    and retried by an ``LLMScheduler`` (see llm_scheduler).
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeout=None,
+                 max_connections=None, max_keepalive_connections=None, keepalive_expiry=None, scheduler=None):
+        self.base_url = base_url or getattr(settings, "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY") or "missing-api-key"
+        self.timeout = timeout or getattr(settings, "LLM_REQUEST_TIMEOUT", 60.0)
+
+        limits = httpx.Limits(
+            max_connections=max_connections or getattr(settings, "LLM_MAX_CONNECTIONS", 20),
+            max_keepalive_connections=max_keepalive_connections or getattr(settings, "LLM_MAX_KEEPALIVE_CONNECTIONS", 10),
+            keepalive_expiry=keepalive_expiry or getattr(settings, "LLM_KEEPALIVE_EXPIRY", 30.0),
+        )
+        self.scheduler = scheduler or LLMScheduler()
+        self.http_client = httpx.AsyncClient(
+            limits=limits,
+            timeout=httpx.Timeout(self.timeout),
+            event_hooks={"response": [self._observe_response]},
+        )
+        # Retries are the scheduler's, so the SDK must not retry on its own
+        self.client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+
+        # Private loop used to serve synchronous callers
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client-loop", daemon=True)
+        self._thread.start()
+
+    async def _observe_response(self, response):
+        self.scheduler.observe_headers(response.status_code, response.headers)
+
+    async def acomplete(self, messages, model=DEFAULT_MODEL, timeout=None, on_usage=None, priority=INTERACTIVE):
+        """
+        Send a chat completion request and return the response text.
+
+        Args:
+            messages (list): List of message dictionaries with 'role' and 'content'
+            model (str): The model to use for the query
+            timeout (float): Per-attempt timeout in seconds, defaults to LLM_REQUEST_TIMEOUT
+            on_usage (callable): Called with the response's token usage when it reports one
+            priority (int): Scheduler priority class, INTERACTIVE or BACKGROUND
+
+        Returns:
+            str: The content of the response message
+
+        Raises:
+            LLMUnavailable: The request failed for good or ran out of time
+        """
+        completion = await self.scheduler.call(
+            lambda attempt_timeout: self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=attempt_timeout,
+            ),
+            priority=priority,
+            timeout=timeout or self.timeout,
+        )
+        if on_usage is not None and completion.usage is not None:
+            on_usage(completion.usage)
+        return completion.choices[0].message.content
+
+    async def astream(self, messages, model=DEFAULT_MODEL, timeout=None, on_usage=None, priority=INTERACTIVE):
+        """
+        Send a streaming chat completion request and yield the text as it arrives.
+
+        Opening the stream is retried like any request; a stream that breaks
+        off after it has started is not, as its text has already been passed on.
+
+        Args:
+            messages (list): List of message dictionaries with 'role' and 'content'
+            model (str): The model to use for the query
+            timeout (float): Per-attempt timeout in seconds, defaults to LLM_REQUEST_TIMEOUT
+            on_usage (callable): Called with the token usage the stream reports in its last chunk
+            priority (int): Scheduler priority class, INTERACTIVE or BACKGROUND
+
+        Yields:
+            str: Non-empty content deltas in order
+        """
+        stream = await self.scheduler.call(
+            lambda attempt_timeout: self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=attempt_timeout,
+                stream=True,
+                stream_options={"include_usage": True},
+            ),
+            priority=priority,
+            timeout=timeout or self.timeout,
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if on_usage is not None and getattr(chunk, "usage", None) is not None:
+                    on_usage(chunk.usage)
+        except (APIError, httpx.HTTPError) as e:
+            raise LLMUnavailable(f"LLM stream broke off: {e}") from e
+
+    def stream(self, messages, model=DEFAULT_MODEL, timeout=None, on_usage=None, priority=INTERACTIVE):
+        """Blocking iterator over ``astream`` for synchronous callers."""
+        deltas = queue.Queue()
+        end = object()
+
+        async def pump():
+            try:
+                async for delta in self.astream(messages, model=model, timeout=timeout, on_usage=on_usage, priority=priority):
+                    deltas.put(delta)
+            except Exception as e:
+                deltas.put(e)
+            finally:
+                deltas.put(end)
+
+        asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        while True:
+            item = deltas.get()
+            if item is end:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def complete(self, messages, model=DEFAULT_MODEL, timeout=None, on_usage=None, priority=INTERACTIVE):
+        """Blocking wrapper around ``acomplete`` for synchronous callers."""
+        return self.run(self.acomplete(messages, model=model, timeout=timeout, on_usage=on_usage, priority=priority))
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def arun(self, coroutine):
+        """
+        Await a coroutine on the client's event loop from any other event loop.
+
+        The connection pool belongs to the client's loop, so requests made from
+        another loop (e.g. an ASGI server's) are handed over instead of sharing
+        the pool across loops. The caller's loop is not blocked meanwhile.
+        """
+        if asyncio.get_running_loop() is self._loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._loop))
+
+    async def agather(self, *coroutines):
+        """Await several independent coroutines at the same time."""
+        return await asyncio.gather(*coroutines)
+
+    def gather(self, *coroutines):
+        """Run several independent coroutines concurrently and return their results in order."""
+        return self.run(self.agather(*coroutines))
+
+
+class ConcurrentRunner:
+    """Thread pool for running independent blocking helpers side by side.
+
+    ``UtilsManager`` methods are synchronous; running them here lets their LLM
+    requests overlap on the shared connection pool.
+    """
+
+    def __init__(self, max_workers=None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or getattr(settings, "LLM_MAX_CONCURRENT_CALLS", 8),
+            thread_name_prefix="llm-call",
+        )
+
+    def run(self, *calls):
+        """
+        Run zero-argument callables concurrently.
+
+        Args:
+            *calls: Callables to execute
+
+        Returns:
+            list: The results in the same order as the calls
+        """
+        # Each call runs in a copy of the caller's context, so request metrics follow it
+        futures = [self.executor.submit(contextvars.copy_context().run, call) for call in calls]
+        return [future.result() for future in futures]
+
+
+_client = None
+_runner = None
+_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Return the process-wide LLM client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+def get_concurrent_runner():
+    """Return the process-wide runner used for concurrent helper calls."""
+    global _runner
+    if _runner is None:
+        with _lock:
+            if _runner is None:
+                _runner = ConcurrentRunner()
+    return _runner
@@ -0,0 +1,262 @@
+"""Admission control, priorities and retries for LLM requests.
+
+Every chat completion request of an LLMClient goes through its LLMScheduler,
+on the client's event loop:
+
+- Priority classes: INTERACTIVE (chat turns, the default) and BACKGROUND
+  (report analysis, marked with llm_priority()). Waiting interactive
+  requests are always admitted first, and background requests leave
+  LLM_INTERACTIVE_RESERVE tokens of the bucket to chat turns.
+- Token-bucket admission at LLM_REQUESTS_PER_MINUTE with bursts of
+  LLM_REQUEST_BURST. The bucket is per process.
+- Rate-limit headers: Retry-After and X-RateLimit-Remaining/-Reset of every
+  provider response pause admission until the provider's window resets.
+- Retries: 429s, 5xx responses, timeouts and connection errors are retried
+  with full-jitter exponential backoff, at most LLM_MAX_ATTEMPTS times and
+  within the call's deadline (LLM_INTERACTIVE_DEADLINE or
+  LLM_BACKGROUND_DEADLINE seconds, time spent waiting included). After
+  that, and for any other API error, LLMUnavailable is raised.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+
+import openai
+from django.conf import settings
+
+from .metrics import get_metrics_registry
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# Longest admission pause taken from a provider's headers, in seconds
+MAX_PAUSE = 300.0
+
+_current_priority = contextvars.ContextVar('pobot_llm_priority', default=INTERACTIVE)
+
+
+class LLMUnavailable(Exception):
+    """An LLM request could not be completed within its attempts and deadline."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def current_priority():
+    """The priority class of LLM requests made in this context."""
+    return _current_priority.get()
+
+
+@contextmanager
+def llm_priority(priority):
+    """
+    Send the LLM requests made inside the block with a priority class.
+
+    Args:
+        priority (int): INTERACTIVE or BACKGROUND
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def is_retryable(error):
+    """Whether a failed request may succeed when sent again"""
+    if isinstance(error, openai.APIConnectionError):  # Includes timeouts
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return False
+
+
+def parse_reset(value, now=None):
+    """
+    Seconds until a rate-limit reset given as a header value.
+
+    Providers send a delay in seconds, or an epoch timestamp in seconds or
+    milliseconds (OpenRouter's X-RateLimit-Reset).
+
+    Returns:
+        float or None: The delay, None when the value is not a number
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    if value > 1e12:
+        return value / 1000 - now
+    if value > 1e9:
+        return value - now
+    return value
+
+
+class TokenBucket:
+    """Admits `rate` requests per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def take(self, reserve=0):
+        """
+        Take one token if more than `reserve` tokens would be left.
+
+        Returns:
+            float: 0 when the token was taken, otherwise the seconds until it can be
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= reserve + 1:
+            self.tokens -= 1
+            return 0.0
+        return (reserve + 1 - self.tokens) / self.rate
+
+
+class LLMScheduler:
+    """
+    Admission queue and retry policy shared by all requests of one LLMClient.
+
+    Not thread-safe: everything runs on the client's event loop, including the
+    httpx response hook that calls observe_headers.
+
+    Args:
+        requests_per_minute (float): Token bucket rate; 0 admits without a bucket
+        burst (int): Token bucket capacity
+        interactive_reserve (int): Tokens background requests leave to interactive ones
+        max_attempts (int): Attempts per request, the first one included
+        base_delay (float): Backoff cap of the first retry, doubled for every further one
+        max_delay (float): Largest backoff cap
+        deadlines (dict): Seconds per priority class from the first admission attempt to giving up
+        rng (random.Random): Source of backoff jitter
+    """
+
+    def __init__(self, requests_per_minute=None, burst=None, interactive_reserve=None, max_attempts=None,
+                 base_delay=None, max_delay=None, deadlines=None, rng=None):
+        if requests_per_minute is None:
+            requests_per_minute = settings.LLM_REQUESTS_PER_MINUTE
+        burst = burst or settings.LLM_REQUEST_BURST
+        self.bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute else None
+        self.interactive_reserve = (
+            settings.LLM_INTERACTIVE_RESERVE if interactive_reserve is None else interactive_reserve
+        )
+        self.max_attempts = max_attempts or settings.LLM_MAX_ATTEMPTS
+        self.base_delay = base_delay or settings.LLM_RETRY_BASE_DELAY
+        self.max_delay = max_delay or settings.LLM_RETRY_MAX_DELAY
+        self.deadlines = deadlines or {
+            INTERACTIVE: settings.LLM_INTERACTIVE_DEADLINE,
+            BACKGROUND: settings.LLM_BACKGROUND_DEADLINE,
+        }
+        self.rng = rng or random.Random()
+        self.paused_until = 0.0  # time.monotonic() before which nothing is admitted
+        self._waiters = []  # heap of (priority, arrival, future)
+        self._arrivals = itertools.count()
+        self._timer = None
+
+    def observe_headers(self, status_code, headers):
+        """
+        Pause admission as the provider's rate-limit headers ask.
+
+        Args:
+            status_code (int): The response status
+            headers: The response headers
+        """
+        delay = None
+        if status_code == 429:
+            delay = parse_reset(headers.get('retry-after')) or parse_reset(headers.get('x-ratelimit-reset'))
+        elif headers.get('x-ratelimit-remaining') == '0':
+            delay = parse_reset(headers.get('x-ratelimit-reset'))
+        if delay and delay > 0:
+            self.paused_until = max(self.paused_until, time.monotonic() + min(delay, MAX_PAUSE))
+
+    async def call(self, send, priority=INTERACTIVE, timeout=60.0):
+        """
+        Send a request once admitted, retrying transient failures.
+
+        Args:
+            send (callable): Coroutine function taking the attempt's timeout in seconds
+            priority (int): INTERACTIVE or BACKGROUND
+            timeout (float): Longest single attempt in seconds
+
+        Returns:
+            The result of send
+
+        Raises:
+            LLMUnavailable: No attempt succeeded within max_attempts and the deadline
+        """
+        deadline = time.monotonic() + self.deadlines[priority]
+        registry = get_metrics_registry()
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            queued = time.perf_counter()
+            await self.admit(priority, deadline)
+            registry.llm_queue_seconds.observe(time.perf_counter() - queued, priority=PRIORITY_NAMES[priority])
+            try:
+                result = await send(min(timeout, max(deadline - time.monotonic(), 0.001)))
+                registry.llm_attempts.observe(attempt, priority=PRIORITY_NAMES[priority], outcome='ok')
+                return result
+            except openai.APIError as e:
+                error = e
+                if not is_retryable(e):
+                    break
+            delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+            if attempt == self.max_attempts or time.monotonic() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+        registry.llm_attempts.observe(attempt, priority=PRIORITY_NAMES[priority], outcome='error')
+        raise LLMUnavailable(f"LLM request failed after {attempt} attempts: {error}", self.retry_after()) from error
+
+    async def admit(self, priority, deadline):
+        """Wait for this request's turn; interactive requests go before background ones."""
+        if self.paused_until > deadline:
+            raise LLMUnavailable("LLM provider rate limit outlasts the request deadline", self.retry_after())
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise LLMUnavailable("Timed out waiting for the LLM rate limit", self.retry_after()) from None
+
+    def retry_after(self):
+        """Seconds a caller should wait before trying again, when known"""
+        remaining = self.paused_until - time.monotonic()
+        return remaining if remaining > 0 else None
+
+    def _dispatch(self):
+        """Admit waiting requests in priority order for as long as the limits allow."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Gave up waiting
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._admission_delay(priority)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    def _admission_delay(self, priority):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.bucket is None:
+            return 0.0
+        return self.bucket.take(self.interactive_reserve if priority == BACKGROUND else 0)
@@ -0,0 +1,231 @@
+"""Token and latency accounting of LLM calls.
+
+Every chat completion response reports its token usage. UtilsManager
+query_ollama / aquery_ollama pass it to the process-wide UsageRecorder
+together with the call's latency, the @llm_method that made the call and the
+chat session it was made for. The recorder queues the rows and a daemon
+thread writes them to LLMUsage with bulk inserts, so a chat turn never waits
+for its accounting.
+
+The session, case type and conversation state come from the usage scope.
+The chat views open one around each turn with the Django session, whose
+values are read when each call finishes, and report jobs open one with the
+conversation state 'generate_report'. Calls made outside a scope are
+recorded without a session.
+"""
+import atexit
+import contextvars
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Avg, Count, Sum
+from django.utils import timezone
+
+from .metrics import current_llm_method
+from .models import ChatSession, LLMUsage
+
+logger = logging.getLogger(__name__)
+
+# Fields the dashboard groups usage by, with their column titles
+USAGE_DIMENSIONS = (
+    ('case_type', 'Case type'),
+    ('conversation_state', 'Conversation state'),
+    ('call_site', 'Call site'),
+)
+
+_current_scope = contextvars.ContextVar('pobot_usage_scope', default=None)
+
+
+@contextmanager
+def usage_scope(values):
+    """
+    Attribute the LLM calls made inside the block to a chat session.
+
+    Args:
+        values: Mapping with 'chat_session_id', 'case_type' and 'conversation_state',
+                e.g. request.session; read when each call finishes
+    """
+    token = _current_scope.set(values)
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+@contextmanager
+def track_usage(model):
+    """
+    Record the token usage of the LLM call made inside the block.
+
+    Yields:
+        callable: The on_usage callback to pass to the LLM client
+    """
+    reported = []
+    started = time.perf_counter()
+    yield reported.append
+    if reported:
+        get_usage_recorder().record(
+            current_llm_method() or 'query_ollama', model, reported[-1], time.perf_counter() - started
+        )
+
+
+class UsageRecorder:
+    """Queue of LLMUsage rows written in batches by a daemon thread.
+
+    The thread writes as soon as LLM_USAGE_BATCH_SIZE rows are waiting and at
+    the latest LLM_USAGE_FLUSH_INTERVAL seconds after its previous write.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or settings.LLM_USAGE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.LLM_USAGE_FLUSH_INTERVAL
+        self._rows = queue.SimpleQueue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._flush_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="llm-usage-writer", daemon=True)
+        self._thread.start()
+        # Write what is still queued when the process exits
+        atexit.register(self.stop)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record(self, call_site, model, usage, latency):
+        """
+        Queue the usage of one call; returns at once.
+
+        Args:
+            call_site (str): The UtilsManager method that made the call
+            model (str): The model the call asked for
+            usage: The response's usage, with prompt_tokens and completion_tokens
+            latency (float): Seconds the call took
+        """
+        scope = _current_scope.get() or {}
+        self._rows.put(LLMUsage(
+            session_id=scope.get('chat_session_id'),
+            call_site=call_site[:64],
+            model=(model or '')[:100],
+            prompt_tokens=getattr(usage, 'prompt_tokens', None) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', None) or 0,
+            latency_ms=round(latency * 1000),
+            case_type=(scope.get('case_type') or '')[:100],
+            conversation_state=(scope.get('conversation_state') or '')[:50],
+        ))
+        if self._rows.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Write the queued rows now.
+
+        Returns:
+            int: The number of rows taken from the queue
+        """
+        with self._flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(self._rows.get_nowait())
+                except queue.Empty:
+                    break
+            for start in range(0, len(rows), self.batch_size):
+                self._write(rows[start:start + self.batch_size])
+            return len(rows)
+
+    def _write(self, rows):
+        try:
+            with transaction.atomic():
+                LLMUsage.objects.bulk_create(rows)
+        except IntegrityError:
+            # A session was deleted while its rows were queued; keep the other rows
+            session_ids = {row.session_id for row in rows if row.session_id}
+            existing = set(ChatSession.objects.filter(id__in=session_ids).values_list('id', flat=True))
+            LLMUsage.objects.bulk_create([row for row in rows if row.session_id is None or row.session_id in existing])
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # One more write after stop() for the rows queued meanwhile
+            stopping = self._stop.is_set()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write LLM usage rows")
+            finally:
+                close_old_connections()
+
+
+def usage_summary(days=None):
+    """
+    Aggregate the LLM usage of the last LLM_USAGE_DASHBOARD_DAYS days for the dashboard.
+
+    Returns:
+        dict: 'days', 'totals' and one 'groups' entry per USAGE_DIMENSIONS field, whose rows
+              hold key, calls, prompt_tokens, completion_tokens, avg_latency_ms and
+              total_seconds, most prompt tokens first
+    """
+    days = days or settings.LLM_USAGE_DASHBOARD_DAYS
+    recent = LLMUsage.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+    aggregates = {
+        'calls': Count('id'),
+        'prompt_total': Sum('prompt_tokens'),
+        'completion_total': Sum('completion_tokens'),
+        'latency_average': Avg('latency_ms'),
+        'latency_total': Sum('latency_ms'),
+    }
+
+    def rows(field):
+        grouped = recent.values(field).annotate(**aggregates).order_by('-prompt_total', field)
+        return [_summary_row(row, row[field]) for row in grouped]
+
+    return {
+        'days': days,
+        'totals': _summary_row(recent.aggregate(**aggregates), None),
+        'groups': [
+            {'dimension': field, 'title': title, 'rows': rows(field)}
+            for field, title in USAGE_DIMENSIONS
+        ],
+    }
+
+
+def _summary_row(row, key):
+    return {
+        'key': key,
+        'calls': row['calls'],
+        'prompt_tokens': row['prompt_total'] or 0,
+        'completion_tokens': row['completion_total'] or 0,
+        'avg_latency_ms': round(row['latency_average'] or 0),
+        'total_seconds': round((row['latency_total'] or 0) / 1000, 1),
+    }
+
+
+_recorder = None
+_lock = threading.Lock()
+
+
+def get_usage_recorder():
+    """Return the process-wide usage recorder, starting its writer thread on first use."""
+    global _recorder
+    if _recorder is None:
+        with _lock:
+            if _recorder is None:
+                recorder = UsageRecorder()
+                recorder.start()
+                _recorder = recorder
+    return _recorder
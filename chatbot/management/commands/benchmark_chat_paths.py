@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+
+from chatbot.async_views import AsyncChatViewManager
+from chatbot.llm_client import DEFAULT_MODEL, get_llm_client
+from chatbot.models import ChatSession
+from chatbot.views import ChatViewManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare chat turn throughput of the sync and async pipelines. LLM calls are replaced by a "
+        "simulated latency, so only the server side is measured."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turns', type=int, default=200, help='Concurrent chat turns per pipeline.')
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Request threads available to the sync pipeline, like a threaded WSGI worker.',
+        )
+        parser.add_argument('--latency', type=float, default=0.5, help='Simulated seconds per LLM call.')
+        parser.add_argument(
+            '--language',
+            default='English',
+            help='Session language; a non-English language adds the translation calls to each turn.',
+        )
+
+    def handle(self, *args, **options):
+        latency = options['latency']
+        client = get_llm_client()
+
+        async def simulated_acomplete(messages, model=DEFAULT_MODEL, timeout=None):
+            await asyncio.sleep(latency)
+            return "Taiwan"
+
+        # Both pipelines reach the LLM through acomplete on the shared client
+        client.acomplete = simulated_acomplete
+        sessions = []
+        try:
+            sync_requests = self.make_requests(options['turns'], options['language'], sessions)
+            async_requests = self.make_requests(options['turns'], options['language'], sessions)
+
+            sync_seconds, sync_threads = self.run_sync(ChatViewManager(), sync_requests, options['threads'])
+            async_seconds, async_threads = self.run_async(AsyncChatViewManager(), async_requests)
+        finally:
+            del client.acomplete
+            for session in sessions:
+                session.delete()
+
+        turns = options['turns']
+        self.stdout.write(f"{turns} location-detection turns, {latency}s simulated LLM latency, language {options['language']}")
+        self.stdout.write(f"{'pipeline':<8} {'seconds':>8} {'turns/s':>8} {'threads':>8}")
+        for name, seconds, threads in (('sync', sync_seconds, sync_threads), ('async', async_seconds, async_threads)):
+            self.stdout.write(f"{name:<8} {seconds:>8.2f} {turns / seconds:>8.1f} {threads:>8}")
+        self.stdout.write(self.style.SUCCESS(f"Async speed-up: {sync_seconds / async_seconds:.1f}x"))
+
+    def make_requests(self, count, language, sessions):
+        """Requests for one location-detection turn each, on fresh chat sessions."""
+        factory = RequestFactory()
+        requests = []
+        for _ in range(count):
+            session = ChatSession.objects.create(language=language)
+            sessions.append(session)
+            request = factory.post(
+                '/chat/message/', data=json.dumps({'message': "I am working in Taiwan"}), content_type='application/json'
+            )
+            request.session = SessionStore()
+            request.session.update({
+                'initialized': True,
+                'chat_session_id': session.id,
+                'conversation_state': 'location_detection',
+            })
+            requests.append(request)
+        return requests
+
+    def run_sync(self, manager, requests, threads):
+        peak_threads = threading.active_count()
+
+        def turn(request):
+            nonlocal peak_threads
+            try:
+                return manager.chat_message(request)
+            finally:
+                peak_threads = max(peak_threads, threading.active_count())
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(turn, requests))
+        return time.perf_counter() - started, peak_threads
+
+    def run_async(self, manager, requests):
+        peak_threads = threading.active_count()
+
+        async def turns():
+            nonlocal peak_threads
+
+            async def turn(request):
+                nonlocal peak_threads
+                response = await manager.chat_message(request)
+                peak_threads = max(peak_threads, threading.active_count())
+                return response
+
+            return await asyncio.gather(*(turn(request) for request in requests))
+
+        started = time.perf_counter()
+        asyncio.run(turns())
+        return time.perf_counter() - started, peak_threads
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.chat_benchmark import METRICS, ChatTurnBenchmark, check_budgets, load_budgets, load_conversations
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the scripted conversation of each case graph through the chat pipeline against an "
+        "in-process mock LLM and check per-turn wall time, LLM calls, prompt tokens, DB queries "
+        "and peak memory against data/benchmark_budgets.json."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conversation',
+            action='append',
+            dest='names',
+            help='Only run this scripted conversation (may be repeated).',
+        )
+        parser.add_argument('--conversations-file', help='Scripted conversations file to use instead of the default.')
+        parser.add_argument('--budgets-file', help='Budgets file to use instead of the default.')
+        parser.add_argument('--no-budgets', action='store_true', help='Only report the measurements.')
+
+    def handle(self, *args, **options):
+        conversations = (
+            load_conversations(options['conversations_file']) if options['conversations_file'] else load_conversations()
+        )
+        if options['names']:
+            conversations = [c for c in conversations if c['name'] in options['names']]
+            if not conversations:
+                raise CommandError(f"No scripted conversation named {', '.join(options['names'])}")
+
+        results = ChatTurnBenchmark().run(conversations)
+
+        self.stdout.write(f"{'conversation':<34} {'turns':>5}  " + "  ".join(f"{m + ' max':>18}" for m in METRICS))
+        for result in results:
+            maxima = [max((turn[m] for turn in result['turns']), default=0) for m in METRICS]
+            self.stdout.write(
+                f"{result['name']:<34} {len(result['turns']):>5}  " + "  ".join(f"{round(value, 3):>18g}" for value in maxima)
+            )
+
+        if options['no_budgets']:
+            return
+        budgets = load_budgets(options['budgets_file']) if options['budgets_file'] else load_budgets()
+        violations = check_budgets(results, budgets)
+        for violation in violations:
+            self.stderr.write(violation)
+        if violations:
+            raise CommandError(f"{len(violations)} chat turn budgets exceeded")
+        self.stdout.write(self.style.SUCCESS("All chat turns within budget"))
@@ -0,0 +1,130 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from chatbot.models import ChatSession
+
+# One Employer Exploitation conversation, from language detection to the report
+DEFAULT_SCRIPT = [
+    "Hello, I need help with a problem at my work",
+    "I am working in Taiwan",
+    "I am a female worker from Indonesia",
+    "My employer does not pay my overtime and the company keeps my passport",
+    "The factory is Summitex Enterprise Co., Ltd in Chiayi, they make shoes and I work on the assembly line",
+    "I think they supply to Adidas",
+    "My recruitment agency is Global Manpower and there was a broker in Jakarta",
+    "My contract says 8 hours a day but we work 12 hours without overtime pay",
+    "I have photos of my pay slips and messages from the supervisor",
+]
+
+# Sent after the script until the report job starts
+FOLLOW_UP_MESSAGE = "Yes, that is everything I can share."
+
+
+class Command(BaseCommand):
+    help = (
+        "Run scripted conversations through the whole chat pipeline, from language detection to the "
+        "finished report, and report latencies. Meant to run against the mock LLM (run_mock_llm)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=20, help='Number of conversations to run.')
+        parser.add_argument('--concurrency', type=int, default=5, help='Conversations in flight at the same time.')
+        parser.add_argument('--script', help='JSON file with a list of user messages to send in order.')
+        parser.add_argument('--max-turns', type=int, default=20, help='Give up on a conversation after this many turns.')
+        parser.add_argument('--report-timeout', type=float, default=120.0, help='Seconds to wait for each report.')
+        parser.add_argument('--keep', action='store_true', help='Keep the chat sessions instead of deleting them.')
+
+    def handle(self, *args, **options):
+        script = DEFAULT_SCRIPT
+        if options['script']:
+            with open(options['script'], encoding='utf-8') as f:
+                script = json.load(f)
+
+        results = []
+        results_lock = threading.Lock()
+
+        def conversation(_):
+            try:
+                result = self.run_conversation(script, options)
+            finally:
+                connections.close_all()
+            with results_lock:
+                results.append(result)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(conversation, range(options['conversations'])))
+        elapsed = time.perf_counter() - started
+
+        if not options['keep']:
+            ChatSession.objects.filter(id__in=[r['session_id'] for r in results if r['session_id']]).delete()
+
+        turn_seconds = [seconds for r in results for seconds in r['turn_seconds']]
+        report_seconds = [r['report_seconds'] for r in results if r['report_seconds'] is not None]
+        errors = sum(r['errors'] for r in results)
+
+        self.stdout.write(
+            f"{len(results)} conversations, {len(turn_seconds)} turns in {elapsed:.2f}s "
+            f"({len(turn_seconds) / elapsed:.1f} turns/s), {errors} errors"
+        )
+        self.write_latencies("turn", turn_seconds)
+        self.write_latencies("report", report_seconds)
+        completed = len(report_seconds)
+        style = self.style.SUCCESS if completed == len(results) and not errors else self.style.WARNING
+        self.stdout.write(style(f"Reports completed: {completed}/{len(results)}"))
+
+    def run_conversation(self, script, options):
+        """Send the script, follow up until the report starts, then poll the report job."""
+        client = Client(HTTP_HOST='127.0.0.1')
+        result = {'session_id': None, 'turn_seconds': [], 'report_seconds': None, 'errors': 0}
+        report_job = None
+
+        for turn in range(options['max_turns']):
+            message = script[turn] if turn < len(script) else FOLLOW_UP_MESSAGE
+            started = time.perf_counter()
+            response = client.post(
+                reverse('chat_message'),
+                {'message': message, 'new_session': turn == 0},
+                content_type='application/json',
+            )
+            result['turn_seconds'].append(time.perf_counter() - started)
+            result['session_id'] = client.session.get('chat_session_id')
+            if response.status_code != 200:
+                result['errors'] += 1
+                continue
+            report_job = json.loads(response.content).get('report_job')
+            if report_job:
+                break
+
+        if not report_job:
+            return result
+
+        started = time.perf_counter()
+        while time.perf_counter() - started < options['report_timeout']:
+            status = json.loads(client.get(report_job['status_url']).content)
+            if status['status'] in ('succeeded', 'failed'):
+                if status['complete']:
+                    result['report_seconds'] = time.perf_counter() - started
+                else:
+                    result['errors'] += 1
+                break
+            time.sleep(0.2)
+        return result
+
+    def write_latencies(self, name, seconds):
+        if not seconds:
+            self.stdout.write(f"{name:<7} no samples")
+            return
+        ordered = sorted(seconds)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f"{name:<7} p50 {statistics.median(ordered):.3f}s  p95 {p95:.3f}s  max {ordered[-1]:.3f}s  (n={len(ordered)})"
+        )
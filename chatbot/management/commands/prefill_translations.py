@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.responses import SUPPORTED_LANGUAGES, fixed_response_catalog
+from chatbot.translation_memory import get_translation_memory
+from chatbot.utils import UtilsManager
+
+
+class Command(BaseCommand):
+    help = "Translate the fixed bot responses into every supported language and store them in the translation memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--language',
+            action='append',
+            dest='languages',
+            help='Only prefill this language (may be repeated). Defaults to all supported languages.',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-translate entries that are already in the translation memory.',
+        )
+
+    def handle(self, *args, **options):
+        languages = options['languages'] or SUPPORTED_LANGUAGES
+        memory = get_translation_memory()
+        utils_manager = UtilsManager()
+
+        translated = 0
+        skipped = 0
+        for language in languages:
+            pending = [
+                text for text in fixed_response_catalog()
+                if options['force'] or memory.lookup(text, language) is None
+            ]
+            skipped += len(fixed_response_catalog()) - len(pending)
+
+            # Translate this language's missing entries concurrently, then store them
+            results = utils_manager.run_concurrently(*[
+                (lambda text=text: utils_manager.translation_from_English(text, language, use_memory=False))
+                for text in pending
+            ])
+            for text, translation in zip(pending, results):
+                memory.store(text, language, translation)
+                translated += 1
+            self.stdout.write(f"{language}: {len(pending)} translated")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Translation memory prefilled: {translated} translated, {skipped} already present"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.dashboard_stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard statistics counters from sessions, buyer companies and policy violations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per database round trip (default: 2000).',
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Dashboard statistics rebuilt: {written} counters"))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.mock_llm import MOCK_LLM_RULES_PATH, MockLLMServer, RecordingStore, load_rules
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local OpenAI-compatible stand-in for OpenRouter that replays recorded responses and "
+        "synthesises the rest. Point OPENROUTER_BASE_URL at the printed URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--recordings', help='JSON Lines file of recorded responses to replay (and to record into).')
+        parser.add_argument(
+            '--upstream',
+            help='Forward requests without a recording to this base URL (e.g. https://openrouter.ai/api/v1) '
+                 'and record the responses.',
+        )
+        parser.add_argument(
+            '--on-miss',
+            choices=['synthesize', 'error'],
+            default='synthesize',
+            help='What to answer when a prompt has no recording and there is no upstream.',
+        )
+        parser.add_argument('--rules', default=str(MOCK_LLM_RULES_PATH), help='Synthesis rules file.')
+        parser.add_argument('--synth-tokens', type=int, default=40, help='Length of synthesised filler responses.')
+        parser.add_argument(
+            '--latency',
+            default='fixed:0',
+            help="Time to first token: 'fixed:S', 'uniform:MIN,MAX' or 'lognormal:MU,SIGMA' (seconds).",
+        )
+        parser.add_argument('--tokens-per-second', type=float, default=0.0, help='Output rate; 0 answers at once.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests that fail.')
+        parser.add_argument('--error-status', type=int, default=500, help='HTTP status of injected failures.')
+        parser.add_argument('--seed', type=int, help='Seed for latencies and injected errors.')
+
+    def handle(self, *args, **options):
+        store = RecordingStore(options['recordings'])
+        server = MockLLMServer(
+            (options['host'], options['port']),
+            store=store,
+            latency=options['latency'],
+            tokens_per_second=options['tokens_per_second'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            on_miss=options['on_miss'],
+            synth_tokens=options['synth_tokens'],
+            rules=load_rules(options['rules']) if options['rules'] else (),
+            upstream=options['upstream'],
+            seed=options['seed'],
+        )
+        self.stdout.write(f"Mock LLM serving {len(store)} recorded responses at {server.base_url}")
+        # Without lifting the client-side rate limit a load test measures the limit, not the app
+        self.stdout.write(f"Use it with OPENROUTER_BASE_URL={server.base_url} LLM_REQUESTS_PER_MINUTE=0")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping mock LLM")
+        finally:
+            server.server_close()
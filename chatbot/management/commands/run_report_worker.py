@@ -0,0 +1,42 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot.report_jobs import ReportWorkerPool, get_report_queue
+
+
+class Command(BaseCommand):
+    help = "Run background report generation jobs (use with REPORT_WORKER_MODE=external)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            help='Number of worker threads. Defaults to REPORT_WORKER_THREADS.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are runnable now one after another, then exit.',
+        )
+
+    def handle(self, *args, **options):
+        queue = get_report_queue()
+        name_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        if options['once']:
+            count = queue.run_pending(worker_name=name_prefix)
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} report jobs"))
+            return
+
+        pool = ReportWorkerPool(queue, threads=options['threads'], name_prefix=name_prefix)
+        pool.start()
+        self.stdout.write(f"Report worker {name_prefix} running with {pool.threads} threads")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping report worker")
+            pool.stop()
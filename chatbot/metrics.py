@@ -0,0 +1,338 @@
+"""In-process request metrics and per-session request traces.
+
+RequestMetricsMiddleware opens a RequestTrace for every request and keeps it
+in a context variable. While it is open, timed() spans from the code below
+are added to the trace and to the process-wide histograms:
+
+- LLM calls (UtilsManager.query_ollama / aquery_ollama), labelled by the
+  UtilsManager method marked with @llm_method that made them, plus their
+  admission wait and attempts in the LLM scheduler
+- knowledge base retrieval (relevant_context)
+- PDF rendering
+- database queries, through an execute wrapper installed on every connection
+
+The histograms are served in the Prometheus text format by the metrics view,
+and the last traces of each chat session by the session trace view. Both
+are per process: with several workers each one reports its own numbers.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Queries per request
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Attempts per LLM request
+ATTEMPT_BUCKETS = (1, 2, 3, 4, 5, 10)
+
+_current_trace = contextvars.ContextVar('pobot_request_trace', default=None)
+_current_llm_method = contextvars.ContextVar('pobot_llm_method', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        """Return {label values: {'counts', 'sum', 'count'}} copied under the lock."""
+        with self._lock:
+            return {key: {**series, 'counts': list(series['counts'])} for key, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, series['counts'] + [series['count']]):
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{suffix} {series['count']}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """The histograms of this process, by name."""
+
+    def __init__(self):
+        self.request_seconds = Histogram(
+            'pobot_request_seconds', "Time to produce a response, by view.", ('view', 'method'))
+        self.llm_call_seconds = Histogram(
+            'pobot_llm_call_seconds', "LLM call latency, by UtilsManager method.", ('method', 'outcome'))
+        self.llm_queue_seconds = Histogram(
+            'pobot_llm_queue_seconds', "Time LLM requests wait for admission, by priority class.", ('priority',))
+        self.llm_attempts = Histogram(
+            'pobot_llm_attempts', "Attempts per LLM request, by priority class.", ('priority', 'outcome'), ATTEMPT_BUCKETS)
+        self.retrieval_seconds = Histogram(
+            'pobot_retrieval_seconds', "Knowledge base retrieval time.", ('operation',))
+        self.pdf_render_seconds = Histogram(
+            'pobot_pdf_render_seconds', "PDF report render time.", ('operation',))
+        self.db_queries = Histogram(
+            'pobot_db_queries_per_request', "Database queries per request, by view.", ('view',), COUNT_BUCKETS)
+        self.db_seconds = Histogram(
+            'pobot_db_seconds_per_request', "Database time per request, by view.", ('view',))
+        self._span_histograms = {
+            'llm': self.llm_call_seconds,
+            'retrieval': self.retrieval_seconds,
+            'pdf': self.pdf_render_seconds,
+        }
+
+    def histograms(self):
+        return [
+            self.request_seconds, self.llm_call_seconds, self.llm_queue_seconds, self.llm_attempts, self.retrieval_seconds,
+            self.pdf_render_seconds, self.db_queries, self.db_seconds,
+        ]
+
+    def observe_span(self, kind, name, seconds, outcome):
+        histogram = self._span_histograms[kind]
+        if kind == 'llm':
+            histogram.observe(seconds, method=name, outcome=outcome)
+        else:
+            histogram.observe(seconds, operation=name)
+
+    def render(self):
+        """The histograms in the Prometheus text exposition format."""
+        return "\n".join(histogram.render() for histogram in self.histograms()) + "\n"
+
+
+class RequestTrace:
+    """Timings of one request: its spans plus database query count and time."""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.view = None
+        self.status = None
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_span(self, kind, name, seconds, started, outcome):
+        with self._lock:
+            self.spans.append({
+                'kind': kind,
+                'name': name,
+                'offset': round(started - self._started, 6),
+                'seconds': round(seconds, 6),
+                'outcome': outcome,
+            })
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._started
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'path': self.path,
+                'view': self.view,
+                'status': self.status,
+                'started_at': self.started_at,
+                'seconds': round(self.seconds, 6) if self.seconds is not None else None,
+                'db_queries': self.db_queries,
+                'db_seconds': round(self.db_seconds, 6),
+                'spans': list(self.spans),
+            }
+
+
+class TraceStore:
+    """The last METRICS_TRACES_PER_SESSION request traces of the most recent chat sessions."""
+
+    def __init__(self, per_session=None, max_sessions=None):
+        self.per_session = per_session or settings.METRICS_TRACES_PER_SESSION
+        self.max_sessions = max_sessions or settings.METRICS_TRACE_SESSIONS
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session_id, trace):
+        with self._lock:
+            traces = self._traces.pop(session_id, None) or deque(maxlen=self.per_session)
+            traces.append(trace)
+            self._traces[session_id] = traces
+            while len(self._traces) > self.max_sessions:
+                self._traces.popitem(last=False)
+
+    def get(self, session_id):
+        """Return the session's traces as dicts, oldest first."""
+        with self._lock:
+            traces = list(self._traces.get(session_id, ()))
+        return [trace.as_dict() for trace in traces]
+
+
+def current_trace():
+    """The trace of the request being handled, or None outside a request."""
+    return _current_trace.get()
+
+
+def current_llm_method():
+    """The label of the @llm_method currently running, or None."""
+    return _current_llm_method.get()
+
+
+def start_trace(trace):
+    """Make trace the current one; returns a token for end_trace."""
+    return _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def record_span(kind, name, seconds, started, outcome='ok'):
+    """Add a timed operation to the histograms and to the current request trace."""
+    get_metrics_registry().observe_span(kind, name, seconds, outcome)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(kind, name, seconds, started, outcome)
+
+
+@contextmanager
+def timed(kind, name):
+    """
+    Time a block as a span.
+
+    Args:
+        kind (str): 'llm', 'retrieval' or 'pdf'
+        name (str): The operation, e.g. the UtilsManager method
+    """
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        record_span(kind, name, time.perf_counter() - started, started, outcome)
+
+
+@contextmanager
+def llm_call():
+    """Time one LLM call, labelled by the @llm_method currently running."""
+    with timed('llm', current_llm_method() or 'query_ollama'):
+        yield
+
+
+@contextmanager
+def llm_label(label):
+    """Label the LLM calls made inside the block, as @llm_method does for a method; None keeps the current label."""
+    if label is None:
+        yield
+        return
+    token = _current_llm_method.set(label)
+    try:
+        yield
+    finally:
+        _current_llm_method.reset(token)
+
+
+def llm_method(label):
+    """
+    Label the LLM calls made inside a UtilsManager method.
+
+    Args:
+        label (str): The method name to report; async variants use their sync name
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                token = _current_llm_method.set(label)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _current_llm_method.reset(token)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _current_llm_method.set(label)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _current_llm_method.reset(token)
+        return wrapper
+    return decorator
+
+
+def query_timer(execute, sql, params, many, context):
+    """Database execute wrapper that adds each query to the current request trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.add_query(time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver: time the queries of every new database connection."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+_registry = None
+_trace_store = None
+_lock = threading.Lock()
+
+
+def get_metrics_registry():
+    """Return the process-wide metrics registry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
+
+
+def get_trace_store():
+    """Return the process-wide per-session trace store, creating it on first use."""
+    global _trace_store
+    if _trace_store is None:
+        with _lock:
+            if _trace_store is None:
+                _trace_store = TraceStore()
+    return _trace_store
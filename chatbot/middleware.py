@@ -0,0 +1,73 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import RequestTrace, end_trace, get_metrics_registry, get_trace_store, start_trace
+
+
+class RequestMetricsMiddleware:
+    """
+    Record request latency and database usage, and keep a trace of each chat request.
+
+    Spans recorded while the request runs (LLM calls, retrieval, PDF rendering)
+    land in the same trace. For streamed responses the trace is closed when
+    the stream ends rather than when the view returns.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trace = RequestTrace(request.method, request.path)
+        token = start_trace(trace)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_trace(token)
+        return self.finish(request, trace, response)
+
+    async def __acall__(self, request):
+        trace = RequestTrace(request.method, request.path)
+        token = start_trace(trace)
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_trace(token)
+        return self.finish(request, trace, response)
+
+    def finish(self, request, trace, response):
+        match = getattr(request, 'resolver_match', None)
+        trace.view = match.url_name if match and match.url_name else 'unmatched'
+        trace.status = response.status_code
+
+        # Only requests that belong to a chat session are kept as traces. The session is read only
+        # when the view already loaded it: this middleware runs outside SessionMiddleware, and
+        # loading it here would be an extra query, a sync one on the event loop under ASGI
+        session = getattr(request, 'session', None)
+        session_id = session.get('chat_session_id') if session is not None and session.accessed else None
+        if session_id:
+            get_trace_store().add(session_id, trace)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.close_after(response.streaming_content, request, trace)
+        else:
+            self.observe(request, trace)
+        return response
+
+    def close_after(self, content, request, trace):
+        try:
+            yield from content
+        finally:
+            self.observe(request, trace)
+
+    def observe(self, request, trace):
+        trace.finish()
+        registry = get_metrics_registry()
+        registry.request_seconds.observe(trace.seconds, view=trace.view, method=request.method)
+        registry.db_queries.observe(trace.db_queries, view=trace.view)
+        registry.db_seconds.observe(trace.db_seconds, view=trace.view)
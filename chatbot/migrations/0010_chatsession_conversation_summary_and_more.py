@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0009_chatsession_industrial_sector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='conversation_summary',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary_message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0011_translationmemory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyercompany',
+            index=models.Index(fields=['session', 'name'], name='buyercompany_session_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['-created_at', '-id'], name='chatsession_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['case_type', '-created_at', '-id'], name='chatsession_case_created_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:10
+
+import json
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def _as_list(text):
+    """Decode a JSON list column, which is still stored as text at this point."""
+    try:
+        value = json.loads(text) if text else []
+    except json.JSONDecodeError:
+        return []
+    return value if isinstance(value, list) else []
+
+
+def build_dashboard_stats(apps, schema_editor):
+    """Count the existing rows with the historical models; mirrors dashboard_stats.rebuild_stats as of this migration."""
+    ChatSession = apps.get_model('chatbot', 'ChatSession')
+    BuyerCompany = apps.get_model('chatbot', 'BuyerCompany')
+    PolicyViolation = apps.get_model('chatbot', 'PolicyViolation')
+    DashboardStat = apps.get_model('chatbot', 'DashboardStat')
+
+    totals = Counter()
+    sessions = ChatSession.objects.values_list(
+        'created_at', 'location', 'industrial_sector', 'nationality', 'gender', 'case_type', 'factory_name'
+    )
+    for created_at, location, industrial_sector, nationality, gender, case_type, factory_name in sessions.iterator(chunk_size=2000):
+        totals.update([
+            ('total', 'sessions'),
+            ('location', location or 'Unknown'),
+            ('industry', industrial_sector or 'Other'),
+            ('demographic', f"{nationality or 'Unknown'} - {gender or 'Unknown'}"),
+            ('case_type', case_type or 'Unclassified'),
+            ('factory', factory_name or ''),
+        ])
+        if created_at:
+            totals[('day', created_at.date().isoformat())] += 1
+
+    for name in BuyerCompany.objects.values_list('name', flat=True).iterator(chunk_size=2000):
+        totals[('company', name)] += 1
+
+    violations = PolicyViolation.objects.values_list('buyer_company', 'incidents', 'policy_violations')
+    for buyer_company, incidents, policy_violations in violations.iterator(chunk_size=2000):
+        totals[('total', 'violations')] += 1
+        totals[('company_violations', buyer_company)] += 1
+        totals[('total', 'incidents')] += len(_as_list(incidents))
+        for policy_violation in _as_list(policy_violations):
+            category = policy_violation.get('policy_category') if isinstance(policy_violation, dict) else None
+            if not isinstance(category, str):
+                category = None
+            totals[('category', (category or 'General Violation')[:255])] += 1
+
+    DashboardStat.objects.bulk_create(
+        [DashboardStat(dimension=dimension, key=key, count=count) for (dimension, key), count in totals.items() if count],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0012_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('dimension', 'key')},
+            },
+        ),
+        migrations.RunPython(build_dashboard_stats, migrations.RunPython.noop),
+    ]
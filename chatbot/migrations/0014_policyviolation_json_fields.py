@@ -0,0 +1,103 @@
+# Generated manually
+
+import json
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def parse_list(value):
+    """Decode a JSON list stored as text. A single object becomes a one-item list; anything else an empty list."""
+    if not value:
+        return [], False
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return [], True
+    if isinstance(parsed, dict):
+        return [parsed], False
+    return (parsed, False) if isinstance(parsed, list) else ([], True)
+
+
+def iterate_in_batches(queryset):
+    """Yield lists of rows ordered by primary key, one bounded query per batch."""
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def copy_text_to_json(apps, schema_editor):
+    PolicyViolation = apps.get_model('chatbot', 'PolicyViolation')
+    rows = PolicyViolation.objects.using(schema_editor.connection.alias).only('pk', 'incidents', 'policy_violations')
+
+    malformed = 0
+    for batch in iterate_in_batches(rows):
+        for violation in batch:
+            violation.incidents_data, bad_incidents = parse_list(violation.incidents)
+            violation.policy_violations_data, bad_violations = parse_list(violation.policy_violations)
+            malformed += bad_incidents or bad_violations
+        PolicyViolation.objects.using(schema_editor.connection.alias).bulk_update(
+            batch, ['incidents_data', 'policy_violations_data']
+        )
+
+    if malformed:
+        print(f"\n  {malformed} policy violation(s) had malformed incidents/policy_violations JSON; stored as empty lists")
+
+
+def copy_json_to_text(apps, schema_editor):
+    PolicyViolation = apps.get_model('chatbot', 'PolicyViolation')
+    rows = PolicyViolation.objects.using(schema_editor.connection.alias).only('pk', 'incidents_data', 'policy_violations_data')
+
+    for batch in iterate_in_batches(rows):
+        for violation in batch:
+            violation.incidents = json.dumps(violation.incidents_data or [])
+            violation.policy_violations = json.dumps(violation.policy_violations_data or [])
+        PolicyViolation.objects.using(schema_editor.connection.alias).bulk_update(
+            batch, ['incidents', 'policy_violations']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0013_dashboardstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policyviolation',
+            name='incidents_data',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='policyviolation',
+            name='policy_violations_data',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(copy_text_to_json, copy_json_to_text),
+        migrations.RemoveField(
+            model_name='policyviolation',
+            name='incidents',
+        ),
+        migrations.RemoveField(
+            model_name='policyviolation',
+            name='policy_violations',
+        ),
+        migrations.RenameField(
+            model_name='policyviolation',
+            old_name='incidents_data',
+            new_name='incidents',
+        ),
+        migrations.RenameField(
+            model_name='policyviolation',
+            old_name='policy_violations_data',
+            new_name='policy_violations',
+        ),
+    ]
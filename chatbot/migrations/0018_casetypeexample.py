@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0016_llmusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseTypeExample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('case_type', models.CharField(max_length=100)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['case_type', '-created_at'], name='casetypeexample_type_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,315 @@
+"""Local OpenAI-compatible stand-in for OpenRouter, for offline benchmarks.
+
+Point OPENROUTER_BASE_URL at a running MockLLMServer (see the run_mock_llm
+command) and every LLM call of the app goes to it instead of the live API.
+Each chat completion request is keyed by a hash of its model and messages:
+
+- a recorded response for that key is replayed;
+- otherwise a response is synthesised: the first rule whose text appears in
+  the prompt (see data/mock_llm_rules.json) or filler text, or the request
+  fails if the server was started with on_miss='error';
+- with an upstream URL the request is forwarded there instead, and the
+  response is recorded for later replays.
+
+Replayed and synthesised responses are both delivered with the configured
+latency distribution and token rate, and a configurable share of requests
+fails, so runs are repeatable for a given seed.
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MOCK_LLM_RULES_PATH = Path(__file__).resolve().parent / "data" / "mock_llm_rules.json"
+
+# Text synthesised responses are cut from
+FILLER_TEXT = (
+    "Thank you for sharing this with me. I understand that this situation is difficult. "
+    "Could you tell me a little more about what happened, when it started and who was involved? "
+    "Any details you remember will help us understand your case and the options you have."
+)
+
+# Characters per token used to size synthesised responses and pace streams
+CHARS_PER_TOKEN = 4
+
+
+def prompt_key(model, messages):
+    """Stable hash of a chat completion request, used to look up recordings."""
+    payload = json.dumps({'model': model, 'messages': messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def usage_for(messages, text):
+    """Approximate OpenAI-style token usage of a request and its response."""
+    prompt_tokens = sum(len(str(message.get('content', ''))) for message in messages) // CHARS_PER_TOKEN
+    completion_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+    }
+
+
+def load_rules(path=MOCK_LLM_RULES_PATH):
+    """Load synthesis rules: a "rules" list of {contains, response} objects."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)["rules"]
+
+
+class LatencyModel:
+    """Time to first token drawn from a distribution given as 'kind:args'.
+
+    Supported specs: 'fixed:0.5', 'uniform:0.2,0.8' and 'lognormal:mu,sigma'
+    (the parameters of the underlying normal distribution, in log-seconds).
+    """
+
+    def __init__(self, spec='fixed:0'):
+        kind, _, args = spec.partition(':')
+        try:
+            params = [float(arg) for arg in args.split(',')] if args else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        arity = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if kind not in arity or len(params) != arity[kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng):
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return rng.uniform(*self.params)
+        return rng.lognormvariate(*self.params)
+
+
+class RecordingStore:
+    """Recorded responses in a JSON Lines file, one {key, model, response} object per line.
+
+    A key recorded several times replays its responses in order and then
+    keeps returning the last one.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._responses = {}
+        self._replayed = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            with self.path.open(encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses.setdefault(entry['key'], []).append(entry['response'])
+
+    def __len__(self):
+        return sum(len(responses) for responses in self._responses.values())
+
+    def lookup(self, key):
+        """Return the next recorded response for a key, or None if there is none."""
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            return responses[min(index, len(responses) - 1)]
+
+    def record(self, key, model, messages, response):
+        """Add a response for a key and append it to the file."""
+        with self._lock:
+            self._responses.setdefault(key, []).append(response)
+            if self.path:
+                entry = {'key': key, 'model': model, 'prompt': messages[-1]['content'][:200], 'response': response}
+                with self.path.open('a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible chat completions server backed by recordings.
+
+    Args:
+        address (tuple): (host, port) to listen on; port 0 picks a free port
+        store (RecordingStore): Recorded responses to replay
+        latency (str): Time to first token spec for LatencyModel
+        tokens_per_second (float): Output rate; 0 sends the whole response at once
+        error_rate (float): Share of requests answered with error_status
+        error_status (int): HTTP status of injected errors
+        on_miss (str): 'synthesize' or 'error' for requests without a recording
+        synth_tokens (int): Length of synthesised filler responses
+        rules (list): {contains, response} rules tried before filler text
+        upstream (str): Base URL to forward unrecorded requests to, recording the responses
+        seed (int): Seed for latencies and injected errors
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, store=None, latency='fixed:0', tokens_per_second=0.0, error_rate=0.0,
+                 error_status=500, on_miss='synthesize', synth_tokens=40, rules=(), upstream=None, seed=None):
+        super().__init__(address, MockLLMHandler)
+        self.store = store or RecordingStore()
+        self.latency = LatencyModel(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.on_miss = on_miss
+        self.synth_tokens = synth_tokens
+        self.rules = list(rules)
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._calls = 0
+        self._prompt_tokens = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def draw(self, messages):
+        """Count one request and decide its latency and whether it fails."""
+        prompt_tokens = usage_for(messages, '')['prompt_tokens']
+        with self._rng_lock:
+            self._calls += 1
+            self._prompt_tokens += prompt_tokens
+            return self.latency.sample(self._rng), self._rng.random() < self.error_rate
+
+    def usage(self):
+        """Return (chat completion requests, approximate prompt tokens) served so far."""
+        with self._rng_lock:
+            return self._calls, self._prompt_tokens
+
+    def synthesize(self, messages):
+        prompt = messages[-1].get('content', '') if messages else ''
+        for rule in self.rules:
+            if rule['contains'] in prompt:
+                return rule['response']
+
+        length = self.synth_tokens * CHARS_PER_TOKEN
+        return " ".join([FILLER_TEXT] * (length // len(FILLER_TEXT) + 1))[:length].strip()
+
+    def forward(self, body, authorization):
+        """Send a request upstream without streaming and return the response text."""
+        response = httpx.post(
+            f"{self.upstream}/chat/completions",
+            json={**body, 'stream': False},
+            headers={'Authorization': authorization or ''},
+            timeout=120,
+        )
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+
+    def respond(self, body, authorization=None):
+        """
+        Resolve the response text of a chat completion request.
+
+        Returns:
+            str or None: The text, or None when there is no recording and on_miss is 'error'
+        """
+        key = prompt_key(body.get('model'), body.get('messages', []))
+        text = self.store.lookup(key)
+        if text is None and self.upstream:
+            text = self.forward(body, authorization)
+            self.store.record(key, body.get('model'), body.get('messages', []), text)
+        if text is None and self.on_miss == 'synthesize':
+            text = self.synthesize(body.get('messages', []))
+        return text
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Serves POST .../chat/completions, streamed or not."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self.send_json(404, {'error': {'message': f"Unknown path {self.path}"}})
+
+        latency, failed = self.server.draw(body.get('messages', []))
+        time.sleep(latency)
+        if failed:
+            return self.send_json(self.server.error_status, {'error': {'message': "Injected mock error"}})
+        try:
+            text = self.server.respond(body, self.headers.get('Authorization'))
+        except httpx.HTTPError as e:
+            return self.send_json(502, {'error': {'message': f"Upstream request failed: {e}"}})
+        if text is None:
+            return self.send_json(404, {'error': {'message': "No recorded response for this prompt"}})
+
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        usage = usage_for(body.get('messages', []), text)
+        if body.get('stream'):
+            include_usage = (body.get('stream_options') or {}).get('include_usage')
+            self.send_stream(completion_id, body.get('model'), text, usage if include_usage else None)
+        else:
+            if self.server.tokens_per_second:
+                time.sleep(len(text) / CHARS_PER_TOKEN / self.server.tokens_per_second)
+            self.send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': text},
+                    'finish_reason': 'stop',
+                }],
+                'usage': usage,
+            })
+
+    def send_json(self, status, data):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_stream(self, completion_id, model, text, usage=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        delay = 1 / self.server.tokens_per_second if self.server.tokens_per_second else 0
+        pieces = [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+        for piece in pieces:
+            self.send_chunk(completion_id, model, {'content': piece}, None)
+            time.sleep(delay)
+        self.send_chunk(completion_id, model, {}, 'stop')
+        if usage is not None:
+            # Requested with stream_options.include_usage: a last chunk without choices
+            self.send_chunk(completion_id, model, None, None, usage=usage)
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def send_chunk(self, completion_id, model, delta, finish_reason, usage=None):
+        chunk = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [] if delta is None else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+        if usage is not None:
+            chunk['usage'] = usage
+        self.write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+    def write_chunk(self, data):
+        # HTTP/1.1 chunked framing keeps the connection reusable by the client's pool
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
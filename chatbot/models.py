@@ -1,8 +1,10 @@
 import uuid
-import json
-from django.db import models
+from django.db import connections, models
+from django.utils import timezone
 
-class ChatSession(models.Model):
+from .dashboard_stats import DashboardStatsModel
+
+class ChatSession(DashboardStatsModel):
     user_name = models.CharField(max_length=255, null=True, blank=True)
     language = models.CharField(max_length=100, null=True, blank=True)
     location = models.CharField(max_length=255, null=True, blank=True)
@@ -17,14 +19,28 @@ class ChatSession(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     case_type = models.CharField(max_length=100, null=True, blank=True)
     incident_description = models.TextField(null=True, blank=True)
+    conversation_summary = models.TextField(null=True, blank=True)  # Rolling summary of older messages
+    summary_message_count = models.PositiveIntegerField(default=0)  # Number of messages folded into the summary
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of the dashboard, optionally narrowed to one case type
+            models.Index(fields=['-created_at', '-id'], name='chatsession_created_id_idx'),
+            models.Index(fields=['case_type', '-created_at', '-id'], name='chatsession_case_created_idx'),
+        ]
     
     def __str__(self):
         return f"Session {self.id} - {self.factory_name or 'Unknown'}"
 
-class BuyerCompany(models.Model):
+class BuyerCompany(DashboardStatsModel):
     session = models.ForeignKey(ChatSession, related_name='buyer_companies', on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'name'], name='buyercompany_session_name_idx'),
+        ]
+    
     def __str__(self):
         return self.name
 
@@ -40,34 +56,166 @@ class ChatMessage(models.Model):
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
 
-class PolicyViolation(models.Model):
+class JSONArrayLength(models.Func):
+    """Number of elements in a JSON array column, computed in the database."""
+    function = 'JSON_ARRAY_LENGTH'
+    output_field = models.IntegerField()
+    
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='JSONB_ARRAY_LENGTH', **extra_context)
+
+class PolicyViolationQuerySet(models.QuerySet):
+    def category_counts(self):
+        """
+        Count policy violations per policy category in the database.
+        
+        Returns:
+            dict: policy_category -> count, most frequent first ("General Violation" when the category is missing)
+        """
+        connection = connections[self.db]
+        if connection.vendor == 'sqlite':
+            elements = "json_each(pv.{column}) AS element"
+            # element.value of a string element is bare text, which json_extract would reject
+            category = "CASE WHEN element.type = 'object' THEN json_extract(element.value, '$.policy_category') END"
+        elif connection.vendor == 'postgresql':
+            elements = "jsonb_array_elements(pv.{column}) AS element(value)"
+            category = "element.value ->> 'policy_category'"
+        else:
+            # No JSON table function wired up for this backend; count in Python
+            counts = {}
+            for policy_violations in self.values_list('policy_violations', flat=True):
+                for policy_violation in policy_violations or []:
+                    key = (policy_violation.get('policy_category') if isinstance(policy_violation, dict) else None) or 'General Violation'
+                    counts[key] = counts.get(key, 0) + 1
+            return dict(sorted(counts.items(), key=lambda item: -item[1]))
+        
+        quote = connection.ops.quote_name
+        subquery, params = self.values('pk').query.sql_with_params()
+        sql = (
+            f"SELECT COALESCE({category}, 'General Violation') AS category, COUNT(*) AS total "
+            f"FROM {quote(self.model._meta.db_table)} AS pv, {elements.format(column=quote('policy_violations'))} "
+            f"WHERE pv.{quote('id')} IN ({subquery}) "
+            f"GROUP BY 1 ORDER BY total DESC, category"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return dict(cursor.fetchall())
+
+class PolicyViolation(DashboardStatsModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     session = models.ForeignKey(ChatSession, related_name='violations', on_delete=models.CASCADE)
     buyer_company = models.CharField(max_length=255)
     violation_text = models.TextField()
     complaint_summary = models.TextField(blank=True, null=True)
-    incidents = models.TextField(blank=True, null=True)  # JSON string of incidents list
-    policy_violations = models.TextField(blank=True, null=True)  # JSON string of policy violations list
+    incidents = models.JSONField(default=list, blank=True)  # List of incident descriptions
+    policy_violations = models.JSONField(default=list, blank=True)  # List of {policy_category, ...} dicts
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PolicyViolationQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.buyer_company} - {self.session.id}"
     
     def get_incidents_list(self):
-        """Parse the incidents JSON string into a Python list"""
-        if not self.incidents:
-            return []
-        try:
-            return json.loads(self.incidents)
-        except json.JSONDecodeError:
-            return []
+        """Return the incidents as a list"""
+        return self.incidents if isinstance(self.incidents, list) else []
     
     def get_violations_list(self):
-        """Parse the policy_violations JSON string into a Python list"""
-        if not self.policy_violations:
-            return []
-        try:
-            return json.loads(self.policy_violations)
-        except json.JSONDecodeError:
-            return []
+        """Return the policy violations as a list"""
+        return self.policy_violations if isinstance(self.policy_violations, list) else []
+
+class TranslationMemory(models.Model):
+    source_hash = models.CharField(max_length=64)  # sha256 of the normalized source text
+    source_text = models.TextField()
+    language = models.CharField(max_length=100)  # normalized target language
+    translation = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('source_hash', 'language')
+    
+    def __str__(self):
+        return f"{self.language}: {self.source_text[:50]}..."
+
+class CaseTypeExample(models.Model):
+    """A problem description whose case type staff have confirmed; trains the case type classifier."""
+    case_type = models.CharField(max_length=100)
+    text = models.TextField()  # The description in English, as the user wrote it
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['case_type', '-created_at'], name='casetypeexample_type_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.case_type}: {self.text[:50]}..."
+
+class DashboardStat(models.Model):
+    dimension = models.CharField(max_length=50)  # e.g. 'day', 'company', 'category'; see dashboard_stats.DIMENSIONS
+    key = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('dimension', 'key')
+    
+    def __str__(self):
+        return f"{self.dimension}:{self.key} = {self.count}"
+
+class ReportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.ForeignKey(ChatSession, related_name='report_jobs', on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    payload = models.JSONField(default=dict, blank=True)  # history and prompt_history captured at enqueue time
+    result_message = models.TextField(blank=True, null=True)  # Bot message shown when the job finishes
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True, null=True)
+    run_after = models.DateTimeField(default=timezone.now)  # Not picked up before this time (retry backoff)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)  # A running job past its lease is retried
+    worker = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='reportjob_status_run_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Report job {self.id} ({self.status}) for session {self.session_id}"
+
+class LLMUsage(models.Model):
+    """Token usage and latency of one LLM call; rows are only ever appended, in batches."""
+    session = models.ForeignKey(ChatSession, related_name='llm_usage', on_delete=models.CASCADE, null=True, blank=True)
+    call_site = models.CharField(max_length=64)  # The UtilsManager method that made the call
+    model = models.CharField(max_length=100)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    case_type = models.CharField(max_length=100, blank=True, default='')
+    conversation_state = models.CharField(max_length=50, blank=True, default='')  # e.g. 'case_handling', 'generate_report'
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='llmusage_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.call_site} ({self.model}): {self.prompt_tokens}+{self.completion_tokens} tokens"
@@ -11,8 +11,8 @@ from reportlab.platypus.doctemplate import PageTemplate, BaseDocTemplate
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.pdfgen import canvas
 from django.http import HttpResponse
+from .metrics import timed
 from .models import ChatSession
-from .utils import get_company_policy_report
 
 
 class PolicyReportPDF:
@@ -287,7 +287,8 @@ class PolicyReportPDF:
 def generate_session_pdf(session_id):
     """Helper function to generate PDF for a session"""
     pdf_generator = PolicyReportPDF()
-    pdf_data = pdf_generator.generate_session_report(session_id)
+    with timed('pdf', 'generate_session_report'):
+        pdf_data = pdf_generator.generate_session_report(session_id)
     
     if pdf_data:
         filename = f"policy_violation_report_session_{session_id}.pdf"
@@ -0,0 +1,195 @@
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+COMPANY_LIST_PATH = DATA_DIR / "List of Company - Data List.xlsx - (1) 1000 Company List.csv"
+COMPANY_POLICIES_PATH = DATA_DIR / "Companies_Policies.csv"
+
+# Policy fields in the company list with their corresponding reference columns
+POLICY_FIELDS = [
+    {
+        "field": "Does the company prohibit recruitment fees to workers? Paste only relevant sentences.",
+        "doc_name": "Name of Reference Document 1",
+        "doc_link": "Reference Document Link",
+        "category": "Recruitment Fees"
+    },
+    {
+        "field": "Reference to fee repayment if workers are found to have paid (up to three sentences)",
+        "doc_name": "Name of Reference Document 1",
+        "doc_link": "If yes, provide link 1",
+        "category": "Fee Repayment"
+    },
+    {
+        "field": "Reference to Confiscation of travel/ identity document. If yes, mention up to three sentences.",
+        "doc_name": "Name of Reference Document 2",
+        "doc_link": "If yes, provide link 2",
+        "category": "Document Confiscation"
+    }
+]
+
+# Policy fields in the extra policies file with their reference columns
+EXTRA_FIELDS = [
+    {"field": "Heat Stress", "reference": "Heat Stress Reference", "category": "Heat Stress"},
+    {"field": "Health Care", "reference": "Health Care Reference", "category": "Health Care"},
+    {"field": "Wages and OverTime", "reference": "Wages Reference", "category": "Wages and Overtime"}
+]
+
+
+def _has_text(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _first_rows_by_company(df):
+    """Map each lower-cased company name to its first row in the frame."""
+    rows = {}
+    for row in df.to_dict("records"):
+        name = row.get("Name of Company")
+        if pd.isna(name):
+            continue
+        rows.setdefault(str(name).lower(), row)
+    return rows
+
+
+def build_policy_record(company_row, extra_row):
+    """
+    Build the ready-made policy record for one company.
+
+    Args:
+        company_row (dict or None): The company's row from the company list
+        extra_row (dict or None): The company's row from the extra policies file
+
+    Returns:
+        dict: {"policy_text": str, "policy_mapping": {category: reference dict}}
+    """
+    policy_text = ""
+    policy_mapping = {}
+
+    if company_row is not None:
+        for policy_info in POLICY_FIELDS:
+            value = company_row.get(policy_info["field"])
+            doc_name = company_row.get(policy_info["doc_name"])
+            doc_link = company_row.get(policy_info["doc_link"])
+
+            if _has_text(value):
+                # Add full policy content to text
+                policy_text += f"[{policy_info['category']}] {policy_info['field']}: {value}\n\n"
+
+                # Store comprehensive mapping
+                policy_mapping[policy_info["category"]] = {
+                    "field_name": policy_info["field"],
+                    "policy_content": value.strip(),
+                    "document_name": doc_name.strip() if pd.notna(doc_name) else "Unknown Document",
+                    "document_url": doc_link.strip() if pd.notna(doc_link) else "No URL available"
+                }
+
+    if extra_row is not None:
+        for field_info in EXTRA_FIELDS:
+            value = extra_row.get(field_info["field"])
+            reference = extra_row.get(field_info["reference"])
+
+            if _has_text(value):
+                policy_text += f"[{field_info['category']}] {field_info['field']} Policy: {value}\n\n"
+
+                # Parse reference to extract document name and page number
+                doc_name = "Company Policy Document"
+                doc_url = "Not available"
+
+                if _has_text(reference):
+                    # Format appears to be: "document_name.pdf page no.:XX"
+                    ref_parts = reference.strip().split(" page no.:")
+                    doc_name = ref_parts[0].strip()
+                    if len(ref_parts) > 1:
+                        doc_name += f" (Page {ref_parts[1].strip()})"
+
+                policy_mapping[field_info["category"]] = {
+                    "field_name": f"{field_info['field']} Policy",
+                    "policy_content": value.strip(),
+                    "document_name": doc_name,
+                    "document_url": doc_url,
+                    "reference_info": reference.strip() if pd.notna(reference) else "No reference available"
+                }
+
+    return {"policy_text": policy_text, "policy_mapping": policy_mapping}
+
+
+class PolicyStore:
+    """Precompiled company policy records keyed by lower-cased company name.
+
+    Both policy CSVs are parsed once into ready-made records. The store checks
+    the files' modification times on lookup and rebuilds itself when either
+    changes; ``rebuild`` forces a reload, e.g. after replacing the data files.
+    """
+
+    def __init__(self, company_list_path=COMPANY_LIST_PATH, company_policies_path=COMPANY_POLICIES_PATH):
+        self.paths = (Path(company_list_path), Path(company_policies_path))
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._records = {}
+
+    def _current_mtimes(self):
+        mtimes = []
+        for path in self.paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _refresh(self):
+        mtimes = self._current_mtimes()
+        if mtimes == self._mtimes:
+            return
+        with self._lock:
+            if mtimes != self._mtimes:
+                self._records = self._build()
+                self._mtimes = mtimes
+
+    def _build(self):
+        policies_df = pd.read_csv(self.paths[0])
+        policies_df.columns = policies_df.columns.str.strip()
+        extra_policy_df = pd.read_csv(self.paths[1])
+        extra_policy_df.columns = extra_policy_df.columns.str.strip()
+
+        company_rows = _first_rows_by_company(policies_df)
+        extra_rows = _first_rows_by_company(extra_policy_df)
+
+        return {
+            name: build_policy_record(company_rows.get(name), extra_rows.get(name))
+            for name in company_rows.keys() | extra_rows.keys()
+        }
+
+    def rebuild(self):
+        """Reload both CSVs unconditionally."""
+        with self._lock:
+            self._records = self._build()
+            self._mtimes = self._current_mtimes()
+
+    def get(self, company_name):
+        """
+        Look up the policy record for a company.
+
+        Args:
+            company_name (str): The buyer company name (case-insensitive)
+
+        Returns:
+            dict or None: The policy record, or None if the company is not in either file
+        """
+        self._refresh()
+        return self._records.get(str(company_name).lower())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_policy_store():
+    """Return the process-wide policy store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PolicyStore()
+    return _store
@@ -0,0 +1,401 @@
+"""Report generation as durable background jobs.
+
+When a case reaches its generate_report node the chat view enqueues a
+ReportJob and answers right away with the job id; the browser polls the
+report status endpoint until the job has finished. Jobs are rows in the
+database, so they survive restarts and can be run by worker threads inside
+the web process (REPORT_WORKER_MODE=thread) or by separate processes started
+with 'manage.py run_report_worker' (REPORT_WORKER_MODE=external).
+
+A worker claims a job with a conditional UPDATE, so two workers never run the
+same job. A claimed job holds a lease; if its worker dies, the job is picked
+up again once the lease expires. Failed attempts are retried with exponential
+backoff up to max_attempts. All rows a report creates are written in one
+transaction together with the job's success, so a retried job never leaves
+duplicate buyer companies or violations behind.
+"""
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .dashboard_stats import record_created
+from .history_cache import get_history_cache
+from .llm_scheduler import BACKGROUND, LLMUnavailable, llm_priority
+from .llm_usage import usage_scope
+from .models import BuyerCompany, ChatMessage, ChatSession, PolicyViolation, ReportJob
+from .responses import BOT_RESPONSES
+from .translation_memory import get_translation_memory
+
+logger = logging.getLogger(__name__)
+
+
+class ReportGenerator:
+    """Factory extraction, buyer search and per-buyer policy analysis for one session."""
+
+    def __init__(self, utils_manager=None, history_cache=None):
+        if utils_manager is None:
+            from .utils import UtilsManager
+            utils_manager = UtilsManager()
+        self.utils_manager = utils_manager
+        self.history_cache = history_cache or get_history_cache()
+
+    def analyse(self, session, history, prompt_history=None):
+        """
+        Run the LLM work of a report without writing anything.
+
+        Args:
+            session (ChatSession): The chat session being reported
+            history (list): Message dictionaries with 'role' and 'content'
+            prompt_history (str): Bounded history text, defaults to the full history
+
+        Returns:
+            dict: factory_name, incident_description, buyer_companies, analyses
+                  ((buyer, result_json) tuples) and the translated bot_response
+        """
+        # Collect incident description
+        incident_description_chat = "\n".join(
+            [msg["content"] for msg in history if msg["role"] == "user"]
+        )
+
+        # Factory name and incident summary are independent, so extract them together
+        factory_name, incident_description = self.utils_manager.run_concurrently(
+            lambda: self.utils_manager.extract_factory_name(prompt_history or history),
+            lambda: self.utils_manager.extract_incident(incident_description_chat),
+        )
+        logger.info(f"Report for session {session.id}: factory {factory_name!r}")
+
+        buyer_companies = self.utils_manager.search_buyer_company_from_factory(factory_name)
+        logger.info(f"Report for session {session.id}: buyers {buyer_companies}")
+
+        # Generate reports for all buyers concurrently
+        analyses = self.utils_manager.get_company_policy_reports(buyer_companies, incident_description)
+
+        bot_response = BOT_RESPONSES['REPORT_COMPLETE'] if analyses else BOT_RESPONSES['NO_BUYERS_FOUND']
+        # Translate response if language is not English
+        if session.language and session.language.lower() != 'english':
+            bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+
+        return {
+            'factory_name': factory_name,
+            'incident_description': incident_description,
+            'buyer_companies': buyer_companies,
+            'analyses': analyses,
+            'bot_response': bot_response,
+        }
+
+    def save(self, session, report):
+        """
+        Store the result of analyse(): session fields, buyers, violations and the bot message.
+
+        Call inside a transaction so a failure leaves no partial report.
+
+        Returns:
+            str: The bot message
+        """
+        session.factory_name = report['factory_name']
+        session.incident_description = report['incident_description']
+        session.save()
+
+        # bulk_create sends no signals, so count the rows for the dashboard here
+        record_created(BuyerCompany.objects.bulk_create(
+            [BuyerCompany(session=session, name=buyer) for buyer in report['buyer_companies']]
+        ))
+
+        violations = []
+        for buyer, result_json in report['analyses']:
+            # Parse the JSON result
+            try:
+                result_data = json.loads(result_json)
+            except json.JSONDecodeError:
+                result_data = None
+            if isinstance(result_data, dict):
+                violations.append(PolicyViolation(
+                    session=session,
+                    buyer_company=buyer,
+                    violation_text=result_json,
+                    complaint_summary=result_data.get('complaint_summary', ''),
+                    incidents=result_data.get('incidents', []),
+                    policy_violations=result_data.get('policy_violations', []),
+                ))
+            else:
+                # Fallback for non-JSON responses and JSON that is not an object
+                violations.append(PolicyViolation(
+                    session=session,
+                    buyer_company=buyer,
+                    violation_text=result_json
+                ))
+        record_created(PolicyViolation.objects.bulk_create(violations))
+
+        ChatMessage.objects.create(session=session, role='assistant', content=report['bot_response'])
+        # The cached history is extended only once the report is committed, so a rollback leaves nothing behind
+        transaction.on_commit(lambda: self.history_cache.add_to_cached(session.id, 'assistant', report['bot_response']))
+        return report['bot_response']
+
+
+class ReportJobQueue:
+    """Enqueue, claim and run ReportJob rows."""
+
+    def __init__(self, generator=None):
+        self._generator = generator
+        self._generator_lock = threading.Lock()
+
+    @property
+    def generator(self):
+        if self._generator is None:
+            with self._generator_lock:
+                if self._generator is None:
+                    self._generator = ReportGenerator()
+        return self._generator
+
+    def enqueue(self, session, history, prompt_history=None, idempotency_key=None):
+        """
+        Create the report job of a session, or return the existing one for the same key.
+
+        Args:
+            session (ChatSession): The chat session to report
+            history (list): Message dictionaries captured for the job
+            prompt_history (str): Bounded history text captured for the job
+            idempotency_key (str): Deduplication key, defaults to one report per session
+
+        Returns:
+            ReportJob: The new or existing job
+        """
+        job, created = ReportJob.objects.get_or_create(
+            idempotency_key=idempotency_key or f"session-report:{session.id}",
+            defaults={
+                'session': session,
+                'payload': {'history': history, 'prompt_history': prompt_history},
+                'max_attempts': settings.REPORT_JOB_MAX_ATTEMPTS,
+            },
+        )
+        if created:
+            logger.info(f"Enqueued report job {job.id} for session {session.id}")
+            # Wake in-process workers once the job row is visible to them
+            transaction.on_commit(notify_report_workers)
+        return job
+
+    async def aenqueue(self, session, history, prompt_history=None, idempotency_key=None):
+        """Async variant of enqueue."""
+        job, created = await ReportJob.objects.aget_or_create(
+            idempotency_key=idempotency_key or f"session-report:{session.id}",
+            defaults={
+                'session': session,
+                'payload': {'history': history, 'prompt_history': prompt_history},
+                'max_attempts': settings.REPORT_JOB_MAX_ATTEMPTS,
+            },
+        )
+        if created:
+            logger.info(f"Enqueued report job {job.id} for session {session.id}")
+            # Async views run in autocommit mode, so the row is already committed
+            notify_report_workers()
+        return job
+
+    def claim(self, worker_name):
+        """
+        Claim the next runnable job for a worker.
+
+        Runnable jobs are pending jobs whose run_after has passed and running
+        jobs whose lease has expired.
+
+        Returns:
+            ReportJob: The claimed job, or None when there is nothing to run
+        """
+        now = timezone.now()
+        # Jobs whose worker died on their last allowed attempt are not retried
+        ReportJob.objects.filter(
+            status=ReportJob.RUNNING, lease_expires_at__lt=now, attempts__gte=F('max_attempts'),
+        ).update(status=ReportJob.FAILED, last_error="Lease expired", finished_at=now)
+
+        runnable = (
+            Q(status=ReportJob.PENDING, run_after__lte=now)
+            | Q(status=ReportJob.RUNNING, lease_expires_at__lt=now)
+        )
+        candidates = ReportJob.objects.filter(runnable).order_by('run_after').values_list('id', 'status', 'attempts')[:10]
+        for job_id, status, attempts in candidates:
+            # Only one worker's update matches the status and attempt count it read
+            claimed = ReportJob.objects.filter(id=job_id, status=status, attempts=attempts).update(
+                status=ReportJob.RUNNING,
+                attempts=attempts + 1,
+                worker=worker_name,
+                lease_expires_at=now + timedelta(seconds=settings.REPORT_JOB_LEASE_SECONDS),
+                updated_at=now,
+            )
+            if claimed:
+                return ReportJob.objects.select_related('session').get(id=job_id)
+        return None
+
+    def run(self, job):
+        """Run a claimed job, recording success, a scheduled retry or the final failure."""
+        scope = {
+            'chat_session_id': job.session_id,
+            'case_type': job.session.case_type,
+            'conversation_state': 'generate_report',
+        }
+        try:
+            # Report analysis gives way to chat turns in the LLM scheduler
+            with usage_scope(scope), llm_priority(BACKGROUND):
+                report = self.generator.analyse(job.session, job.payload.get('history', []), job.payload.get('prompt_history'))
+            with transaction.atomic():
+                # The lease may have expired and another worker taken over in the meantime
+                locked = ReportJob.objects.select_for_update().get(id=job.id)
+                if locked.status != ReportJob.RUNNING or locked.attempts != job.attempts:
+                    logger.warning(f"Report job {job.id} was taken over by another worker; discarding result")
+                    return
+                job.result_message = self.generator.save(job.session, report)
+                job.status = ReportJob.SUCCEEDED
+                job.last_error = None
+                job.finished_at = timezone.now()
+                job.save()
+            logger.info(f"Report job {job.id} succeeded on attempt {job.attempts}")
+        except Exception as e:
+            logger.exception(f"Report job {job.id} failed on attempt {job.attempts}")
+            self._record_failure(job, e)
+
+    def _record_failure(self, job, error):
+        now = timezone.now()
+        fields = {'last_error': f"{type(error).__name__}: {error}", 'lease_expires_at': None, 'updated_at': now}
+        given_up = job.attempts >= job.max_attempts
+        if given_up:
+            fields.update(status=ReportJob.FAILED, finished_at=now, result_message=self._failure_message(job, error))
+        else:
+            delay = settings.REPORT_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            fields.update(status=ReportJob.PENDING, run_after=now + timedelta(seconds=delay))
+        # As on success, a worker whose lease expired must not overwrite the attempt that took over
+        recorded = ReportJob.objects.filter(id=job.id, status=ReportJob.RUNNING, attempts=job.attempts).update(**fields)
+        if not recorded:
+            logger.warning(f"Report job {job.id} was taken over by another worker; discarding its failure")
+            return
+        if given_up:
+            try:
+                session = ChatSession.objects.get(id=job.session_id)
+                self.generator.history_cache.append(session, 'assistant', fields['result_message'])
+            except Exception:
+                logger.exception(f"Could not record the failure message of report job {job.id}")
+
+    def _failure_message(self, job, error):
+        """REPORT_FAILED in the session's language, translated without the LLM when the LLM was the failure."""
+        bot_response = BOT_RESPONSES['REPORT_FAILED']
+        try:
+            language = ChatSession.objects.filter(id=job.session_id).values_list('language', flat=True).first()
+            if not language or language.lower() == 'english':
+                return bot_response
+            if isinstance(error, LLMUnavailable):
+                # Only a stored translation will do: translating needs the LLM that just failed
+                return get_translation_memory().lookup(bot_response, language) or bot_response
+            return self.generator.utils_manager.translation_from_English(bot_response, language)
+        except Exception:
+            logger.exception(f"Could not translate the failure message of report job {job.id}")
+            return bot_response
+
+    def run_next(self, worker_name):
+        """Claim and run one job. Returns True when a job was run."""
+        job = self.claim(worker_name)
+        if job is None:
+            return False
+        self.run(job)
+        return True
+
+    def run_pending(self, worker_name="inline", limit=None):
+        """Run runnable jobs one after another until none is left. Returns the number run."""
+        count = 0
+        while limit is None or count < limit:
+            if not self.run_next(worker_name):
+                break
+            count += 1
+        return count
+
+
+class ReportWorkerPool:
+    """Daemon threads that run report jobs from the queue.
+
+    Idle threads poll every REPORT_WORKER_POLL_INTERVAL seconds and are woken
+    early when this process enqueues a job.
+    """
+
+    def __init__(self, queue, threads=None, poll_interval=None, name_prefix="report-worker"):
+        self.queue = queue
+        self.threads = threads or settings.REPORT_WORKER_THREADS
+        self.poll_interval = poll_interval or settings.REPORT_WORKER_POLL_INTERVAL
+        self.name_prefix = name_prefix
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.threads):
+                thread = threading.Thread(target=self._loop, name=f"{self.name_prefix}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.threads} report worker threads")
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _loop(self):
+        worker_name = threading.current_thread().name
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                ran = self.queue.run_next(worker_name)
+            except Exception:
+                logger.exception("Report worker could not claim a job")
+                ran = False
+            finally:
+                close_old_connections()
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+_queue = None
+_pool = None
+_lock = threading.Lock()
+
+
+def get_report_queue():
+    """Return the process-wide report job queue."""
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = ReportJobQueue()
+    return _queue
+
+
+def get_report_worker_pool():
+    """Return the process-wide pool of report worker threads, started on first use."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ReportWorkerPool(get_report_queue())
+    _pool.start()
+    return _pool
+
+
+def notify_report_workers():
+    """Wake the in-process workers, starting them first when REPORT_WORKER_MODE is 'thread'."""
+    if settings.REPORT_WORKER_MODE == "thread":
+        get_report_worker_pool().wake()
+
+
+def start_report_workers_if_configured():
+    """Start in-process workers at startup so jobs left by a previous process are resumed."""
+    if settings.REPORT_WORKER_MODE == "thread":
+        get_report_worker_pool()
@@ -0,0 +1,39 @@
+# Fixed English bot responses. Entries with {placeholders} are filled in with str.format().
+# Filled-in LOCATION_RECEIVED and PROFILE_RECEIVED carry the user's own details, so they are
+# translated with use_memory=False and never stored in the translation memory.
+BOT_RESPONSES = {
+    'ASK_LOCATION': "Thank you! Kindly provide your current location (the country or region where you are currently situated).",
+    'ASK_LANGUAGE': "Hello! I am PoBot. I couldn't detect your language. Please tell me which language you prefer to use: English, Bahasa Indonesia, Burmese, Vietnamese, or Thai?",
+    'LOCATION_RECEIVED': "Thank you for providing your location in {location}! Could you please tell me your gender and nationality?",
+    'LOCATION_MISSING': "I need to know your location to better assist you. Could you please tell me which country you are in? For example: Indonesia, Thailand, Vietnam, etc.",
+    'PROFILE_RECEIVED': "Thank you for providing your gender ({gender}) and nationality ({nationality})! How can I help you?",
+    'PROFILE_MISSING': "Could you please tell me your {missing_str}?",
+    'CASE_TYPE_UNKNOWN': "I'm sorry, I couldn't identify the type of case you're describing. Could you provide more details about your situation?",
+    'REPORT_COMPLETE': "\n\nThank you for sharing your case. We will analyze the policy violations and will follow-up with you very soon!!",
+    'REPORT_FAILED': "I'm sorry, we could not finish analysing your case right now. Your information has been saved and our team will follow up with you.",
+    'NO_BUYERS_FOUND': "I couldn't find any buyer companies associated with this factory. Please check the factory name or provide more details.",
+    'FALLBACK': "I'm sorry, I'm having trouble understanding. Could you please provide more details about your situation?",
+    'LLM_BUSY': "I'm sorry, I'm receiving a lot of messages right now and couldn't answer yours in time. Please send it again in a moment.",
+}
+
+# Languages offered to users, besides English
+SUPPORTED_LANGUAGES = ['Bahasa Indonesia', 'Burmese', 'Vietnamese', 'Thai']
+
+
+def fixed_response_catalog():
+    """
+    List every fixed response that can be translated ahead of time.
+
+    Templates whose placeholders take free-form user data (location, gender,
+    nationality) are left out; the PROFILE_MISSING variants are enumerated.
+
+    Returns:
+        list: English response strings
+    """
+    catalog = [
+        text for key, text in BOT_RESPONSES.items()
+        if '{' not in text and key != 'ASK_LANGUAGE'
+    ]
+    for missing_str in ("gender", "nationality", "gender and nationality"):
+        catalog.append(BOT_RESPONSES['PROFILE_MISSING'].format(missing_str=missing_str))
+    return catalog
@@ -0,0 +1,77 @@
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+VECTOR_DB_PATH = Path(__file__).resolve().parent / "taiwan_db"
+
+
+class ModelRuntime:
+    """Process-wide holder for the embedding model and the Chroma vector store.
+
+    Every ``UtilsManager`` reads ``embeddings`` and ``db`` from the same
+    runtime, so the model is loaded once per process no matter how many view
+    managers exist. Both are created on first access; ``warm_up`` loads them
+    up front and runs a dummy embedding so the first request does not pay for
+    model initialization.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, persist_directory=VECTOR_DB_PATH):
+        self.model_name = model_name
+        self.persist_directory = str(persist_directory)
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._db = None
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    # Imported here so processes that never embed skip the heavy imports
+                    from langchain.embeddings import SentenceTransformerEmbeddings
+                    logger.info(f"Loading embedding model {self.model_name}")
+                    self._embeddings = SentenceTransformerEmbeddings(model_name=self.model_name)
+        return self._embeddings
+
+    @property
+    def db(self):
+        if self._db is None:
+            embeddings = self.embeddings
+            with self._lock:
+                if self._db is None:
+                    from langchain_chroma import Chroma
+                    logger.info(f"Opening vector store at {self.persist_directory}")
+                    self._db = Chroma(persist_directory=self.persist_directory, embedding_function=embeddings)
+        return self._db
+
+    def warm_up(self):
+        """Load the model and vector store and run one dummy embedding."""
+        self.embeddings.embed_query("warm up")
+        # Touch the store so the first retrieval does not open it
+        self.db
+        logger.info("Model runtime warmed up")
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    """Return the process-wide model runtime, creating it on first use."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = ModelRuntime()
+    return _runtime
+
+
+def warm_up_if_configured():
+    """Warm the runtime up front when MODEL_RUNTIME_MODE is 'eager'."""
+    if getattr(settings, "MODEL_RUNTIME_MODE", "lazy") == "eager":
+        get_runtime().warm_up()
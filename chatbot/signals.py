@@ -0,0 +1,41 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save
+
+from .dashboard_stats import apply_deltas, contributions_for, remember_values, remembered_contributions, tracked_fields
+from .models import BuyerCompany, ChatSession, PolicyViolation
+
+STATS_MODELS = (ChatSession, BuyerCompany, PolicyViolation)
+
+
+def _stored_contributions(instance):
+    previous = remembered_contributions(instance)
+    if previous is None:
+        # Deferred tracked fields, or a row built with a primary key rather than loaded
+        stored = type(instance).objects.filter(pk=instance.pk).only(*tracked_fields(instance)).first()
+        previous = contributions_for(stored) if stored else Counter()
+    return previous
+
+
+def on_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = Counter() if created else _stored_contributions(instance)
+    current = contributions_for(instance)
+    deltas = Counter(current)
+    deltas.subtract(previous)
+    apply_deltas(deltas)
+    remember_values(instance)
+
+
+def on_post_delete(sender, instance, **kwargs):
+    previous = remembered_contributions(instance)
+    removed = previous if previous is not None else contributions_for(instance)
+    deltas = Counter()
+    deltas.subtract(removed)
+    apply_deltas(deltas)
+
+
+for model in STATS_MODELS:
+    post_save.connect(on_post_save, sender=model, dispatch_uid=f'dashboard_stats_save_{model.__name__}')
+    post_delete.connect(on_post_delete, sender=model, dispatch_uid=f'dashboard_stats_delete_{model.__name__}')
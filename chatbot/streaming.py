@@ -0,0 +1,65 @@
+"""Server-sent events for streamed chat turns.
+
+A streamed turn runs the ordinary synchronous turn handlers on a worker
+thread. Handlers report reply text through EventStream.emit as it arrives
+from the LLM, and the response iterator forwards every event to the browser
+as soon as it is queued.
+"""
+import contextvars
+import json
+import logging
+import queue
+import threading
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventStream:
+    """Events produced on a worker thread and consumed by a streaming response."""
+
+    def __init__(self):
+        self._events = queue.Queue()
+        self._end = object()
+        # Captured while the view runs: the response is only iterated after the metrics
+        # middleware has closed the request trace, so the turn's spans would miss it
+        self._context = contextvars.copy_context()
+
+    def emit(self, event, data):
+        """Queue an event for the browser. Safe to call from any thread."""
+        self._events.put((event, data))
+
+    def run(self, work):
+        """
+        Run work() on a worker thread and yield its events as they are emitted.
+
+        Args:
+            work (callable): Produces the turn; its return value is sent as the 'done' event
+
+        Yields:
+            str: Formatted server-sent events, ending with 'done' or 'error'
+        """
+        def target():
+            try:
+                self.emit('done', work())
+            except Exception:
+                logger.exception("Streamed chat turn failed")
+                self.emit('error', {'error': 'Error processing your message. Please try again.'})
+            finally:
+                # The thread ends here, so its database connections would never be reused
+                connections.close_all()
+                self._events.put(self._end)
+
+        # The turn runs in the request's context, so its metrics land in the request trace
+        threading.Thread(target=self._context.run, args=(target,), name="chat-stream", daemon=True).start()
+        while True:
+            item = self._events.get()
+            if item is self._end:
+                return
+            yield sse_event(*item)
@@ -0,0 +1,73 @@
+"""Validation of the combined case-turn response.
+
+In combined mode (CASE_TURN_MODE=combined) one LLM call returns the
+navigation decision, the reply and any slot values of the current node as a
+JSON object:
+
+    {"advance": true, "reply": "...", "slots": {"industrial_sector": "Electronics"}}
+
+parse_combined_turn accepts the object with or without a Markdown code fence
+and returns None when it is malformed, so the caller can fall back to the
+separate navigation check and reply calls.
+"""
+import json
+import re
+
+# Placeholder values the model uses for "not mentioned"
+EMPTY_SLOT_VALUES = {'', 'none', 'null', 'unknown', 'n/a'}
+
+# Longest value stored in a slot; slots are CharFields on ChatSession
+MAX_SLOT_LENGTH = 255
+
+_FENCE_RE = re.compile(r'^```(?:json)?\s*(.*?)\s*```$', re.S)
+
+
+def _parse_advance(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('yes', 'no', 'true', 'false'):
+        return value.strip().lower() in ('yes', 'true')
+    return None
+
+
+def parse_combined_turn(text, slot_names=()):
+    """
+    Parse and validate a combined case-turn response.
+
+    Args:
+        text (str): The raw model response
+        slot_names (iterable): Slots the current node declares; others are ignored
+
+    Returns:
+        dict or None: {'advance': bool, 'reply': str, 'slots': {name: value}}, or None if malformed
+    """
+    text = (text or '').strip()
+    fenced = _FENCE_RE.match(text)
+    if fenced:
+        text = fenced.group(1)
+    # Tolerate prose around the object, but not a missing or broken object
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    advance = _parse_advance(data.get('advance'))
+    reply = data.get('reply')
+    if advance is None or not isinstance(reply, str) or not reply.strip():
+        return None
+
+    raw_slots = data.get('slots') or {}
+    if not isinstance(raw_slots, dict):
+        return None
+    slots = {}
+    for name in slot_names:
+        value = raw_slots.get(name)
+        if isinstance(value, str) and value.strip().lower() not in EMPTY_SLOT_VALUES:
+            slots[name] = value.strip()[:MAX_SLOT_LENGTH]
+
+    return {'advance': advance, 'reply': reply.strip(), 'slots': slots}
@@ -0,0 +1,165 @@
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+SUPPLIER_LIST_PATH = Path(__file__).resolve().parent / "data" / "Taiwan Supplier List.xlsx - Full List.csv"
+
+# Length of the character n-grams used for partial (substring) matching
+NGRAM_SIZE = 3
+
+
+def normalize_company_name(name):
+    """Normalize a company name for exact matching (case, surrounding spaces, trailing period)."""
+    return str(name).lower().strip().rstrip('.')
+
+
+def _ngrams(text, n=NGRAM_SIZE):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SupplierIndex:
+    """In-memory index of the Taiwan supplier list.
+
+    The CSV is parsed once and re-parsed only when its modification time
+    changes. Exact lookups go through a hash map keyed by the normalized
+    factory name; partial lookups intersect the posting lists of a character
+    n-gram inverted index and then confirm the substring match, so only a
+    handful of candidate names are ever compared.
+    """
+
+    def __init__(self, path=SUPPLIER_LIST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._loaded = False
+        # (names, buyers, exact, ngram_index), replaced as a whole on reload:
+        #   names        lower-cased factory names, one entry per unique factory
+        #   buyers       buyer list for each entry in names
+        #   exact        normalized name -> set of names positions
+        #   ngram_index  n-gram -> set of names positions
+        self._snapshot = ([], [], {}, {})
+
+    def _refresh(self):
+        """Reload the index if the supplier file changed since the last load."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+
+        with self._lock:
+            if self._loaded and mtime == self._mtime:
+                return
+            self._build()
+            self._mtime = mtime
+            self._loaded = True
+
+    def _build(self):
+        supplier_df = pd.read_csv(self.path)
+        supplier_df.columns = supplier_df.columns.str.strip()
+
+        positions = {}
+        names = []
+        buyers = []
+        for factory, customer in zip(supplier_df["Taiwan Company"], supplier_df["Customer Company"]):
+            if pd.isna(factory):
+                continue
+            key = str(factory).lower()
+            if key not in positions:
+                positions[key] = len(names)
+                names.append(key)
+                buyers.append({})
+            if pd.notna(customer):
+                # dict keeps first-seen order while dropping duplicates
+                buyers[positions[key]][customer] = None
+
+        exact = {}
+        ngram_index = {}
+        for position, name in enumerate(names):
+            exact.setdefault(normalize_company_name(name), set()).add(position)
+            for gram in _ngrams(name):
+                ngram_index.setdefault(gram, set()).add(position)
+
+        # Swap in the new structures together so readers never see a partial index
+        self._snapshot = (names, [list(b) for b in buyers], exact, ngram_index)
+
+    @staticmethod
+    def _exact_matches(snapshot, factory_name):
+        """Return index positions whose normalized name equals the factory name."""
+        exact = snapshot[2]
+        return exact.get(normalize_company_name(factory_name), set())
+
+    @staticmethod
+    def _partial_matches(snapshot, factory_name):
+        """Return index positions whose name contains the factory name (case-insensitive)."""
+        names, _, _, ngram_index = snapshot
+        query = str(factory_name).lower()
+        if not query:
+            return set(range(len(names)))
+
+        grams = _ngrams(query)
+        if not grams:
+            # Query shorter than one n-gram: fall back to scanning the unique names
+            return {position for position, name in enumerate(names) if query in name}
+
+        postings = []
+        for gram in grams:
+            posting = ngram_index.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return set()
+        return {position for position in candidates if query in names[position]}
+
+    def search(self, factory_name, match_type='both'):
+        """
+        Find buyer companies for a factory.
+
+        Args:
+            factory_name (str): The name of the factory
+            match_type (str): 'exact', 'partial', or 'both' (combines exact and partial)
+
+        Returns:
+            list: List of buyer company names
+        """
+        self._refresh()
+        snapshot = self._snapshot
+
+        if match_type == 'exact':
+            positions = self._exact_matches(snapshot, factory_name)
+        elif match_type == 'partial':
+            positions = self._partial_matches(snapshot, factory_name)
+        elif match_type == 'both':
+            positions = self._exact_matches(snapshot, factory_name) | self._partial_matches(snapshot, factory_name)
+        else:
+            positions = set()
+
+        buyers = snapshot[1]
+        all_buyers = {}
+        for position in sorted(positions):
+            for buyer in buyers[position]:
+                all_buyers[buyer] = None
+        return list(all_buyers)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_supplier_index():
+    """Return the process-wide supplier index, creating it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SupplierIndex()
+    return _index
@@ -1,3 +1,1557 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .async_views import AsyncChatViewManager
+from .case_classifier import CaseTypeClassifier
+from .case_graphs import CaseGraph, load_case_graphs
+from .chat_benchmark import ChatTurnBenchmark, check_budgets, load_budgets, load_conversations
+from .checks import check_history_cache_is_shared
+from .conversation_context import estimate_tokens, format_prompt_history, split_history
+from .dashboard_stats import CONTRIBUTIONS, load_dashboard_stats, record_created, rebuild_stats
+from .history_cache import ConversationHistoryCache, get_history_cache
+from .language_id import BURMESE, ENGLISH, INDONESIAN, THAI, VIETNAMESE, detect_language
+from .llm_client import ConcurrentRunner, LLMClient, get_llm_client
+from .llm_scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, LLMUnavailable, TokenBucket
+from .llm_usage import UsageRecorder, usage_scope, usage_summary
+from .metrics import RequestTrace, TraceStore, current_trace, end_trace, get_trace_store, start_trace
+from .mock_llm import MockLLMServer, RecordingStore, prompt_key
+from .models import (
+    BuyerCompany, CaseTypeExample, ChatSession, DashboardStat, JSONArrayLength, LLMUsage, PolicyViolation, ReportJob, TranslationMemory,
+)
+from .policy_store import PolicyStore
+from .report_jobs import ReportGenerator, ReportJobQueue
+from .responses import BOT_RESPONSES
+from .runtime import EMBEDDING_MODEL_NAME, ModelRuntime, get_runtime, warm_up_if_configured
+from .streaming import EventStream, sse_event
+from .structured_turn import parse_combined_turn
+from .supplier_index import SupplierIndex
+from .translation_memory import get_translation_memory
+from .utils import UtilsManager
+from .views import ChatViewManager
+
+
+class ChatCompletionHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint answering with the last message upper-cased after a short delay."""
+
+    delay = 0.2
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.delay)
+        payload = json.dumps({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": body["messages"][-1]["content"].upper()},
+                "finish_reason": "stop",
+            }],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LLMClientTests(SimpleTestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ChatCompletionHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = LLMClient(base_url=f"http://127.0.0.1:{server.server_port}/v1")
+
+    def test_complete_from_sync_code(self):
+        self.assertEqual(self.client.complete([{"role": "user", "content": "hello"}]), "HELLO")
+
+    def test_gathered_requests_overlap_and_keep_their_order(self):
+        started = time.perf_counter()
+        replies = self.client.gather(*(
+            self.client.acomplete([{"role": "user", "content": f"buyer {i}"}]) for i in range(4)
+        ))
+        self.assertEqual(replies, ["BUYER 0", "BUYER 1", "BUYER 2", "BUYER 3"])
+        # Four requests of 0.2 seconds each share the pool instead of queueing
+        self.assertLess(time.perf_counter() - started, 0.6)
+
+    def test_concurrent_runner_keeps_call_order(self):
+        runner = ConcurrentRunner(max_workers=2)
+        self.assertEqual(runner.run(lambda: self.client.complete([{"role": "user", "content": "a"}]), lambda: "b"), ["A", "b"])
+
+
+class PolicyReportFanOutTests(SimpleTestCase):
+    """get_company_policy_reports runs the per-buyer analyses on a bounded thread pool."""
+
+    def setUp(self):
+        self.manager = UtilsManager()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+        patcher = mock.patch.object(self.manager, 'get_company_policy_report', self.analyse)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def analyse(self, company_name, incident_description, model=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        # Earlier buyers take longer, so the results come back out of order
+        time.sleep(0.02 * (5 - int(company_name[-1])))
+        with self.lock:
+            self.running -= 1
+        if company_name == "Brand 4":
+            raise RuntimeError("analysis failed")
+        return json.dumps({"buyer": company_name})
+
+    def test_results_keep_the_buyer_order(self):
+        names = [f"Brand {i}" for i in range(3)]
+        results = self.manager.get_company_policy_reports(names, "Unpaid overtime", max_concurrency=3)
+        self.assertEqual(results, [(name, json.dumps({"buyer": name})) for name in names])
+        self.assertEqual(self.manager.get_company_policy_reports([], "Unpaid overtime"), [])
+
+    def test_concurrency_is_capped(self):
+        self.manager.get_company_policy_reports([f"Brand {i}" for i in range(3)], "Unpaid overtime", max_concurrency=2)
+        self.assertEqual(self.peak, 2)
+
+    @override_settings(REPORT_MAX_CONCURRENT_BUYERS=3)
+    def test_default_cap_comes_from_settings(self):
+        self.manager.get_company_policy_reports([f"Brand {i}" for i in range(4)], "Unpaid overtime")
+        self.assertEqual(self.peak, 3)
+
+    def test_a_failing_buyer_fails_the_fan_out(self):
+        with self.assertRaises(RuntimeError):
+            self.manager.get_company_policy_reports([f"Brand {i}" for i in range(5)], "Unpaid overtime")
+
+    def test_analyses_run_in_the_callers_context(self):
+        traces = []
+
+        def analyse(company_name, incident_description, model=None):
+            traces.append(current_trace())
+            return "{}"
+
+        trace = RequestTrace('POST', '/chat/message/')
+        token = start_trace(trace)
+        try:
+            with mock.patch.object(self.manager, 'get_company_policy_report', analyse):
+                self.manager.get_company_policy_reports([f"Brand {i}" for i in range(3)], "Unpaid overtime")
+        finally:
+            end_trace(token)
+        self.assertEqual(traces, [trace] * 3)
+
+
+class SupplierIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "suppliers.csv")
+        self.write_suppliers(
+            "Taiwan Company,Customer Company\n"
+            "Formosa Textile Co.,Brand A\n"
+            "Formosa Textile Co.,Brand B\n"
+            "FORMOSA TEXTILE CO.,Brand A\n"
+            "Taichung Plastics,Brand C\n"
+            "Ming Electronics,\n"
+        )
+        self.index = SupplierIndex(self.path)
+
+    def write_suppliers(self, text, mtime=None):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_exact_match_ignores_case_and_trailing_period(self):
+        self.assertEqual(self.index.search("formosa textile co", match_type='exact'), ["Brand A", "Brand B"])
+        self.assertEqual(self.index.search("Formosa Textile", match_type='exact'), [])
+
+    def test_partial_match(self):
+        self.assertEqual(self.index.search("textile", match_type='partial'), ["Brand A", "Brand B"])
+        self.assertEqual(self.index.search("plastic", match_type='partial'), ["Brand C"])
+        # Both words occur, but not together in one name
+        self.assertEqual(self.index.search("textile plastics", match_type='partial'), [])
+        # Shorter than one trigram
+        self.assertEqual(self.index.search("ng", match_type='partial'), ["Brand C"])
+        self.assertEqual(self.index.search("Ming Electronics"), [])
+        self.assertEqual(self.index.search("textile", match_type='fuzzy'), [])
+
+    def test_reloads_when_the_file_changes(self):
+        self.assertEqual(self.index.search("plastics"), ["Brand C"])
+        mtime = os.stat(self.path).st_mtime
+        self.write_suppliers("Taiwan Company,Customer Company\nTaichung Plastics,Brand D\n", mtime + 10)
+        self.assertEqual(self.index.search("plastics"), ["Brand D"])
+        self.assertEqual(self.index.search("textile"), [])
+
+
+class PolicyStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.company_list = os.path.join(directory.name, "companies.csv")
+        self.company_policies = os.path.join(directory.name, "policies.csv")
+        company_list = pd.DataFrame([
+            {
+                "Name of Company": "Brand A",
+                "Does the company prohibit recruitment fees to workers? Paste only relevant sentences.": " No fees are charged. ",
+                "Name of Reference Document 1": "Supplier Code",
+                "Reference Document Link": "https://example.com/code.pdf",
+            },
+            {
+                "Name of Company": "BRAND A",
+                "Does the company prohibit recruitment fees to workers? Paste only relevant sentences.": "Duplicate row",
+            },
+            {"Name of Company": "Brand B"},
+        ])
+        company_list.to_csv(self.company_list, index=False)
+        pd.DataFrame([
+            {"Name of Company": "Brand A", "Heat Stress": "Breaks in hot weather.", "Heat Stress Reference": "policy.pdf page no.:12"},
+            {"Name of Company": "Brand C", "Health Care": "Clinic on site."},
+        ]).to_csv(self.company_policies, index=False)
+        self.store = PolicyStore(self.company_list, self.company_policies)
+
+    def test_record_combines_both_files(self):
+        record = self.store.get("brand a")
+        self.assertEqual(set(record["policy_mapping"]), {"Recruitment Fees", "Heat Stress"})
+        fees = record["policy_mapping"]["Recruitment Fees"]
+        # The first row of a company wins
+        self.assertEqual(fees["policy_content"], "No fees are charged.")
+        self.assertEqual(fees["document_name"], "Supplier Code")
+        self.assertEqual(fees["document_url"], "https://example.com/code.pdf")
+        self.assertEqual(record["policy_mapping"]["Heat Stress"]["document_name"], "policy.pdf (Page 12)")
+        self.assertIn("[Heat Stress] Heat Stress Policy: Breaks in hot weather.", record["policy_text"])
+
+    def test_companies_in_one_file_or_none(self):
+        self.assertEqual(self.store.get("Brand B"), {"policy_text": "", "policy_mapping": {}})
+        self.assertEqual(set(self.store.get("Brand C")["policy_mapping"]), {"Health Care"})
+        self.assertIsNone(self.store.get("Brand D"))
+
+    def test_reloads_when_a_file_changes(self):
+        self.assertIsNone(self.store.get("Brand D"))
+        pd.DataFrame([{"Name of Company": "Brand D", "Health Care": "Insurance."}]).to_csv(self.company_policies, index=False)
+        mtime = os.stat(self.company_policies).st_mtime + 10
+        os.utime(self.company_policies, (mtime, mtime))
+        self.assertEqual(set(self.store.get("Brand D")["policy_mapping"]), {"Health Care"})
+
+
+class ModelRuntimeTests(SimpleTestCase):
+    def setUp(self):
+        self.loaded = []
+        loaded = self.loaded
+
+        class Embeddings:
+            def __init__(self, model_name):
+                loaded.append(model_name)
+
+            def embed_query(self, text):
+                loaded.append(text)
+                return [1.0]
+
+        class Chroma:
+            def __init__(self, persist_directory, embedding_function):
+                loaded.append(persist_directory)
+
+        # Stand-ins for the langchain modules the runtime imports on first use
+        patcher = mock.patch.dict(sys.modules, {
+            'langchain': SimpleNamespace(),
+            'langchain.embeddings': SimpleNamespace(SentenceTransformerEmbeddings=Embeddings),
+            'langchain_chroma': SimpleNamespace(Chroma=Chroma),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.runtime = ModelRuntime(persist_directory="vectors")
+
+    def test_loaded_once_on_first_use(self):
+        self.assertEqual(self.loaded, [])
+        threads = [threading.Thread(target=lambda: self.runtime.db) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.loaded, [EMBEDDING_MODEL_NAME, "vectors"])
+
+    def test_warm_up(self):
+        self.runtime.warm_up()
+        self.assertEqual(self.loaded, [EMBEDDING_MODEL_NAME, "warm up", "vectors"])
+
+    def test_warm_up_only_in_eager_mode(self):
+        runtime = mock.Mock()
+        with mock.patch('chatbot.runtime.get_runtime', return_value=runtime):
+            with override_settings(MODEL_RUNTIME_MODE='lazy'):
+                warm_up_if_configured()
+            runtime.warm_up.assert_not_called()
+            with override_settings(MODEL_RUNTIME_MODE='eager'):
+                warm_up_if_configured()
+            runtime.warm_up.assert_called_once_with()
+
+    def test_managers_share_one_runtime(self):
+        self.assertIs(UtilsManager().runtime, UtilsManager().runtime)
+        self.assertIs(UtilsManager().runtime, get_runtime())
+        self.assertEqual(self.loaded, [])
+
+
+class CaseGraphTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = CaseGraph(
+            "Wage Theft",
+            {
+                "start": {"text": "Ask what happened"},
+                "factory": {"text": "Ask for the factory", "slots": {"factory_name": "Name of the factory"}},
+                "agency": {"text": "Ask for the agency"},
+                "end": {"text": "Thank the user"},
+            },
+            [["start", "factory"], ["factory", "agency"], ["factory", "end"], ["agency", "end"]],
+        )
+
+    def test_navigation_follows_the_first_listed_edge(self):
+        node, path = self.graph.start, []
+        while node is not None:
+            path.append(node)
+            node = self.graph.next_node(node)
+        self.assertEqual(path, ["start", "factory", "agency", "end"])
+        self.assertEqual(self.graph.text("agency"), "Ask for the agency")
+
+    def test_slots(self):
+        self.assertEqual(dict(self.graph.slots("factory")), {"factory_name": "Name of the factory"})
+        self.assertEqual(dict(self.graph.slots("start")), {})
+        with self.assertRaises(TypeError):
+            self.graph.slots("factory")["gender"] = "Gender"
+
+    def test_invalid_graphs_are_rejected(self):
+        with self.assertRaises(ValueError):
+            CaseGraph("Wage Theft", {"intro": {"text": "Hello"}}, [])
+        with self.assertRaises(ValueError):
+            CaseGraph("Wage Theft", {"start": {"text": "Hello"}}, [["start", "missing"]])
+        with self.assertRaises(AttributeError):
+            self.graph.start = "factory"
+
+    def test_shipped_graphs_reach_an_end(self):
+        for key, graph in load_case_graphs().items():
+            with self.subTest(case_type=graph.case_type):
+                self.assertEqual(key, graph.case_type.lower())
+                seen = set()
+                node = graph.start
+                while node is not None:
+                    self.assertNotIn(node, seen)
+                    seen.add(node)
+                    node = graph.next_node(node)
+                for node in graph.nodes:
+                    for field in graph.slots(node):
+                        self.assertTrue(hasattr(ChatSession, field), field)
+
+
+class ConversationContextTests(SimpleTestCase):
+    def setUp(self):
+        self.history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(5)
+        ]
+
+    def test_split_history(self):
+        older, recent = split_history(self.history, 2)
+        self.assertEqual(older, self.history[:3])
+        self.assertEqual(recent, self.history[3:])
+        self.assertEqual(split_history(self.history, 5), ([], self.history))
+        self.assertEqual(split_history(self.history, 0), (self.history, []))
+
+    def test_untrimmed_history_renders_like_the_message_list(self):
+        self.assertEqual(format_prompt_history("", self.history, 1000), str(self.history))
+
+    def test_trimming_keeps_the_newest_messages(self):
+        per_message = estimate_tokens("message 0")
+        rendered = format_prompt_history("", self.history, per_message * 2)
+        self.assertEqual(rendered, str(self.history[3:]))
+        # The latest message is kept even when it alone is over the budget
+        self.assertEqual(format_prompt_history("", self.history, 0), str(self.history[4:]))
+
+    def test_summary_counts_against_the_budget(self):
+        summary = "The user works at Factory A."
+        budget = estimate_tokens(summary) + estimate_tokens("message 0") * 2
+        self.assertEqual(
+            format_prompt_history(summary, self.history, budget),
+            f"Summary of earlier conversation: {summary}\nRecent messages: {self.history[3:]}",
+        )
+
+
+class TranslationMemoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        async def acomplete(messages, model=None, **kwargs):
+            return "Taiwan"
+
+        patcher = mock.patch.object(get_llm_client(), 'acomplete', acomplete)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="Thai")
+
+    def test_replies_with_personal_details_skip_the_translation_memory(self):
+        request = RequestFactory().post('/chat/message/')
+        request.session = {}
+        ChatViewManager().handle_location_detection(request, self.session, "ฉันทำงานที่ไต้หวัน")
+        self.assertEqual(request.session['conversation_state'], 'gender_nationality_detection')
+        self.assertFalse(TranslationMemory.objects.exists())
+
+
+class LanguageIdentificationTests(SimpleTestCase):
+    def assertConfident(self, text, language):
+        detected, confidence = detect_language(text)
+        self.assertEqual(detected, language)
+        self.assertGreaterEqual(confidence, settings.LANGUAGE_ID_CONFIDENCE_THRESHOLD)
+
+    def test_supported_languages(self):
+        for text, language in (
+            ("I paid a high fee to the broker and they kept my passport", ENGLISH),
+            ("Saya harus bayar biaya agen yang sangat mahal", INDONESIAN),
+            ("Chủ nhà máy không trả lương cho tôi", VIETNAMESE),
+            ("นายจ้างไม่จ่ายค่าล่วงเวลา", THAI),
+            ("ကျွန်တော့်ကို လစာမပေးဘူး", BURMESE),
+        ):
+            with self.subTest(text=text):
+                self.assertConfident(text, language)
+
+    def test_language_names(self):
+        for text, language in (("English", ENGLISH), ("Bahasa", INDONESIAN), ("Tiếng Việt", VIETNAMESE), ("ภาษาไทย", THAI)):
+            with self.subTest(text=text):
+                self.assertConfident(text, language)
+
+    def test_other_languages_are_left_to_the_llm(self):
+        for text in (
+            "Hindi binabayaran ng amo ko ang sahod ko at kinuha nila ang pasaporte ko",
+            "Saya bekerja di kilang dan majikan tidak membayar gaji kerja lebih masa",
+            "Mi empleador no me paga el salario y tiene mi pasaporte",
+            "Je travaille dans une usine et mon patron ne me paie pas",
+            "Ich arbeite in einer Fabrik und bekomme keinen Lohn",
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(detect_language(text), (None, 0.0))
+
+    def test_short_messages_are_not_confident(self):
+        _, confidence = detect_language("Taichung")
+        self.assertLess(confidence, settings.LANGUAGE_ID_CONFIDENCE_THRESHOLD)
+
+
+class WordEmbeddings:
+    """Bag-of-words vectors standing in for the sentence embedding model."""
+
+    def __init__(self, size=64):
+        self.size = size
+
+    def embed_query(self, text):
+        vector = [0.0] * self.size
+        for word in text.lower().split():
+            vector[sum(map(ord, word)) % self.size] += 1.0
+        vector[-1] += 0.01  # Never all zeros
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class CaseTypeClassifierTests(TestCase):
+    def setUp(self):
+        self.graphs = {
+            'wages': SimpleNamespace(case_type="Wage Theft", examples=["salary not paid", "no overtime pay"]),
+            'documents': SimpleNamespace(case_type="Document Confiscation", examples=["agency keeps passport"]),
+        }
+        self.classifier = CaseTypeClassifier(SimpleNamespace(embeddings=WordEmbeddings()), self.graphs)
+
+    def test_only_seed_and_confirmed_examples_are_learned(self):
+        # Labels assigned to sessions by the classifier or the LLM are not training data
+        for _ in range(5):
+            ChatSession.objects.create(case_type="Wage Theft", incident_description="dormitory is crowded")
+        self.classifier.rebuild()
+        self.assertEqual(self.classifier.classify("salary not paid")[0], "Wage Theft")
+        _, similarity, _ = self.classifier.classify("dormitory is crowded")
+        self.assertLess(similarity, 0.2)
+
+        CaseTypeExample.objects.create(case_type="Document Confiscation", text="boss took my residence card")
+        self.classifier.rebuild()
+        self.assertEqual(self.classifier.classify("residence card taken")[0], "Document Confiscation")
+
+    @override_settings(CASE_CLASSIFIER_REFRESH_SECONDS=0)
+    def test_stale_centroids_are_rebuilt_in_the_background(self):
+        self.classifier.rebuild()
+        built = self.classifier._model
+        release = threading.Event()
+        rebuilt = (["Document Confiscation"], built[1][:1])
+
+        def slow_build():
+            release.wait(5)
+            return rebuilt
+
+        with mock.patch.object(self.classifier, '_build', slow_build):
+            # Answered from the current centroids while the rebuild is still running
+            self.assertEqual(self.classifier.classify("salary not paid")[0], "Wage Theft")
+            refresh = self.classifier._refresh_thread
+            self.assertTrue(refresh.is_alive())
+            release.set()
+            refresh.join(5)
+        self.assertIs(self.classifier._model, rebuilt)
+
+    def test_unavailable_classifier_leaves_the_case_type_to_the_llm(self):
+        classifier = SimpleNamespace(classify=mock.Mock(side_effect=OSError("model files missing")))
+        with mock.patch('chatbot.utils.get_case_classifier', return_value=classifier):
+            with self.assertLogs('chatbot.utils', 'ERROR'):
+                self.assertIsNone(UtilsManager()._classify_case_type("salary not paid"))
+
+            # Bugs in the classifier are not mistaken for an unavailable model
+            classifier.classify.side_effect = TypeError("unexpected argument")
+            with self.assertRaises(TypeError):
+                UtilsManager()._classify_case_type("salary not paid")
+
+
+class DashboardQueryCountTests(TestCase):
+    def create_sessions(self, start, count):
+        for i in range(start, start + count):
+            session = ChatSession.objects.create(factory_name=f"Factory {i}", case_type="Wage Theft")
+            BuyerCompany.objects.create(session=session, name=f"Buyer {i}A")
+            BuyerCompany.objects.create(session=session, name=f"Buyer {i}B")
+            PolicyViolation.objects.create(
+                session=session,
+                buyer_company=f"Buyer {i}A",
+                violation_text="{}",
+                incidents=["Unpaid overtime", "Passport held"],
+                policy_violations=[{"policy_category": "Wages"}, {"policy_category": "Forced Labour"}],
+            )
+
+    def render_dashboard(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_sessions(self):
+        self.create_sessions(0, 1)
+        _, one_session_queries = self.render_dashboard()
+
+        self.create_sessions(1, 20)
+        response, many_session_queries = self.render_dashboard()
+
+        self.assertEqual(one_session_queries, many_session_queries)
+        self.assertEqual(response.context['total_violations'], 21)
+        self.assertEqual(response.context['total_incidents'], 42)
+        self.assertEqual(response.context['unique_factories'], 21)
+        self.assertEqual(response.context['chart_data']['categories'], {"Forced Labour": 21, "Wages": 21})
+
+
+class DashboardSessionsApiTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            session = ChatSession.objects.create(
+                factory_name=f"Factory {i}",
+                case_type="Wage Theft" if i % 2 else "Lender Harassment",
+            )
+            # Sessions 0 and 1 share a timestamp so the id tie-breaker is exercised
+            ChatSession.objects.filter(pk=session.pk).update(created_at=now - timedelta(days=max(i, 1)))
+            BuyerCompany.objects.create(session=session, name=f"Brand {i}")
+            BuyerCompany.objects.create(session=session, name=f"Brand {i} Outlet")
+
+    def fetch(self, **params):
+        response = self.client.get(reverse('dashboard_sessions'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_keyset_pages_cover_every_session_once(self):
+        ids = []
+        params = {'limit': 2}
+        while True:
+            page = self.fetch(**params)
+            ids.extend(row['id'] for row in page['results'])
+            if not page['next_cursor']:
+                break
+            params['cursor'] = page['next_cursor']
+
+        expected = list(ChatSession.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_filters(self):
+        self.assertEqual(len(self.fetch(case_type="Lender Harassment")['results']), 3)
+        self.assertEqual([row['factory_name'] for row in self.fetch(factory_name="factory 3")['results']], ["Factory 3"])
+        # Both buyers of session 2 match, but the session is listed once
+        self.assertEqual(len(self.fetch(buyer_company="brand 2")['results']), 1)
+        date_from = (timezone.now() - timedelta(days=2)).date().isoformat()
+        self.assertEqual(len(self.fetch(date_from=date_from)['results']), 3)
+        # date_to includes the whole day
+        date_to = (timezone.now() - timedelta(days=2)).date().isoformat()
+        self.assertEqual(len(self.fetch(date_to=date_to)['results']), 3)
+        self.assertEqual(len(self.fetch(date_from=date_from, date_to=date_to)['results']), 1)
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get(reverse('dashboard_sessions'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DashboardStatsTests(TestCase):
+    def counters(self):
+        return {
+            (dimension, key): count
+            for dimension, key, count in DashboardStat.objects.filter(count__gt=0).values_list('dimension', 'key', 'count')
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.counters()
+        rebuild_stats()
+        self.assertEqual(incremental, self.counters())
+
+    def test_counters_follow_saves_updates_and_deletes(self):
+        session = ChatSession.objects.create(factory_name="Factory A", location="Taiwan")
+        BuyerCompany.objects.create(session=session, name="Brand A")
+        PolicyViolation.objects.create(
+            session=session,
+            buyer_company="Brand A",
+            violation_text="{}",
+            incidents=["Unpaid overtime"],
+            policy_violations=[{"policy_category": "Wages"}],
+        )
+        other = ChatSession.objects.create(factory_name="Factory B")
+        self.assertMatchesRebuild()
+
+        # Later turns fill in fields on a session loaded from the database
+        session = ChatSession.objects.get(pk=session.pk)
+        session.case_type = "Wage Theft"
+        session.location = "Indonesia"
+        session.save()
+        stats = load_dashboard_stats()
+        self.assertEqual(stats['case_type'], {"Unclassified": 1, "Wage Theft": 1})
+        self.assertNotIn("Taiwan", stats['location'])
+        self.assertMatchesRebuild()
+
+        # Deleting a session removes its buyers and violations from the counters as well
+        session.delete()
+        stats = load_dashboard_stats()
+        self.assertEqual(stats['total'], {"sessions": 1})
+        self.assertEqual(stats['company'], {})
+        self.assertEqual(stats['factory'], {other.factory_name: 1})
+        self.assertMatchesRebuild()
+
+    def test_reading_rows_computes_no_counters(self):
+        session = ChatSession.objects.create(factory_name="Factory A")
+        PolicyViolation.objects.create(session=session, buyer_company="Brand A", violation_text="{}", policy_violations=[{"policy_category": "Wages"}])
+        counted = mock.Mock(side_effect=AssertionError("Counters computed on read"))
+        with mock.patch.dict(CONTRIBUTIONS, {name: (fields, counted) for name, (fields, _) in CONTRIBUTIONS.items()}):
+            list(PolicyViolation.objects.select_related('session'))
+            list(ChatSession.objects.only('id'))
+        counted.assert_not_called()
+
+    def test_bulk_created_rows_are_recorded(self):
+        session = ChatSession.objects.create(factory_name="Factory A")
+        record_created(BuyerCompany.objects.bulk_create(
+            [BuyerCompany(session=session, name=name) for name in ("Brand A", "Brand B")]
+        ))
+        self.assertEqual(load_dashboard_stats()['company'], {"Brand A": 1, "Brand B": 1})
+        self.assertMatchesRebuild()
+
+
+class PolicyViolationJSONTests(TestCase):
+    def test_categories_and_incidents_are_counted_in_the_database(self):
+        session = ChatSession.objects.create(factory_name="Factory A")
+        PolicyViolation.objects.create(
+            session=session,
+            buyer_company="Brand A",
+            violation_text="{}",
+            incidents=["Unpaid overtime", "Passport held"],
+            policy_violations=[{"policy_category": "Wages"}, {"policy_category": "Forced Labour"}, "Unpaid wages"],
+        )
+        PolicyViolation.objects.create(
+            session=session,
+            buyer_company="Brand B",
+            violation_text="{}",
+            incidents=["Unpaid overtime"],
+            policy_violations=[{"policy_category": "Wages"}],
+        )
+
+        self.assertEqual(
+            PolicyViolation.objects.category_counts(),
+            {"Wages": 2, "Forced Labour": 1, "General Violation": 1},
+        )
+        self.assertEqual(PolicyViolation.objects.filter(buyer_company="Brand B").category_counts(), {"Wages": 1})
+        total = PolicyViolation.objects.aggregate(total=Sum(JSONArrayLength('incidents')))['total']
+        self.assertEqual(total, 3)
+
+    def test_migration_parses_malformed_text(self):
+        parse_list = import_module('chatbot.migrations.0014_policyviolation_json_fields').parse_list
+        self.assertEqual(parse_list('["a", "b"]'), (["a", "b"], False))
+        self.assertEqual(parse_list('{"policy_category": "Wages"}'), ([{"policy_category": "Wages"}], False))
+        self.assertEqual(parse_list(None), ([], False))
+        self.assertEqual(parse_list('not json ['), ([], True))
+        self.assertEqual(parse_list('"text"'), ([], True))
+
+
+class ConversationHistoryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.history_cache = ConversationHistoryCache()
+        self.session = ChatSession.objects.create()
+
+    def test_appended_messages_are_read_without_queries(self):
+        self.history_cache.append(self.session, 'user', "Hello")
+        # Miss: one values_list query
+        with self.assertNumQueries(1):
+            self.assertEqual(self.history_cache.get(self.session), [{"role": "user", "content": "Hello"}])
+
+        for i in range(10):
+            self.history_cache.append(self.session, 'assistant', f"Reply {i}")
+            with self.assertNumQueries(0):
+                history = self.history_cache.get(self.session)
+            self.assertEqual(history[-1], {"role": "assistant", "content": f"Reply {i}"})
+
+        self.assertEqual(len(history), self.session.messages.count())
+
+    def test_concurrent_appends_all_stay_in_the_history(self):
+        self.history_cache.get(self.session)
+        threads = [
+            threading.Thread(target=self.history_cache.add_to_cached, args=(self.session.id, 'assistant', f"Reply {i}"))
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self.assertNumQueries(0):
+            history = self.history_cache.get(self.session)
+        self.assertCountEqual([message['content'] for message in history], [f"Reply {i}" for i in range(20)])
+
+    def test_missing_message_reloads_from_the_database(self):
+        for i in range(3):
+            self.history_cache.append(self.session, 'user', f"Message {i}")
+        self.history_cache.get(self.session)
+        cache.delete(self.history_cache._message_key(self.session.id, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual([message['content'] for message in self.history_cache.get(self.session)], ["Message 0", "Message 1", "Message 2"])
+
+    def test_external_report_workers_need_a_shared_cache(self):
+        with override_settings(REPORT_WORKER_MODE="external"):
+            self.assertEqual([warning.id for warning in check_history_cache_is_shared(None)], ["chatbot.W001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:6379"}}
+        with override_settings(REPORT_WORKER_MODE="external", CACHES=shared):
+            self.assertEqual(check_history_cache_is_shared(None), [])
+
+    def test_invalidate_reloads_from_the_database(self):
+        self.history_cache.append(self.session, 'user', "Hello")
+        self.history_cache.get(self.session)
+        self.session.messages.all().delete()
+        self.history_cache.invalidate(self.session.id)
+        self.assertEqual(self.history_cache.get(self.session), [])
+
+
+class FakeUtilsManager:
+    """Stands in for UtilsManager in report generation."""
+
+    def run_concurrently(self, *calls):
+        return [call() for call in calls]
+
+    def extract_factory_name(self, history):
+        return "Factory A"
+
+    def extract_incident(self, chat_history):
+        return "Unpaid overtime"
+
+    def search_buyer_company_from_factory(self, factory_name):
+        return ["Brand A", "Brand B"]
+
+    def get_company_policy_reports(self, company_names, incident_description):
+        return [(name, '{"incidents": ["Unpaid overtime"], "policy_violations": []}') for name in company_names]
+
+    def translation_from_English(self, text, language):
+        return text
+
+
+@override_settings(REPORT_WORKER_MODE="external", REPORT_JOB_MAX_ATTEMPTS=2, REPORT_JOB_RETRY_DELAY=0)
+class ReportJobQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.session = ChatSession.objects.create(language="English")
+        self.history = [{"role": "user", "content": "I work at Factory A and was not paid overtime"}]
+
+    def make_queue(self):
+        return ReportJobQueue(ReportGenerator(utils_manager=FakeUtilsManager()))
+
+    def test_enqueue_is_idempotent(self):
+        queue = self.make_queue()
+        job = queue.enqueue(self.session, self.history)
+        self.assertEqual(queue.enqueue(self.session, self.history), job)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    def test_job_writes_the_report_once(self):
+        queue = self.make_queue()
+        job = queue.enqueue(self.session, self.history)
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(queue.run_pending(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.SUCCEEDED)
+        self.assertEqual(self.session.buyer_companies.count(), 2)
+        self.assertEqual(self.session.violations.count(), 2)
+        self.assertEqual(self.session.messages.last().content, job.result_message)
+
+    def test_failed_analyses_are_retried_then_given_up(self):
+        analysis = '{"complaint_summary": "Unpaid overtime.", "incidents": ["Unpaid overtime"], "policy_violations": []}'
+        server = MockLLMServer(
+            ('127.0.0.1', 0), rules=[{"contains": "legal analyst", "response": analysis}], error_rate=1.0, error_status=503
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        # Usage rows are queued but not written
+        patcher = mock.patch('chatbot.llm_usage._recorder', UsageRecorder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # The real per-buyer analysis against a failing provider; the steps before it are stubbed
+        utils_manager = UtilsManager()
+        utils_manager.llm_client = LLMClient(
+            base_url=server.base_url, scheduler=LLMScheduler(requests_per_minute=0, max_attempts=2, base_delay=0.01)
+        )
+        utils_manager.extract_factory_name = lambda history: "Factory A"
+        utils_manager.extract_incident = lambda chat_history: "unpaid overtime"
+        utils_manager.search_buyer_company_from_factory = lambda factory_name: ["23Andme"]
+        queue = ReportJobQueue(ReportGenerator(utils_manager=utils_manager))
+
+        job = queue.enqueue(self.session, self.history)
+        queue.run_pending(limit=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ReportJob.PENDING, 1))
+        self.assertIn("LLMUnavailable", job.last_error)
+        self.assertEqual(self.session.violations.count(), 0)
+
+        server.error_rate = 0.0
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ReportJob.SUCCEEDED, 2))
+        self.assertEqual(list(self.session.violations.values_list('complaint_summary', flat=True)), ["Unpaid overtime."])
+
+        server.error_rate = 1.0
+        other = queue.enqueue(ChatSession.objects.create(), self.history)
+        queue.run_pending()
+        other.refresh_from_db()
+        self.assertEqual((other.status, other.attempts), (ReportJob.FAILED, 2))
+        self.assertEqual(other.session.violations.count(), 0)
+        self.assertTrue(other.result_message)
+
+    def test_analyses_that_are_not_objects_are_stored_as_text(self):
+        report = {
+            'factory_name': "Factory A",
+            'incident_description': "Unpaid overtime",
+            'buyer_companies': ["Brand A", "Brand B", "Brand C"],
+            'analyses': [("Brand A", '["Unpaid overtime"]'), ("Brand B", '"Unpaid overtime"'), ("Brand C", "Unpaid overtime")],
+            'bot_response': BOT_RESPONSES['REPORT_COMPLETE'],
+        }
+        ReportGenerator(utils_manager=FakeUtilsManager()).save(self.session, report)
+        self.assertEqual(
+            list(self.session.violations.order_by('buyer_company').values_list('violation_text', 'complaint_summary')),
+            [('["Unpaid overtime"]', None), ('"Unpaid overtime"', None), ("Unpaid overtime", None)],
+        )
+
+    def test_cached_history_is_extended_when_the_report_commits(self):
+        history_cache = ConversationHistoryCache()
+        generator = ReportGenerator(utils_manager=FakeUtilsManager(), history_cache=history_cache)
+        report = generator.analyse(self.session, self.history)
+        self.assertEqual(history_cache.get(self.session), [])
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                generator.save(self.session, report)
+                raise RuntimeError("Report job was taken over")
+        self.assertEqual(history_cache.get(self.session), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                generator.save(self.session, report)
+        self.assertEqual(history_cache.get(self.session), [{"role": "assistant", "content": report['bot_response']}])
+
+    def test_malformed_analyses_are_stored_as_errors(self):
+        # null violations, a non-string category and a JSON list instead of an object
+        responses = ['{"policy_violations": null}', '{"policy_violations": [{"policy_category": 7}]}', '["Unpaid overtime"]']
+        utils_manager = UtilsManager()
+        utils_manager.query_ollama = lambda messages, model=None: responses.pop()
+        utils_manager.extract_factory_name = lambda history: "Factory A"
+        utils_manager.extract_incident = lambda chat_history: "unpaid overtime"
+        utils_manager.search_buyer_company_from_factory = lambda factory_name: ["23Andme"] * 3
+        queue = ReportJobQueue(ReportGenerator(utils_manager=utils_manager))
+
+        job = queue.enqueue(self.session, self.history)
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.SUCCEEDED)
+        results = [json.loads(text) for text in self.session.violations.values_list('violation_text', flat=True)]
+        self.assertEqual(sum("error" in result for result in results), 2)
+        self.assertIn({"policy_violations": [{"policy_category": 7}]}, results)
+
+    def test_expired_lease_is_claimed_again(self):
+        queue = self.make_queue()
+        job = queue.enqueue(self.session, self.history)
+        self.assertEqual(queue.claim("worker-1").id, job.id)
+        self.assertIsNone(queue.claim("worker-2"))
+
+        ReportJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        reclaimed = queue.claim("worker-2")
+        self.assertEqual((reclaimed.worker, reclaimed.attempts), ("worker-2", 2))
+
+    def test_failure_of_a_taken_over_attempt_is_discarded(self):
+        queue = self.make_queue()
+        job = queue.enqueue(self.session, self.history)
+        stale = queue.claim("worker-1")
+        ReportJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        queue.claim("worker-2")
+
+        queue._record_failure(stale, RuntimeError("Analysis failed"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker, job.last_error), (ReportJob.RUNNING, 2, "worker-2", None))
+
+    def test_failure_message_is_translated_without_the_llm(self):
+        self.session.language = "Thai"
+        self.session.save()
+        get_translation_memory().store(BOT_RESPONSES['REPORT_FAILED'], "Thai", "สร้างรายงานไม่สำเร็จ")
+        self.addCleanup(get_translation_memory().cache.clear)
+        queue = self.make_queue()
+        utils_manager = queue.generator.utils_manager
+        utils_manager.get_company_policy_reports = mock.Mock(side_effect=LLMUnavailable("LLM request failed"))
+        utils_manager.translation_from_English = mock.Mock(side_effect=LLMUnavailable("LLM request failed"))
+
+        job = queue.enqueue(self.session, self.history)
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result_message), (ReportJob.FAILED, "สร้างรายงานไม่สำเร็จ"))
+        self.assertEqual(self.session.messages.last().content, "สร้างรายงานไม่สำเร็จ")
+        utils_manager.translation_from_English.assert_not_called()
+
+    def test_status_endpoint_is_limited_to_the_chat_session(self):
+        job = self.make_queue().enqueue(self.session, self.history)
+        url = reverse('report_status', args=[job.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        client_session = self.client.session
+        client_session['chat_session_id'] = self.session.id
+        client_session.save()
+        self.assertEqual(self.client.get(url).json(), {'status': 'pending', 'message': None, 'complete': False})
+
+
+class EventStreamTests(SimpleTestCase):
+    def test_events_are_forwarded_in_order_and_end_with_done(self):
+        stream = EventStream()
+
+        def work():
+            stream.emit('token', {'stage': 'generation', 'text': "Hel"})
+            stream.emit('token', {'stage': 'generation', 'text': "lo"})
+            return {'message': "Hello"}
+
+        self.assertEqual(list(stream.run(work)), [
+            sse_event('token', {'stage': 'generation', 'text': "Hel"}),
+            sse_event('token', {'stage': 'generation', 'text': "lo"}),
+            sse_event('done', {'message': "Hello"}),
+        ])
+
+    def test_failures_end_with_an_error_event(self):
+        def work():
+            raise TimeoutError("LLM timed out")
+
+        events = list(EventStream().run(work))
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].startswith("event: error\n"))
+
+    def test_event_format(self):
+        self.assertEqual(sse_event('token', {'text': "สวัสดี"}), 'event: token\ndata: {"text": "สวัสดี"}\n\n')
+
+
+class ChatPipelineTests(TestCase):
+    """One location-detection turn through the sync and the async pipeline with a stubbed LLM."""
+
+    def setUp(self):
+        cache.clear()
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            return "Taiwan"
+
+        patcher = mock.patch.object(get_llm_client(), 'acomplete', acomplete)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="English")
+
+    def session_data(self):
+        return {'initialized': True, 'chat_session_id': self.session.id, 'conversation_state': 'location_detection'}
+
+    def assertLocationTurn(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.location, "Taiwan")
+        self.assertEqual(json.loads(response.content)['message'], self.session.messages.last().content)
+        self.assertEqual(self.session.messages.count(), 2)
+
+    def test_sync_turn(self):
+        client_session = self.client.session
+        client_session.update(self.session_data())
+        client_session.save()
+        response = self.client.post(reverse('chat_message'), {'message': "I work in Taiwan"}, content_type='application/json')
+        self.assertLocationTurn(response)
+        self.assertEqual(self.client.session['conversation_state'], 'gender_nationality_detection')
+
+    async def test_async_turn(self):
+        request = AsyncRequestFactory().post(
+            '/chat/message/', {'message': "I work in Taiwan"}, content_type='application/json'
+        )
+        request.session = SessionStore()
+        request.session.update(self.session_data())
+        response = await AsyncChatViewManager().chat_message(request)
+        self.assertEqual(request.session['conversation_state'], 'gender_nationality_detection')
+        await sync_to_async(self.assertLocationTurn)(response)
+
+
+
+class ParseCombinedTurnTests(SimpleTestCase):
+    def test_valid_response(self):
+        turn = parse_combined_turn(
+            '```json\n{"advance": "yes", "reply": " Thanks! ", "slots": {"industrial_sector": "Electronics", "other": "x"}}\n```',
+            ['industrial_sector'],
+        )
+        self.assertEqual(turn, {'advance': True, 'reply': "Thanks!", 'slots': {'industrial_sector': "Electronics"}})
+
+    def test_placeholder_slots_are_dropped(self):
+        turn = parse_combined_turn('{"advance": false, "reply": "Which factory?", "slots": {"factory_product": "null"}}', ['factory_product'])
+        self.assertEqual(turn['slots'], {})
+
+    def test_malformed_responses(self):
+        for text in ("Sure, let's continue.", '{"advance": true', '{"advance": "maybe", "reply": "Hi"}', '{"advance": true, "reply": ""}'):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_combined_turn(text))
+
+
+@override_settings(CASE_TURN_MODE='combined')
+class CombinedCaseTurnTests(TestCase):
+    """A collect_basic_info turn in combined mode, with a stubbed LLM."""
+
+    def setUp(self):
+        cache.clear()
+        self.responses = []
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            return self.responses.pop(0)
+
+        patcher = mock.patch.object(get_llm_client(), 'acomplete', acomplete)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="English", case_type="Employer Exploitation")
+        client_session = self.client.session
+        client_session.update({
+            'initialized': True,
+            'chat_session_id': self.session.id,
+            'conversation_state': 'case_handling',
+            'case_type': "Employer Exploitation",
+            'current_node': 'collect_basic_info',
+        })
+        client_session.save()
+
+    def send(self, message):
+        return self.client.post(reverse('chat_message'), {'message': message}, content_type='application/json')
+
+    def test_one_call_advances_and_fills_slots(self):
+        self.responses = [json.dumps({
+            'advance': True,
+            'reply': "Thank you. Do you know which companies your factory supplies?",
+            'slots': {'industrial_sector': "Electronics", 'job_in_factory': "Assembly"},
+        })]
+        response = self.send("I assemble phones at Acme Electronics")
+        self.assertEqual(json.loads(response.content)['message'], "Thank you. Do you know which companies your factory supplies?")
+        self.assertEqual(self.client.session['current_node'], 'collect_brand_info')
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.industrial_sector, self.session.job_in_factory), ("Electronics", "Assembly"))
+        self.assertEqual(self.responses, [])
+
+    def test_malformed_response_falls_back_to_separate_calls(self):
+        # Combined call, then navigation check, sector extraction and the reply
+        self.responses = ["Not JSON", "No", "Electronics", "Could you tell me the factory name?"]
+        response = self.send("It is hard to say")
+        self.assertEqual(json.loads(response.content)['message'], "Could you tell me the factory name?")
+        self.assertEqual(self.client.session['current_node'], 'collect_basic_info')
+        self.assertEqual(self.responses, [])
+
+
+@override_settings(REPLY_LANGUAGE_MODE='native', NATIVE_REPLY_LANGUAGES=['Vietnamese'])
+class NativeReplyLanguageTests(TestCase):
+    """Case turns for a Vietnamese session with replies written directly in Vietnamese."""
+
+    VIETNAMESE_REPLY = "Cảm ơn bạn đã chia sẻ. Bạn có thể cho tôi biết tên nhà máy và công việc của bạn không?"
+
+    def setUp(self):
+        cache.clear()
+        self.prompts = []
+        self.responses = []
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            self.prompts.append(messages[-1]['content'])
+            return self.responses.pop(0)
+
+        patcher = mock.patch.object(get_llm_client(), 'acomplete', acomplete)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        session = ChatSession.objects.create(language="Vietnamese", case_type="Employer Exploitation")
+        client_session = self.client.session
+        client_session.update({
+            'initialized': True,
+            'chat_session_id': session.id,
+            'conversation_state': 'case_handling',
+            'case_type': "Employer Exploitation",
+            'current_node': 'start',
+        })
+        client_session.save()
+
+    def send(self, message):
+        response = self.client.post(reverse('chat_message'), {'message': message}, content_type='application/json')
+        return json.loads(response.content)['message']
+
+    def test_native_language_names(self):
+        utils_manager = AsyncChatViewManager().utils_manager
+        self.assertEqual(utils_manager.native_reply_language("vietnamese"), "Vietnamese")
+        self.assertIsNone(utils_manager.native_reply_language("Burmese"))
+
+    def test_reply_skips_both_translations(self):
+        # Navigation check, then the reply
+        self.responses = ["No", self.VIETNAMESE_REPLY]
+        self.assertEqual(self.send("Chủ nhà máy không trả lương cho tôi"), self.VIETNAMESE_REPLY)
+        self.assertIn("Chủ nhà máy không trả lương cho tôi", self.prompts[1])
+        self.assertIn("in Vietnamese", self.prompts[1])
+        self.assertNotIn('reply_language_mode', self.client.session)
+
+    def test_reply_in_wrong_language_is_translated(self):
+        self.responses = ["No", "Thank you. Which factory do you work in?", self.VIETNAMESE_REPLY]
+        self.assertEqual(self.send("Chủ nhà máy không trả lương cho tôi"), self.VIETNAMESE_REPLY)
+        self.assertEqual(self.client.session['reply_language_mode'], 'translate')
+        self.assertEqual(self.responses, [])
+
+
+class MockLLMServerTests(SimpleTestCase):
+    """The app's LLM client against a local mock server."""
+
+    MESSAGES = [{"role": "user", "content": "Where do you work?"}]
+
+    def start_server(self, **options):
+        server = MockLLMServer(('127.0.0.1', 0), **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_replays_recordings_in_order(self):
+        store = RecordingStore()
+        key = prompt_key("test-model", self.MESSAGES)
+        store.record(key, "test-model", self.MESSAGES, "Taiwan")
+        store.record(key, "test-model", self.MESSAGES, "Taichung, Taiwan")
+        client = LLMClient(base_url=self.start_server(store=store).base_url)
+
+        replies = [client.complete(self.MESSAGES, model="test-model") for _ in range(3)]
+        self.assertEqual(replies, ["Taiwan", "Taichung, Taiwan", "Taichung, Taiwan"])
+        self.assertEqual("".join(client.stream(self.MESSAGES, model="test-model")), "Taichung, Taiwan")
+
+    def test_synthesises_unrecorded_prompts(self):
+        server = self.start_server(rules=[{"contains": "Where do", "response": "Taiwan"}], tokens_per_second=1000)
+        client = LLMClient(base_url=server.base_url)
+        self.assertEqual(client.complete(self.MESSAGES), "Taiwan")
+        self.assertTrue(client.complete([{"role": "user", "content": "Hello"}]))
+
+    def test_reports_token_usage(self):
+        client = LLMClient(base_url=self.start_server(rules=[{"contains": "Where do", "response": "Taiwan"}]).base_url)
+        for call in (client.complete, lambda *args, **kwargs: "".join(client.stream(*args, **kwargs))):
+            usages = []
+            self.assertEqual(call(self.MESSAGES, on_usage=usages.append), "Taiwan")
+            self.assertEqual([(usage.prompt_tokens, usage.completion_tokens) for usage in usages], [(4, 1)])
+
+    def test_injected_errors_and_misses(self):
+        for options, status in (({'error_rate': 1.0, 'error_status': 429}, 429), ({'on_miss': 'error'}, 404)):
+            with self.subTest(options=options):
+                server = self.start_server(**options)
+                response = httpx.post(f"{server.base_url}/chat/completions", json={'model': "m", 'messages': self.MESSAGES})
+                self.assertEqual(response.status_code, status)
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    """Admission order, rate-limit pauses and retries of LLM requests."""
+
+    def test_token_bucket_keeps_reserve(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=1, capacity=3, clock=lambda: now[0])
+        self.assertEqual(bucket.take(reserve=2), 0)
+        self.assertAlmostEqual(bucket.take(reserve=2), 1.0)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        self.assertAlmostEqual(bucket.take(), 1.0)
+        now[0] = 1.0
+        self.assertEqual(bucket.take(), 0)
+
+    def test_interactive_requests_are_admitted_first(self):
+        scheduler = LLMScheduler(requests_per_minute=1200, burst=1, interactive_reserve=0)
+        admitted = []
+
+        async def request(name, priority):
+            await scheduler.admit(priority, time.monotonic() + 5)
+            admitted.append(name)
+
+        async def run():
+            await request('first', BACKGROUND)
+            # Both wait for the bucket; the interactive one arrives last but goes first
+            background = asyncio.ensure_future(request('report', BACKGROUND))
+            await asyncio.sleep(0)
+            await asyncio.gather(background, request('turn', INTERACTIVE))
+
+        asyncio.run(run())
+        self.assertEqual(admitted, ['first', 'turn', 'report'])
+
+    def test_rate_limit_headers_pause_admission(self):
+        scheduler = LLMScheduler(requests_per_minute=0)
+        scheduler.observe_headers(200, httpx.Headers({'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': '9999999999999'}))
+        self.assertIsNone(scheduler.retry_after())
+
+        reset = str(int((time.time() + 30) * 1000))
+        scheduler.observe_headers(200, httpx.Headers({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': reset}))
+        self.assertAlmostEqual(scheduler.retry_after(), 30, delta=1)
+
+        # A request whose deadline ends before the pause fails at once
+        with self.assertRaises(LLMUnavailable) as raised:
+            asyncio.run(scheduler.admit(INTERACTIVE, time.monotonic() + 5))
+        self.assertAlmostEqual(raised.exception.retry_after, 30, delta=1)
+
+    def test_transient_errors_are_retried(self):
+        for status, attempts in ((429, 3), (503, 3), (400, 1)):
+            with self.subTest(status=status):
+                server = MockLLMServer(('127.0.0.1', 0), error_rate=1.0, error_status=status)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                self.addCleanup(server.server_close)
+                self.addCleanup(server.shutdown)
+                scheduler = LLMScheduler(requests_per_minute=0, max_attempts=3, base_delay=0.01)
+                client = LLMClient(base_url=server.base_url, scheduler=scheduler)
+
+                with self.assertRaises(LLMUnavailable):
+                    client.complete([{"role": "user", "content": "Hello"}])
+                self.assertEqual(server.usage()[0], attempts)
+
+
+class LLMUnavailableTurnTests(TestCase):
+    """A turn whose LLM requests fail answers with a request to try again instead of a 500."""
+
+    def setUp(self):
+        cache.clear()
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            raise LLMUnavailable("LLM request failed after 4 attempts", retry_after=12.5)
+
+        patcher = mock.patch.object(get_llm_client(), 'acomplete', acomplete)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="English")
+
+    def session_data(self):
+        return {'initialized': True, 'chat_session_id': self.session.id, 'conversation_state': 'location_detection'}
+
+    def assertRetryResponse(self, response):
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '13')
+        self.assertEqual(json.loads(response.content), {'message': BOT_RESPONSES['LLM_BUSY'], 'retry': True})
+
+    def assertTurnDiscarded(self):
+        # Sending the message again must not store it twice
+        self.assertFalse(self.session.messages.exists())
+        self.assertEqual(get_history_cache().get(self.session), [])
+
+    def test_sync_turn(self):
+        client_session = self.client.session
+        client_session.update(self.session_data())
+        client_session.save()
+        response = self.client.post(reverse('chat_message'), {'message': "I work in Taiwan"}, content_type='application/json')
+        self.assertRetryResponse(response)
+        self.assertTurnDiscarded()
+        self.assertEqual(dict(self.client.session.items()), self.session_data())
+
+    def test_new_chat_session_is_deleted(self):
+        response = self.client.post(
+            reverse('chat_message'), {'message': "Hello", 'new_session': True}, content_type='application/json'
+        )
+        self.assertRetryResponse(response)
+        self.assertEqual(list(ChatSession.objects.all()), [self.session])
+
+    async def test_async_turn(self):
+        request = AsyncRequestFactory().post(
+            '/chat/message/', {'message': "I work in Taiwan"}, content_type='application/json'
+        )
+        request.session = SessionStore()
+        request.session.update(self.session_data())
+        self.assertRetryResponse(await AsyncChatViewManager().chat_message(request))
+        await sync_to_async(self.assertTurnDiscarded)()
+        self.assertEqual(dict(request.session.items()), self.session_data())
+
+
+class ChatTurnBudgetTests(TransactionTestCase):
+    """Every scripted conversation stays within its per-turn budgets (see data/benchmark_budgets.json)."""
+
+    # Transactional, since history summaries are saved from a background thread
+
+    def test_conversations_within_budget(self):
+        cache.clear()
+        conversations = load_conversations()
+        if importlib.util.find_spec('langchain') is None:
+            # Legal rights answers need the vector store
+            conversations = [c for c in conversations if c['case_type'] != "Legal Rights Inquiry"]
+
+        results = ChatTurnBenchmark().run(conversations)
+        self.assertEqual(check_budgets(results, load_budgets()), [])
+        self.assertEqual(len(results), len(conversations))
+
+    def test_exceeded_budget_is_reported(self):
+        results = [{'name': "lender_harassment", 'turns': [{'llm_calls': 2}, {'llm_calls': 4}], 'errors': 0}]
+        self.assertEqual(
+            check_budgets(results, {'default': {'llm_calls': 3}}),
+            ["lender_harassment: turn 2 llm_calls 4 exceeds budget 3"],
+        )
+
+
+class RequestMetricsTests(TestCase):
+    """LLM spans and query counts of a chat turn, seen through the metrics endpoints."""
+
+    def setUp(self):
+        cache.clear()
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            return "Taiwan"
+
+        for patcher in (
+            mock.patch.object(get_llm_client(), 'acomplete', acomplete),
+            mock.patch('chatbot.metrics._trace_store', TraceStore()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="English")
+        client_session = self.client.session
+        client_session.update({'initialized': True, 'chat_session_id': self.session.id, 'conversation_state': 'location_detection'})
+        client_session.save()
+
+    def test_chat_turn_is_traced(self):
+        self.client.post(reverse('chat_message'), {'message': "I work in Taiwan"}, content_type='application/json')
+
+        traces = self.client.get(reverse('session_trace', args=[self.session.id])).json()['traces']
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0]['view'], 'chat_message')
+        self.assertGreater(traces[0]['db_queries'], 0)
+        self.assertEqual([(span['kind'], span['name']) for span in traces[0]['spans']], [('llm', 'extract_location')])
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('pobot_llm_call_seconds_bucket{method="extract_location",outcome="ok",le="+Inf"}', metrics)
+        self.assertIn('pobot_db_queries_per_request_count{view="chat_message"}', metrics)
+
+    async def test_views_that_do_not_use_the_session_do_not_load_it(self):
+        # Loading the session in the middleware would run a sync query on the event loop
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        response = await self.async_client.get(reverse('about'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_trace_store().get(self.session.id), [])
+
+    def test_endpoints_are_local_only(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('session_trace', args=[self.session.id]), REMOTE_ADDR='203.0.113.5').status_code, 403
+        )
+
+
+class StreamedTurnTests(TransactionTestCase):
+    """Streamed turns, which run on a worker thread after the view has returned."""
+
+    def setUp(self):
+        cache.clear()
+        self.replies = ["Taiwan"]
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            reply = self.replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        for patcher in (
+            mock.patch.object(get_llm_client(), 'acomplete', acomplete),
+            mock.patch('chatbot.metrics._trace_store', TraceStore()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="English")
+        self.session_data = {'initialized': True, 'chat_session_id': self.session.id, 'conversation_state': 'location_detection'}
+        client_session = self.client.session
+        client_session.update(self.session_data)
+        client_session.save()
+
+    def send(self, message):
+        response = self.client.post(reverse('chat_stream'), {'message': message}, content_type='application/json')
+        return b"".join(response.streaming_content).decode()
+
+    def test_streamed_turn_is_traced(self):
+        self.assertIn("event: done\n", self.send("I work in Taiwan"))
+
+        traces = self.client.get(reverse('session_trace', args=[self.session.id])).json()['traces']
+        self.assertEqual(traces[0]['view'], 'chat_stream')
+        self.assertEqual([(span['kind'], span['name']) for span in traces[0]['spans']], [('llm', 'extract_location')])
+        # The turn's own queries run on the streaming worker thread
+        self.assertGreater(traces[0]['db_queries'], 3)
+
+    def test_unavailable_llm_is_handled_like_a_sync_turn(self):
+        self.replies = [LLMUnavailable("LLM request failed after 4 attempts"), "Taiwan"]
+        self.assertIn('"retry": true', self.send("I work in Taiwan"))
+        self.assertFalse(self.session.messages.exists())
+        self.assertEqual(dict(self.client.session.items()), self.session_data)
+
+        self.assertIn("event: done\n", self.send("I work in Taiwan"))
+        self.assertEqual(list(self.session.messages.values_list('role', flat=True)), ['user', 'assistant'])
+
+
+@override_settings(PROMPT_HISTORY_RECENT_MESSAGES=4, PROMPT_HISTORY_SUMMARY_BATCH=4)
+class HistorySummaryTests(TransactionTestCase):
+    """Older messages are summarised on a background thread, which writes the session itself."""
+
+    def setUp(self):
+        self.release = threading.Event()
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            await asyncio.to_thread(self.release.wait, 5)
+            return "The user works at Factory A."
+
+        for patcher in (
+            mock.patch.object(get_llm_client(), 'acomplete', acomplete),
+            mock.patch('chatbot.llm_usage._recorder', UsageRecorder()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.utils_manager = UtilsManager()
+        self.session = ChatSession.objects.create(case_type="Wage Theft")
+        self.history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(9)
+        ]
+
+    def test_prompts_use_the_older_messages_until_the_summary_is_saved(self):
+        thread = self.utils_manager.start_history_summary(self.session, self.history)
+        self.assertIsNotNone(thread)
+        # A second turn while the summary is running does not start another one
+        self.assertIsNone(self.utils_manager.start_history_summary(self.session, self.history))
+        self.assertIn("message 0", self.utils_manager.get_prompt_history(self.session, self.history))
+
+        self.release.set()
+        thread.join(5)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.conversation_summary, "The user works at Factory A.")
+        self.assertEqual(self.session.summary_message_count, 5)
+        prompt_history = self.utils_manager.get_prompt_history(self.session, self.history)
+        self.assertTrue(prompt_history.startswith("Summary of earlier conversation: The user works at Factory A."))
+        self.assertNotIn("message 4", prompt_history)
+        self.assertIn("message 5", prompt_history)
+
+    def test_summary_waits_for_a_full_batch(self):
+        self.assertIsNone(self.utils_manager.start_history_summary(self.session, self.history[:7]))
+
+
+class LLMUsageTests(TestCase):
+    """Token usage rows of chat turns and report jobs, and their dashboard aggregation."""
+
+    def setUp(self):
+        cache.clear()
+
+        async def acomplete(messages, model=None, timeout=None, on_usage=None, priority=None):
+            on_usage(SimpleNamespace(prompt_tokens=len(messages[-1]['content']) // 4, completion_tokens=2))
+            return "Taiwan"
+
+        self.recorder = UsageRecorder()
+        for patcher in (
+            mock.patch.object(get_llm_client(), 'acomplete', acomplete),
+            mock.patch('chatbot.llm_usage._recorder', self.recorder),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.session = ChatSession.objects.create(language="English", case_type="Wage Theft")
+
+    def test_chat_turn_usage_is_recorded_in_batches(self):
+        client_session = self.client.session
+        client_session.update({
+            'initialized': True,
+            'chat_session_id': self.session.id,
+            'case_type': "Wage Theft",
+            'conversation_state': 'location_detection',
+        })
+        client_session.save()
+        self.client.post(reverse('chat_message'), {'message': "I work in Taiwan"}, content_type='application/json')
+
+        # Nothing is written during the turn
+        self.assertFalse(LLMUsage.objects.exists())
+        self.assertEqual(self.recorder.flush(), 1)
+
+        usage = LLMUsage.objects.get()
+        self.assertEqual(usage.session, self.session)
+        self.assertEqual(usage.call_site, 'extract_location')
+        self.assertEqual((usage.case_type, usage.conversation_state), ("Wage Theft", 'location_detection'))
+        self.assertGreater(usage.prompt_tokens, 0)
+        self.assertEqual(usage.completion_tokens, 2)
+
+    def test_calls_outside_a_scope_have_no_session(self):
+        utils_manager = UtilsManager()
+        utils_manager.extract_gender("I am a woman")
+        with usage_scope({'chat_session_id': self.session.id, 'case_type': "Wage Theft", 'conversation_state': 'generate_report'}):
+            utils_manager.extract_gender("I am a woman")
+        self.recorder.flush()
+
+        self.assertEqual(
+            list(LLMUsage.objects.order_by('id').values_list('session', 'conversation_state', 'call_site')),
+            [(None, '', 'extract_gender'), (self.session.id, 'generate_report', 'extract_gender')],
+        )
+
+    def test_dashboard_aggregates_usage(self):
+        for case_type, state, call_site, prompt_tokens in (
+            ("Wage Theft", 'case_handling', 'build_prompt', 900),
+            ("Wage Theft", 'generate_report', 'get_company_policy_report', 5000),
+            ("Wage Theft", 'generate_report', 'get_company_policy_report', 5000),
+            ("Employer Exploitation", 'case_handling', 'build_prompt', 700),
+        ):
+            LLMUsage.objects.create(
+                session=self.session, case_type=case_type, conversation_state=state, call_site=call_site,
+                model="test-model", prompt_tokens=prompt_tokens, completion_tokens=100, latency_ms=1500,
+            )
+        # Outside the dashboard window
+        LLMUsage.objects.create(call_site='identify_language', model="test-model", prompt_tokens=99999,
+                                created_at=timezone.now() - timedelta(days=400))
+
+        summary = usage_summary()
+        self.assertEqual(summary['totals']['calls'], 4)
+        self.assertEqual(summary['totals']['prompt_tokens'], 11600)
+        groups = {group['dimension']: group['rows'] for group in summary['groups']}
+        self.assertEqual([(row['key'], row['prompt_tokens']) for row in groups['call_site']],
+                         [('get_company_policy_report', 10000), ('build_prompt', 1600)])
+        self.assertEqual([row['key'] for row in groups['conversation_state']], ['generate_report', 'case_handling'])
+        self.assertEqual(groups['case_type'][0], {
+            'key': "Wage Theft", 'calls': 3, 'prompt_tokens': 10900, 'completion_tokens': 300,
+            'avg_latency_ms': 1500, 'total_seconds': 4.5,
+        })
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, "LLM Usage")
+        self.assertContains(response, "get_company_policy_report")
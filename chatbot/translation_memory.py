@@ -0,0 +1,141 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import TranslationMemory
+
+# Alternative names the language detector may return for the supported languages
+LANGUAGE_ALIASES = {
+    'indonesian': 'bahasa indonesia',
+    'bahasa': 'bahasa indonesia',
+    'myanmar': 'burmese',
+    'vietnamese language': 'vietnamese',
+    'tiếng việt': 'vietnamese',
+}
+
+
+def normalize_source(text):
+    """Normalize source text for lookup: trimmed, with internal whitespace collapsed."""
+    return re.sub(r'\s+', ' ', str(text)).strip()
+
+
+def normalize_language(language):
+    """Normalize a target language name, mapping known aliases to one spelling."""
+    key = str(language).strip().lower()
+    return LANGUAGE_ALIASES.get(key, key)
+
+
+def source_hash(text):
+    return hashlib.sha256(normalize_source(text).encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TranslationMemoryStore:
+    """Two-tier translation memory keyed by (normalized source text, target language).
+
+    Lookups hit an in-process LRU first and fall back to the TranslationMemory
+    table; database hits are promoted into the LRU.
+    """
+
+    def __init__(self, capacity=None):
+        self.cache = LRUCache(capacity or getattr(settings, "TRANSLATION_MEMORY_LRU_SIZE", 2048))
+
+    def lookup(self, text, language):
+        """
+        Find a stored translation.
+
+        Args:
+            text (str): English source text
+            language (str): Target language
+
+        Returns:
+            str or None: The stored translation, or None on a miss
+        """
+        key = (source_hash(text), normalize_language(language))
+        translation = self.cache.get(key)
+        if translation is not None:
+            return translation
+
+        translation = TranslationMemory.objects.filter(
+            source_hash=key[0], language=key[1]
+        ).values_list('translation', flat=True).first()
+        if translation is not None:
+            self.cache.set(key, translation)
+        return translation
+
+    def store(self, text, language, translation):
+        """Save a translation in both tiers."""
+        key = (source_hash(text), normalize_language(language))
+        TranslationMemory.objects.update_or_create(
+            source_hash=key[0],
+            language=key[1],
+            defaults={'source_text': normalize_source(text), 'translation': translation},
+        )
+        self.cache.set(key, translation)
+
+    async def alookup(self, text, language):
+        """Async variant of lookup."""
+        key = (source_hash(text), normalize_language(language))
+        translation = self.cache.get(key)
+        if translation is not None:
+            return translation
+
+        translation = await TranslationMemory.objects.filter(
+            source_hash=key[0], language=key[1]
+        ).values_list('translation', flat=True).afirst()
+        if translation is not None:
+            self.cache.set(key, translation)
+        return translation
+
+    async def astore(self, text, language, translation):
+        """Async variant of store."""
+        key = (source_hash(text), normalize_language(language))
+        await TranslationMemory.objects.aupdate_or_create(
+            source_hash=key[0],
+            language=key[1],
+            defaults={'source_text': normalize_source(text), 'translation': translation},
+        )
+        self.cache.set(key, translation)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_translation_memory():
+    """Return the process-wide translation memory, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TranslationMemoryStore()
+    return _store
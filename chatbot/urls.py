@@ -1,22 +1,32 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from .async_views import AsyncChatViewManager
 from .session_manager import SessionManager
-from .views import PageViewManager, ChatViewManager, PDFManager, SessionViewManager
+from .views import PageViewManager, ChatViewManager, PDFManager, SessionViewManager, MetricsViewManager
 
 # Initialize managers
 session_manager = SessionManager()
 page_view_manager = PageViewManager()
 chat_view_manager = ChatViewManager()
+# CHAT_VIEW_MODE=async serves chat messages from the async pipeline (deploy under ASGI)
+chat_message_manager = AsyncChatViewManager() if settings.CHAT_VIEW_MODE == 'async' else chat_view_manager
 pdf_manager = PDFManager()
 session_view_manager = SessionViewManager()
+metrics_view_manager = MetricsViewManager()
 
 urlpatterns = [
     path('', page_view_manager.index, name='index'),
     path('about/', page_view_manager.about, name='about'),
     path('dashboard/', page_view_manager.dashboard, name='dashboard'),
+    path('dashboard/sessions/', page_view_manager.dashboard_sessions, name='dashboard_sessions'),
     path('session/<int:session_id>/', page_view_manager.session_detail, name='session_detail'),
     path('session/<int:session_id>/download-pdf/', pdf_manager.download_session_pdf, name='download_session_pdf'),
     path('session/<int:session_id>/delete/', session_view_manager.delete_session, name='delete_session'),
-    path('chat/message/', chat_view_manager.chat_message, name='chat_message'),
+    path('session/<int:session_id>/trace/', metrics_view_manager.session_trace, name='session_trace'),
+    path('metrics/', metrics_view_manager.metrics, name='metrics'),
+    path('chat/message/', chat_message_manager.chat_message, name='chat_message'),
+    path('chat/stream/', chat_view_manager.chat_stream, name='chat_stream'),
+    path('chat/report-status/<uuid:job_id>/', chat_view_manager.report_status, name='report_status'),
     path('chat/clear-session/', session_manager.clear_session, name='clear_session'),
 ]
\ No newline at end of file
@@ -1,185 +1,56 @@
+import contextvars
 import json
+import logging
 import os
-import networkx as nx
 import pandas as pd
-from openai import OpenAI
+from .conversation_context import format_prompt_history, split_history
+from .case_classifier import get_case_classifier
+from .case_graphs import get_case_graphs
+from .language_id import ENGLISH, LANGUAGE_NAMES, detect_language
+from .llm_client import DEFAULT_MODEL, get_llm_client, get_concurrent_runner
+from .llm_scheduler import BACKGROUND, current_priority, llm_priority
+from .llm_usage import track_usage, usage_scope
+from .metrics import llm_call, llm_label, llm_method, timed
+from .policy_store import get_policy_store
+from .structured_turn import parse_combined_turn
+from .translation_memory import get_translation_memory
+from .supplier_index import get_supplier_index
 from .models import ChatSession, ChatMessage, BuyerCompany, PolicyViolation
 import re
-from langchain_chroma import Chroma
-# from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain.embeddings import SentenceTransformerEmbeddings
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+from .runtime import get_runtime
+
+logger = logging.getLogger(__name__)
+
+# Background summary threads by chat session id, at most one per session
+_summary_threads = {}
+_summary_lock = threading.Lock()
+
+
 class UtilsManager:
     def __init__(self):
-        # Initialize OpenRouter client
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY")
-        )
+        # Shared pooled OpenRouter client and runner for concurrent calls
+        self.llm_client = get_llm_client()
+        self.runner = get_concurrent_runner()
         
-        # Initialize embeddings and database
-        self.embeddings = SentenceTransformerEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        self.db = Chroma(persist_directory="./chatbot/taiwan_db", embedding_function=self.embeddings)
-        
-        # Define case graphs
-        self.legal_rights_graph = {
-            "case_type": "Legal Rights Inquiry",
-            "nodes": {
-                "start": {
-                    "text": "Collect basic information about the legal rights inquiry."
-                },
-                "rag_response": {
-                    "text": "Provide comprehensive legal information using RAG approach based on the user's query."
-                }
-            },
-            "edges": [
-                ["start", "rag_response"]
-            ]
-        }
-
-        self.lender_harassment_graph = {
-            "case_type": "Lender Harassment",
-            "nodes": {
-                "start": {
-                    "text": "Collect basic information about the lender harassment situation."
-                },
-                "document_interactions": {
-                    "text": "Document all interactions with the lender, including dates, times, and what was said."
-                },
-                "check_loan_terms": {
-                    "text": "Review the loan agreement terms and identify any violations by the lender."
-                },
-                "gather_evidence": {
-                    "text": "Collect evidence such as threatening messages, call logs, or witness statements."
-                },
-                "legal_options": {
-                    "text": "Explore legal options such as filing a complaint with regulatory authorities."
-                },
-                "safety_plan": {
-                    "text": "Develop a safety plan if the harassment involves threats or intimidation."
-                },
-                "generate_report": {
-                    "text": "Generate a comprehensive report of the harassment case."
-                }
-            },
-            "edges": [
-                ["start", "document_interactions"],
-                ["document_interactions", "check_loan_terms"],
-                ["check_loan_terms", "gather_evidence"],
-                ["gather_evidence", "legal_options"],
-                ["legal_options", "safety_plan"],
-                ["safety_plan", "generate_report"]
-            ]
-        }
-
-        self.employer_exploitation_graph = {
-            "case_type": "Employer Exploitation",
-            "nodes": {
-                "start": {
-                    "text": "Begin by asking the client to describe their problem. Don't ask many questions; let the client tell their story first."
-                },
-                "collect_basic_info": {
-                    "text": "Collect basic information: What is the name of the factory? What type of goods does it produce? What is the factory address? What his task (job) in the factory?"
-                },
-                "collect_brand_info": {
-                    "text": "Collect information about the brand/buyer companies if the user know: Do you know who are the companies that your factory supply to? If you don't know don't wort."
-                },
-
-                "ask_recruitment_agency": {
-                    "text": "Ask for the name of the recruitment agency and any brokers involved."
-                },
-                "ask_for_contract": {
-                    "text": "Request a copy or detailed description of their employment contract."
-                },
-                "ask_for_proof": {
-                    "text": "Ask for evidence of exploitation (photos, messages, pay slips, etc.)."
-                },
-                "generate_report": {
-                    "text": "Automatically generate policy violation report based on collected evidence"
-                }
-            },
-            "edges": [
-                ["start", "collect_basic_info"],
-                ["collect_basic_info", "collect_brand_info"],
-                ["collect_brand_info", "ask_recruitment_agency"],
-                ["ask_recruitment_agency", "ask_for_contract"],
-                ["ask_for_contract", "ask_for_proof"],
-                ["ask_for_proof", "generate_report"]
-            ]
-        }
+        # Embeddings and vector database are shared across managers and loaded on first use
+        self.runtime = get_runtime()
+        
+        # Compiled case graphs, loaded once per process from data/case_graphs.json
+        self.case_graphs = get_case_graphs()
 
-        self.excessive_interest_graph = {
-            "case_type": "Excessive Interest Rate",
-            "nodes": {
-                "start": {
-                    "text": "Collect basic information about the loan and interest rate concerns."
-                },
-                "review_loan_agreement": {
-                    "text": "Review the loan agreement to identify interest rates, fees, and terms."
-                },
-                "calculate_effective_rate": {
-                    "text": "Calculate the effective interest rate including all fees and charges."
-                },
-                "check_legal_limits": {
-                    "text": "Check legal interest rate limits in the relevant jurisdiction."
-                },
-                "document_communications": {
-                    "text": "Document all communications with the lender regarding the loan."
-                },
-                "explore_refinancing": {
-                    "text": "Explore refinancing options or debt consolidation possibilities."
-                },
-                "generate_report": {
-                    "text": "Generate a comprehensive report of the excessive interest case."
-                }
-            },
-            "edges": [
-                ["start", "review_loan_agreement"],
-                ["review_loan_agreement", "calculate_effective_rate"],
-                ["calculate_effective_rate", "check_legal_limits"],
-                ["check_legal_limits", "document_communications"],
-                ["document_communications", "explore_refinancing"],
-                ["explore_refinancing", "generate_report"]
-            ]
-        }
+    @property
+    def embeddings(self):
+        return self.runtime.embeddings
 
-        self.agency_harassment_graph = {
-            "case_type": "Recruitment Agency Harassment",
-            "nodes": {
-                "start": {
-                    "text": "Collect basic information about the recruitment agency and harassment situation."
-                },
-                "document_interactions": {
-                    "text": "Document all interactions with the agency, including dates, times, and what was said."
-                },
-                "check_agency_status": {
-                    "text": "Check if the recruitment agency is legally registered and licensed."
-                },
-                "assess_threats": {
-                    "text": "Assess the nature and severity of threats or harassment from the agency."
-                },
-                "report_authorities": {
-                    "text": "Discuss options for reporting the agency to relevant authorities."
-                },
-                "refer_lawyer": {
-                    "text": "Provide information on seeking legal assistance for the harassment."
-                },
-                "ensure_protection": {
-                    "text": "Discuss measures to ensure personal safety and protection."
-                },
-                "generate_report": {
-                    "text": "Generate a comprehensive report of the agency harassment case."
-                }
-            },
-            "edges": [
-                ["start", "document_interactions"],
-                ["document_interactions", "check_agency_status"],
-                ["check_agency_status", "assess_threats"],
-                ["assess_threats", "report_authorities"],
-                ["report_authorities", "refer_lawyer"],
-                ["refer_lawyer", "ensure_protection"],
-                ["ensure_protection", "generate_report"]
-            ]
-        }
+    @property
+    def db(self):
+        return self.runtime.db
 
     def relevant_context(self, user_input):
         """Get relevant context from the database based on user input.
@@ -197,7 +68,8 @@ class UtilsManager:
             }
         )
 
-        context = retriever_vectordb.invoke(user_input)
+        with timed('retrieval', 'relevant_context'):
+            context = retriever_vectordb.invoke(user_input)
 
         return context
 
@@ -207,7 +79,7 @@ class UtilsManager:
         Args:
             user_input (str): The user's query
             context (object): The retrieved context
-            chat_history (list): List of message dictionaries
+            chat_history (list or str): List of message dictionaries or bounded history text
             
         Returns:
             str: The prompt template
@@ -247,32 +119,19 @@ class UtilsManager:
         """
         return template
 
-    def refine_user_query_for_rag(self, chat_history, current_query, model="google/gemma-3n-e4b-it:free"):
-        """
-        Refine and concatenate user queries from chat history to create a comprehensive search query for RAG.
-        
-        Args:
-            chat_history (list): List of message dictionaries with 'role' and 'content'
-            current_query (str): The current user query
-            model (str): The model to use for query refinement
-            
-        Returns:
-            str: Refined comprehensive query for RAG retrieval
-        """
+    def _rag_user_queries(self, chat_history, current_query):
+        """User messages of the conversation plus the current query, oldest first."""
         # Extract only user messages from chat history
         user_messages = [msg["content"] for msg in chat_history if msg["role"] == "user"]
         
         # Add current query if not already in history
         if current_query and current_query not in user_messages:
             user_messages.append(current_query)
-        
-        # If only one query, return it as is
-        if len(user_messages) <= 1:
-            return current_query
-        
+        return user_messages
+
+    def _refine_query_messages(self, user_messages):
         # Create a prompt to refine multiple user queries into one comprehensive query
         user_queries_text = "\n".join([f"Query {i+1}: {query}" for i, query in enumerate(user_messages)])
-        
         prompt = f"""
 You are a query refinement specialist. The user has asked multiple related questions in a conversation about legal rights and labor law. Your task is to combine and refine these queries into one comprehensive search query that captures the complete intent and context.
 
@@ -288,20 +147,46 @@ Create a single, comprehensive search query that:
 
 Return only the refined comprehensive query, nothing else.
 """
+        return [{"role": "user", "content": prompt}]
+
+    @llm_method('refine_user_query_for_rag')
+    def refine_user_query_for_rag(self, chat_history, current_query, model=DEFAULT_MODEL):
+        """
+        Refine and concatenate user queries from chat history to create a comprehensive search query for RAG.
         
-        messages = [{"role": "user", "content": prompt}]
-        completion = self.client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
+        Args:
+            chat_history (list): List of message dictionaries with 'role' and 'content'
+            current_query (str): The current user query
+            model (str): The model to use for query refinement
+            
+        Returns:
+            str: Refined comprehensive query for RAG retrieval
+        """
+        user_messages = self._rag_user_queries(chat_history, current_query)
         
-        refined_query = completion.choices[0].message.content.strip()
+        # If only one query, return it as is
+        if len(user_messages) <= 1:
+            return current_query
+        
+        refined_query = self.query_ollama(self._refine_query_messages(user_messages), model=model).strip()
         print(f"Original queries: {user_messages}")
         print(f"Refined query: {refined_query}")
         
         return refined_query
 
-    def respond_based_on_the_context_agent(self, user_input, chat_history, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('refine_user_query_for_rag')
+    async def arefine_user_query_for_rag(self, chat_history, current_query, model=DEFAULT_MODEL):
+        """Async variant of refine_user_query_for_rag."""
+        user_messages = self._rag_user_queries(chat_history, current_query)
+        if len(user_messages) <= 1:
+            return current_query
+        
+        refined_query = (await self.aquery_ollama(self._refine_query_messages(user_messages), model=model)).strip()
+        logger.debug(f"Refined query: {refined_query}")
+        return refined_query
+
+    @llm_method('respond_based_on_the_context_agent')
+    def respond_based_on_the_context_agent(self, user_input, chat_history, model=DEFAULT_MODEL, prompt_history=None, on_token=None, reply_language=None):
         """
         Generate a response based on the context retrieved from the database.
         
@@ -309,6 +194,9 @@ Return only the refined comprehensive query, nothing else.
             user_input (str): The user's query
             chat_history (list): List of message dictionaries
             model (str): The model to use for the response
+            prompt_history (str): Bounded history text for the prompt, defaults to the full chat_history
+            on_token (callable): Receives the response text as it streams in
+            reply_language (str): Write the response in this language instead of English
             
         Returns:
             str: The generated response
@@ -322,52 +210,97 @@ Return only the refined comprehensive query, nothing else.
         print("Context: ", context)
         
         # Create prompt template using original user input but with refined context
-        input_text = self.create_prompt_template(user_input, context, chat_history)   
+        input_text = self.create_prompt_template(user_input, context, prompt_history or chat_history)   
+        input_text += self.reply_language_instruction(reply_language)
         temp_messages=[{"role": "user", "content": input_text}]
         messages = temp_messages
         
-        completion = self.client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        return completion.choices[0].message.content
+        return self.query_ollama(messages, model=model, on_token=on_token)
+
+    @llm_method('respond_based_on_the_context_agent')
+    async def arespond_based_on_the_context_agent(self, user_input, chat_history, model=DEFAULT_MODEL, prompt_history=None, reply_language=None):
+        """Async variant of respond_based_on_the_context_agent."""
+        refined_query = await self.arefine_user_query_for_rag(chat_history, user_input, model)
+        
+        # Vector search is local CPU work on the embedding model
+        context = await sync_to_async(self.relevant_context)(refined_query)
+        
+        input_text = self.create_prompt_template(user_input, context, prompt_history or chat_history)
+        input_text += self.reply_language_instruction(reply_language)
+        return await self.aquery_ollama([{"role": "user", "content": input_text}], model=model)
 
 
     # Helper functions
-    def query_ollama(self, messages, model="google/gemma-3n-e4b-it:free"):
+    def query_ollama(self, messages, model=DEFAULT_MODEL, timeout=None, on_token=None, call_site=None):
         """
         Query the OpenRouter API with the given messages and model.
         
         Args:
             messages (list): List of message dictionaries with 'role' and 'content'
             model (str): The model to use for the query
+            timeout (float): Per-attempt timeout in seconds, defaults to LLM_REQUEST_TIMEOUT
+            on_token (callable): Called with each piece of text as it arrives; the response is
+                streamed when given
+            call_site (str): Label of the call in metrics and usage accounting, for prompts
+                built outside an @llm_method (e.g. 'build_prompt')
             
         Returns:
             str: The content of the response message
+            
+        Raises:
+            LLMUnavailable: The request was not answered within its retries and deadline; sent
+                with the priority class set by llm_priority(), interactive by default
         """
-        completion = self.client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        return completion.choices[0].message.content
-
-    def load_case_graph(self, data):
+        with llm_label(call_site), llm_call(), track_usage(model) as on_usage:
+            if on_token is None:
+                return self.llm_client.complete(
+                    messages, model=model, timeout=timeout, on_usage=on_usage, priority=current_priority()
+                )
+            
+            parts = []
+            for delta in self.llm_client.stream(
+                messages, model=model, timeout=timeout, on_usage=on_usage, priority=current_priority()
+            ):
+                parts.append(delta)
+                on_token(delta)
+            return "".join(parts)
+
+    async def aquery_ollama(self, messages, model=DEFAULT_MODEL, timeout=None, call_site=None):
         """
-        Load a case graph from the given data.
+        Async variant of query_ollama for callers already running in an event loop.
         
         Args:
-            data (dict): Dictionary containing case graph data
+            messages (list): List of message dictionaries with 'role' and 'content'
+            model (str): The model to use for the query
+            timeout (float): Per-call timeout in seconds, defaults to LLM_REQUEST_TIMEOUT
+            call_site (str): Label of the call in metrics and usage accounting
             
         Returns:
-            tuple: (case_type, graph)
+            str: The content of the response message
+            
+        Raises:
+            LLMUnavailable: The request was not answered within its retries and deadline
+        """
+        with llm_label(call_site), llm_call(), track_usage(model) as on_usage:
+            return await self.llm_client.arun(
+                self.llm_client.acomplete(
+                    messages, model=model, timeout=timeout, on_usage=on_usage, priority=current_priority()
+                )
+            )
+
+    def run_concurrently(self, *calls):
         """
-        G = nx.DiGraph()
-        for node_id, info in data["nodes"].items():
-            G.add_node(node_id, **info)
-        for src, dst in data["edges"]:
-            G.add_edge(src, dst)
-        return data["case_type"], G
+        Run independent helper calls at the same time.
+        
+        Args:
+            *calls: Zero-argument callables, e.g. lambda: self.extract_gender(message)
+            
+        Returns:
+            list: The results in the same order as the calls
+        """
+        return self.runner.run(*calls)
 
+    @llm_method('identify_case_type')
     def identify_case_type(self, user_input):
         """
         Identify the type of legal case based on user input.
@@ -378,31 +311,62 @@ Return only the refined comprehensive query, nothing else.
         Returns:
             str: The identified case type
         """
+        case_type = self._classify_case_type(user_input)
+        if case_type:
+            return case_type
+
+        response = self.query_ollama(self._case_type_messages(user_input))
+        case_type = response.strip()
+        print("Case_Type: ", case_type)
+        return case_type
+
+    @llm_method('identify_case_type')
+    async def aidentify_case_type(self, user_input):
+        """Async variant of identify_case_type."""
+        case_type = await sync_to_async(self._classify_case_type)(user_input)
+        if case_type:
+            return case_type
+
+        response = await self.aquery_ollama(self._case_type_messages(user_input))
+        return response.strip()
+
+    def _classify_case_type(self, user_input):
+        """Case type from the embedding classifier, or None when it is not confident."""
+        # The embedding classifier settles clear-cut descriptions without an LLM call
+        try:
+            case_type, similarity, margin = get_case_classifier(self.runtime, self.case_graphs).classify(user_input)
+        except (ImportError, OSError, RuntimeError, ValueError, DatabaseError):
+            # The embedding model or the examples could not be loaded; the LLM still answers
+            logger.exception("Case type classifier unavailable")
+            return None
+        logger.debug(f"Case type classifier: {case_type} (similarity {similarity:.3f}, margin {margin:.3f})")
+        if similarity >= settings.CASE_CLASSIFIER_MIN_SIMILARITY and margin >= settings.CASE_CLASSIFIER_MIN_MARGIN:
+            return case_type
+        return None
+
+    def _case_type_messages(self, user_input):
+        case_type_options = "\n".join(
+            f"        - {graph.case_type} ({graph.description})" if graph.description else f"        - {graph.case_type}"
+            for graph in self.case_graphs.values()
+        )
         prompt = f"""
         You are a legal assistant. Based on the following user information, identify the type of legal case they are dealing with:
 
-        - Legal Rights Inquiry (for general legal questions, rights information, labor law questions, legal advice)
-        - Lender Harassment
-        - Employer Exploitation
-        - Excessive Interest Rate
-        - Recruitment Agency Harassment 
+{case_type_options}
 
         Be concise and return only the case type as named above.
 
         Problem: {user_input}
         """
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages)
-        case_type = response.strip()
-        print("Case_Type: ", case_type)
-        return case_type
+        return [{"role": "user", "content": prompt}]
 
+    @llm_method('extract_factory_name')
     def extract_factory_name(self, history):
         """
         Extract the factory name from conversation history.
         
         Args:
-            history (list): List of message dictionaries
+            history (list or str): List of message dictionaries or bounded history text
             
         Returns:
             str: The extracted factory name
@@ -425,40 +389,155 @@ Return only the refined comprehensive query, nothing else.
             case_type (str): The type of case
             
         Returns:
-            tuple or None: (case_type, graph) or None if case type not found
+            tuple or None: (case_type, CaseGraph) or None if case type not found
         """
-        if case_type.lower() == "legal rights inquiry":
-            return self.load_case_graph(self.legal_rights_graph)
+        graph = self.case_graphs.get(case_type.strip().lower())
+        if graph is None:
+            return None
+        return graph.case_type, graph
+
+    @llm_method('summarize_conversation')
+    def summarize_conversation(self, summary, messages, model=DEFAULT_MODEL):
+        """
+        Fold new messages into the rolling conversation summary.
         
-        elif case_type.lower() == "lender harassment":
-            return self.load_case_graph(self.lender_harassment_graph)
+        Args:
+            summary (str): The current summary, may be empty
+            messages (list): Message dictionaries not yet covered by the summary
+            model (str): The model to use for the query
+            
+        Returns:
+            str: The updated summary
+        """
+        return self.query_ollama(self._summary_messages(summary, messages), model=model).strip()
+
+    def _summary_messages(self, summary, messages):
+        prompt = f"""
+You maintain a running summary of a conversation between a migrant worker and a legal assistant chatbot.
+
+Current summary:
+{summary or "(empty)"}
+
+New messages to add:
+{messages}
+
+Rewrite the summary so it also covers the new messages. Keep every concrete fact the user gave (names of factories, companies, agencies and people, places, dates, amounts, and what happened) and the questions the assistant already asked. Do not add anything that was not said.
+Return only the updated summary, nothing else.
+"""
+        return [{"role": "user", "content": prompt}]
+
+    def get_prompt_history(self, session, history):
+        """
+        Build the bounded history text used in prompts for this session.
         
-        elif case_type.lower() == "employer exploitation":
-            return self.load_case_graph(self.employer_exploitation_graph)
+        Older messages covered by session.conversation_summary are replaced by
+        the summary; the rest are passed verbatim, capped by
+        PROMPT_HISTORY_TOKEN_BUDGET. The summary is brought up to date after
+        the turn by start_history_summary.
         
-        elif case_type.lower() == "excessive interest rate":
-            return self.load_case_graph(self.excessive_interest_graph)
+        Args:
+            session (ChatSession): The chat session
+            history (list): List of message dictionaries
+            
+        Returns:
+            str: The history text for the prompt
+        """
+        older, recent = split_history(history, settings.PROMPT_HISTORY_RECENT_MESSAGES)
+        pending = older[session.summary_message_count:]
+        return format_prompt_history(
+            session.conversation_summary, pending + recent, settings.PROMPT_HISTORY_TOKEN_BUDGET
+        )
+
+    async def aget_prompt_history(self, session, history):
+        """Async variant of get_prompt_history."""
+        return self.get_prompt_history(session, history)
+
+    def start_history_summary(self, session, history):
+        """
+        Fold older messages into session.conversation_summary on a background thread.
         
-        elif case_type.lower() == "recruitment agency harassment":
-            return self.load_case_graph(self.agency_harassment_graph)
+        Nothing is started until PROMPT_HISTORY_SUMMARY_BATCH older messages are not
+        covered by the summary, or while a summary of the session is still running.
+        Prompts keep using those messages verbatim until the new summary is saved.
         
-        else:
+        Args:
+            session (ChatSession): The chat session
+            history (list): List of message dictionaries
+            
+        Returns:
+            threading.Thread: The summary thread, or None if none was started
+        """
+        older, _ = split_history(history, settings.PROMPT_HISTORY_RECENT_MESSAGES)
+        pending = older[session.summary_message_count:]
+        if session.id is None or len(pending) < settings.PROMPT_HISTORY_SUMMARY_BATCH:
             return None
-
-    def check_navigation_to_next_state(self, history, current_node, G, model="google/gemma-3n-e4b-it:free"):
+        
+        with _summary_lock:
+            running = _summary_threads.get(session.id)
+            if running is not None and running.is_alive():
+                return None
+            thread = threading.Thread(
+                target=self._summarize_in_background,
+                args=(session.id, session.case_type, session.conversation_summary,
+                      session.summary_message_count, pending, len(older)),
+                name="conversation-summary",
+                daemon=True,
+            )
+            _summary_threads[session.id] = thread
+            thread.start()
+        return thread
+
+    def _summarize_in_background(self, session_id, case_type, summary, summarized_count, pending, message_count):
+        scope = {
+            'chat_session_id': session_id,
+            'case_type': case_type,
+            'conversation_state': 'summarize_conversation',
+        }
+        try:
+            # Summaries give way to chat turns in the LLM scheduler
+            with usage_scope(scope), llm_priority(BACKGROUND):
+                summary = self.summarize_conversation(summary, pending)
+            # Skipped if another summary was saved in the meantime
+            ChatSession.objects.filter(id=session_id, summary_message_count=summarized_count).update(
+                conversation_summary=summary, summary_message_count=message_count, updated_at=timezone.now()
+            )
+        except Exception:
+            # The messages stay unsummarised and the next turn tries again
+            logger.exception(f"Conversation summary of session {session_id} failed")
+        finally:
+            with _summary_lock:
+                if _summary_threads.get(session_id) is threading.current_thread():
+                    del _summary_threads[session_id]
+            # The thread ends here, so its database connections would never be reused
+            connections.close_all()
+
+    @llm_method('check_navigation_to_next_state')
+    def check_navigation_to_next_state(self, history, current_node, G, model=DEFAULT_MODEL):
         """
         Check if the conversation should navigate to the next state.
         
         Args:
             history (list): List of message dictionaries
             current_node (str): The current node in the conversation graph
-            G (nx.DiGraph): The conversation graph
+            G (CaseGraph): The conversation graph
             model (str): The model to use for the query
             
         Returns:
             str: "Yes" or "No" indicating whether to navigate to the next state
         """
-        current_text = G.nodes[current_node]["text"]
+        messages = self._navigation_messages(history, current_node, G)
+        result = self.query_ollama(messages, model=model).strip()
+        return self._parse_navigation(result, history, current_node, G)
+
+    @llm_method('check_navigation_to_next_state')
+    async def acheck_navigation_to_next_state(self, history, current_node, G, model=DEFAULT_MODEL):
+        """Async variant of check_navigation_to_next_state."""
+        messages = self._navigation_messages(history, current_node, G)
+        result = (await self.aquery_ollama(messages, model=model)).strip()
+        return self._parse_navigation(result, history, current_node, G)
+
+    def _navigation_messages(self, history, current_node, G):
+        current_text = G.text(current_node)
 
         recent_user_msg = history[-1]['content'] if history else ''
         recent_bot_msg = next((msg["content"] for msg in reversed(history) if msg["role"] == "assistant"), "")
@@ -487,14 +566,10 @@ If the user's reply is off-topic, unclear, or doesn't address the current step,
 
 🔒 Only return 'Yes' or 'No'. Do not include explanations or anything else.
 """
+        return [{"role": "user", "content": prompt}]
 
-        messages = [{"role": "user", "content": prompt}]
-        completion = self.client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        result = completion.choices[0].message.content.strip()
-
+    def _parse_navigation(self, result, history, current_node, G):
+        current_text = G.text(current_node)
         print("Debug: check_navigation_to_next_state() raw response →", result)
 
         print(f"\n=== Checking navigation from [{current_node}] ===")
@@ -509,21 +584,22 @@ If the user's reply is off-topic, unclear, or doesn't address the current step,
         else:
             return "No"
 
-    def build_prompt(self, case_type, current_node, G, history, user_query):
+    def build_prompt(self, case_type, current_node, G, history, user_query, reply_language=None):
         """
         Build a prompt for the AI based on the current conversation state.
         
         Args:
             case_type (str): The type of case
             current_node (str): The current node in the conversation graph
-            G (nx.DiGraph): The conversation graph
-            history (list): List of message dictionaries
+            G (CaseGraph): The conversation graph
+            history (list or str): List of message dictionaries or bounded history text
             user_query (str): The user's latest message
+            reply_language (str): Write the response in this language instead of English
             
         Returns:
             str: The prompt for the AI
         """
-        current_info = G.nodes[current_node]["text"]
+        current_info = G.text(current_node)
         
         # If user_query is empty, this is for generating next step questions
         if not user_query.strip():
@@ -552,7 +628,115 @@ Acknowledge the user's input appropriately and professionally. If the informatio
 Don't repeat what the user said. Keep your response concise and move the conversation forward naturally.
 """
         
-        return prompt
+        return prompt + self.reply_language_instruction(reply_language)
+
+    def case_node_messages(self, case_type, current_node, G, prompt_history, user_query, reply_language=None):
+        """Messages asking for the reply at a case graph node; see build_prompt"""
+        prompt = self.build_prompt(case_type, current_node, G, prompt_history, user_query, reply_language)
+        return [{"role": "user", "content": prompt}]
+
+    def cohesive_transition_messages(self, current_node, next_node, G, prompt_history, user_query, reply_language=None):
+        """
+        Messages asking for one reply that acknowledges a completed step and asks for the next one.
+        
+        Args:
+            current_node (str): The node the user has just completed
+            next_node (str): The node to move to
+            G (CaseGraph): The conversation graph
+            prompt_history (str): Bounded history text for the prompt
+            user_query (str): The user's latest message
+            reply_language (str): Write the response in this language instead of English
+            
+        Returns:
+            list: Message dictionaries for query_ollama
+        """
+        prompt = f"""
+You are a helpful legal assistant chatbot. The user has provided information for the current step and you need to acknowledge it and smoothly transition to ask for the next required information.
+
+Current step that was completed: {G.text(current_node)}
+Next step requirements: {G.text(next_node)}
+
+Chat history: {prompt_history}
+User's latest message: {user_query}
+
+Create a single, cohesive response that:
+1. Acknowledges and thanks the user for the information they provided
+2. Smoothly transitions to ask for the next required information
+3. Maintains a professional and empathetic tone
+4. Flows naturally as one conversation turn
+
+Make the transition feel natural and connected, not like two separate responses.
+""" + self.reply_language_instruction(reply_language)
+        return [{"role": "user", "content": prompt}]
+
+    @llm_method('combined_case_turn')
+    def combined_case_turn(self, history, current_node, G, prompt_history, user_query, model=DEFAULT_MODEL, reply_language=None):
+        """
+        Decide navigation, write the reply and extract slot values in one structured call.
+
+        Args:
+            history (list): List of message dictionaries
+            current_node (str): The current node in the conversation graph
+            G (CaseGraph): The conversation graph
+            prompt_history (str): Bounded history text for the prompt
+            user_query (str): The user's latest message
+            model (str): The model to use for the query
+            reply_language (str): Write the reply in this language instead of English
+
+        Returns:
+            dict or None: {'advance', 'reply', 'slots'}, or None when the response is malformed
+        """
+        messages = self._combined_turn_messages(history, current_node, G, prompt_history, user_query, reply_language)
+        response = self.query_ollama(messages, model=model)
+        return parse_combined_turn(response, G.slots(current_node))
+
+    @llm_method('combined_case_turn')
+    async def acombined_case_turn(self, history, current_node, G, prompt_history, user_query, model=DEFAULT_MODEL, reply_language=None):
+        """Async variant of combined_case_turn."""
+        messages = self._combined_turn_messages(history, current_node, G, prompt_history, user_query, reply_language)
+        response = await self.aquery_ollama(messages, model=model)
+        return parse_combined_turn(response, G.slots(current_node))
+
+    def _combined_turn_messages(self, history, current_node, G, prompt_history, user_query, reply_language=None):
+        next_node = G.next_node(current_node)
+        recent_bot_msg = next((msg["content"] for msg in reversed(history) if msg["role"] == "assistant"), "")
+
+        # The report step asks nothing; its reply only acknowledges the last answer
+        if next_node and next_node != "generate_report":
+            advance_reply = f"acknowledge and thank the user for the information, then smoothly ask for the next step's information: {G.text(next_node)}"
+        else:
+            advance_reply = "acknowledge and thank the user for the information they provided"
+
+        slots = G.slots(current_node)
+        slot_lines = "\n".join(f'- "{name}": {description}' for name, description in slots.items())
+        slot_instructions = (
+            f"Extract these values from the user's messages if they were mentioned, in English, using null otherwise:\n{slot_lines}"
+            if slots else 'No values need to be extracted; return an empty "slots" object.'
+        )
+
+        prompt = f"""
+You are a helpful legal assistant chatbot and a conversation state evaluator at the same time.
+
+Current step requirements:
+{G.text(current_node)}
+
+Most recent bot message:
+{recent_bot_msg}
+
+Chat history: {prompt_history}
+User's latest message: {user_query}
+
+1. Decide "advance": true if the user's reply directly addresses the current step's requirements with relevant information (it may be incomplete), false if it is off-topic, unclear or does not address the current step.
+2. Write "reply", one cohesive conversation turn in a professional and empathetic tone:
+   - if advance is true, {advance_reply};
+   - if advance is false, acknowledge the user's input and politely ask for what the current step still needs.
+   Don't repeat what the user said and don't repeat questions that were already answered.{self.reply_language_instruction(reply_language, field='"reply"')}
+3. {slot_instructions}
+
+Return only a JSON object, with no other text:
+{{"advance": true or false, "reply": "...", "slots": {{...}}}}
+"""
+        return [{"role": "user", "content": prompt}]
 
 
     def search_buyer_company_from_factory(self, factory_name, match_type='both'):
@@ -562,55 +746,19 @@ Don't repeat what the user said. Keep your response concise and move the convers
         Args:
             factory_name (str): The name of the factory
             match_type (str): 'exact', 'partial', or 'both' (combines exact and partial)
-            similarity_threshold (float): Threshold for fuzzy matching (0.0 to 1.0)
             
         Returns:
             list: List of buyer company names
         """
         try:
-            supplier_df = pd.read_csv("./chatbot/data/Taiwan Supplier List.xlsx - Full List.csv")
-            supplier_df.columns = supplier_df.columns.str.strip()
-            
-            all_buyers = set()  # Use set to avoid duplicates
-            
-            if match_type == 'exact':
-                # Exact matching (case-insensitive) with punctuation normalization
-                normalized_factory = factory_name.lower().strip().rstrip('.')
-                matched = supplier_df[
-                    (supplier_df["Taiwan Company"].str.lower().str.strip().str.rstrip('.') == normalized_factory) |
-                    (supplier_df["Taiwan Company"].str.lower() == factory_name.lower())
-                ]
-                buyers = matched["Customer Company"].dropna().unique().tolist()
-                all_buyers.update(buyers)
-                
-            elif match_type == 'partial':
-                # Partial matching (contains)
-                matched = supplier_df[supplier_df["Taiwan Company"].str.contains(factory_name, case=False, na=False)]
-                buyers = matched["Customer Company"].dropna().unique().tolist()
-                all_buyers.update(buyers)
-                
-            elif match_type == 'both':
-                # Combine exact and partial matching
-                
-                # Exact matching with punctuation normalization
-                normalized_factory = factory_name.lower().strip().rstrip('.')
-                exact_matched = supplier_df[
-                    (supplier_df["Taiwan Company"].str.lower().str.strip().str.rstrip('.') == normalized_factory) |
-                    (supplier_df["Taiwan Company"].str.lower() == factory_name.lower())
-                ]
-                all_buyers.update(exact_matched["Customer Company"].dropna().unique().tolist())
-                
-                # Partial matching
-                partial_matched = supplier_df[supplier_df["Taiwan Company"].str.contains(factory_name, case=False, na=False)]
-                all_buyers.update(partial_matched["Customer Company"].dropna().unique().tolist())
-            
-            return list(all_buyers)
+            return get_supplier_index().search(factory_name, match_type=match_type)
             
         except Exception as e:
             print(f"Error searching buyer companies: {e}")
             return []
 
-    def extract_incident(self, chat_history, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('extract_incident')
+    def extract_incident(self, chat_history, model=DEFAULT_MODEL):
         prompt = f"""
 Extract a summary that includes the incidents that the user mentioned based on the given chat history.
 
@@ -620,118 +768,31 @@ Chat History: {str(chat_history)}
 
 """
         messages = [{"role": "user", "content": prompt}]
-        completion = self.client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        result = completion.choices[0].message.content.strip().lower()
+        result = self.query_ollama(messages, model=model).strip().lower()
         return result
 
 
-    def get_company_policy_report(self, company_name, incident_description, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('get_company_policy_report')
+    def get_company_policy_report(self, company_name, incident_description, model=DEFAULT_MODEL):
         """
         Enhanced version that matches violations to incidents with full reference details.
+        
+        Raises:
+            LLMUnavailable: The analysis request failed; left to the report job to retry
         """
-        try:
-            # Load the first policy CSV
-            policies_df = pd.read_csv("./chatbot/data/List of Company - Data List.xlsx - (1) 1000 Company List.csv")
-            policies_df.columns = policies_df.columns.str.strip()
-
-            # Load the additional policy CSV
-            extra_policy_df = pd.read_csv("./chatbot/data/Companies_Policies.csv")
-            extra_policy_df.columns = extra_policy_df.columns.str.strip()
-
-            # Match company name in both files
-            company_row = policies_df[policies_df["Name of Company"].str.lower() == company_name.lower()]
-            extra_row = extra_policy_df[extra_policy_df["Name of Company"].str.lower() == company_name.lower()]
-
-            if company_row.empty and extra_row.empty:
-                return json.dumps({
-                    "error": f"No policy information found for company: {company_name}"
-                })
-
-            # Extract policy text and build comprehensive policy mapping
-            policy_text = ""
-            policy_mapping = {}
-            
-            # Define policy fields with their corresponding reference columns
-            policy_fields = [
-                {
-                    "field": "Does the company prohibit recruitment fees to workers? Paste only relevant sentences.",
-                    "doc_name": "Name of Reference Document 1",
-                    "doc_link": "Reference Document Link",
-                    "category": "Recruitment Fees"
-                },
-                {
-                    "field": "Reference to fee repayment if workers are found to have paid (up to three sentences)",
-                    "doc_name": "Name of Reference Document 1",
-                    "doc_link": "If yes, provide link 1",
-                    "category": "Fee Repayment"
-                },
-                {
-                    "field": "Reference to Confiscation of travel/ identity document. If yes, mention up to three sentences.",
-                    "doc_name": "Name of Reference Document 2",
-                    "doc_link": "If yes, provide link 2",
-                    "category": "Document Confiscation"
-                }
-            ]
-
-            for policy_info in policy_fields:
-                if not company_row.empty:
-                    value = company_row.iloc[0].get(policy_info["field"])
-                    doc_name = company_row.iloc[0].get(policy_info["doc_name"])
-                    doc_link = company_row.iloc[0].get(policy_info["doc_link"])
-                    
-                    if pd.notna(value) and value.strip():
-                        # Add full policy content to text
-                        policy_text += f"[{policy_info['category']}] {policy_info['field']}: {value}\n\n"
-                        
-                        # Store comprehensive mapping
-                        policy_mapping[policy_info["category"]] = {
-                            "field_name": policy_info["field"],
-                            "policy_content": value.strip(),
-                            "document_name": doc_name.strip() if pd.notna(doc_name) else "Unknown Document",
-                            "document_url": doc_link.strip() if pd.notna(doc_link) else "No URL available"
-                        }
-
-            # Handle extra policy fields with their references
-            extra_fields = [
-                {"field": "Heat Stress", "reference": "Heat Stress Reference", "category": "Heat Stress"},
-                {"field": "Health Care", "reference": "Health Care Reference", "category": "Health Care"},
-                {"field": "Wages and OverTime", "reference": "Wages Reference", "category": "Wages and Overtime"}
-            ]
-            
-            for field_info in extra_fields:
-                if not extra_row.empty:
-                    value = extra_row.iloc[0].get(field_info["field"])
-                    reference = extra_row.iloc[0].get(field_info["reference"])
-                    
-                    if pd.notna(value) and value.strip():
-                        policy_text += f"[{field_info['category']}] {field_info['field']} Policy: {value}\n\n"
-                        
-                        # Parse reference to extract document name and page number
-                        doc_name = "Company Policy Document"
-                        doc_url = "Not available"
-                        
-                        if pd.notna(reference) and reference.strip():
-                            # Extract document name and page info from reference
-                            # Format appears to be: "document_name.pdf page no.:XX"
-                            ref_parts = reference.strip().split(" page no.:")
-                            if len(ref_parts) >= 1:
-                                doc_name = ref_parts[0].strip()
-                                if len(ref_parts) > 1:
-                                    doc_name += f" (Page {ref_parts[1].strip()})"
-                        
-                        policy_mapping[field_info["category"]] = {
-                            "field_name": f"{field_info['field']} Policy",
-                            "policy_content": value.strip(),
-                            "document_name": doc_name,
-                            "document_url": doc_url,
-                            "reference_info": reference.strip() if pd.notna(reference) else "No reference available"
-                        }
-
-            # Enhanced prompt for better incident-policy matching with violation consolidation
-            prompt = f"""
+        # Look up the precompiled policy record for this company
+        policy_record = get_policy_store().get(company_name)
+
+        if policy_record is None:
+            return json.dumps({
+                "error": f"No policy information found for company: {company_name}"
+            })
+
+        policy_text = policy_record["policy_text"]
+        policy_mapping = policy_record["policy_mapping"]
+
+        # Enhanced prompt for better incident-policy matching with violation consolidation
+        prompt = f"""
 You are a legal analyst assessing corporate compliance with labor policies.
 
 You will be given:
@@ -777,66 +838,96 @@ Company Policy Documents:
 {policy_text}
 """
 
-            # Query model
-            messages = [{"role": "user", "content": prompt}]
-            response = self.query_ollama(messages, model=model)
-
-            # Strip triple backticks or markdown formatting from model output
-            cleaned_response = re.sub(r"^```(?:json)?|```$", "", response.strip(), flags=re.MULTILINE).strip()
-
-            # Attempt to parse response into JSON
-            try:
-                parsed = json.loads(cleaned_response)
-                
-                # Enhance policy violations with full reference details
-                if "policy_violations" in parsed:
-                    for i, violation in enumerate(parsed["policy_violations"]):
-                        if isinstance(violation, dict) and "policy_category" in violation:
-                            category = violation["policy_category"]
-                            if category in policy_mapping:
-                                # Add comprehensive reference information
-                                ref_info = {
-                                    "policy_content": policy_mapping[category]["policy_content"],
-                                    "document_name": policy_mapping[category]["document_name"],
-                                    "document_url": policy_mapping[category]["document_url"],
-                                    "field_name": policy_mapping[category]["field_name"]
-                                }
-                                
-                                # Add reference info if available (for extra fields)
-                                if "reference_info" in policy_mapping[category]:
-                                    ref_info["reference_info"] = policy_mapping[category]["reference_info"]
-                                
-                                parsed["policy_violations"][i]["reference"] = ref_info
-                            else:
-                                # Try partial matching if exact category not found
-                                for mapped_category, mapping_info in policy_mapping.items():
-                                    if any(word.lower() in mapped_category.lower() for word in category.lower().split()):
-                                        parsed["policy_violations"][i]["reference"] = {
-                                            "policy_content": mapping_info["policy_content"],
-                                            "document_name": mapping_info["document_name"],
-                                            "document_url": mapping_info["document_url"],
-                                            "field_name": mapping_info["field_name"]
-                                        }
-                                        if "reference_info" in mapping_info:
-                                            parsed["policy_violations"][i]["reference"]["reference_info"] = mapping_info["reference_info"]
-                                        break
-                
-                return json.dumps(parsed, indent=2, ensure_ascii=False)
-                
-            except json.JSONDecodeError:
-                return json.dumps({
-                    "error": "Model did not return valid JSON.",
-                    "raw_response": response.strip(),
-                    "available_policies": policy_mapping
-                }, indent=2, ensure_ascii=False)
+        # Query model
+        messages = [{"role": "user", "content": prompt}]
+        response = self.query_ollama(messages, model=model)
 
-        except Exception as e:
+        # Strip triple backticks or markdown formatting from model output
+        cleaned_response = re.sub(r"^```(?:json)?|```$", "", response.strip(), flags=re.MULTILINE).strip()
+
+        # Attempt to parse response into JSON
+        try:
+            parsed = json.loads(cleaned_response)
+            # Valid JSON of the wrong shape gets the same fallback as invalid JSON
+            if not isinstance(parsed, dict) or not isinstance(parsed.get("policy_violations", []), list):
+                raise ValueError("Model did not return an object with a list of policy violations")
+            
+            # Enhance policy violations with full reference details
+            if "policy_violations" in parsed:
+                for i, violation in enumerate(parsed["policy_violations"]):
+                    if isinstance(violation, dict) and isinstance(violation.get("policy_category"), str):
+                        category = violation["policy_category"]
+                        if category in policy_mapping:
+                            # Add comprehensive reference information
+                            ref_info = {
+                                "policy_content": policy_mapping[category]["policy_content"],
+                                "document_name": policy_mapping[category]["document_name"],
+                                "document_url": policy_mapping[category]["document_url"],
+                                "field_name": policy_mapping[category]["field_name"]
+                            }
+                            
+                            # Add reference info if available (for extra fields)
+                            if "reference_info" in policy_mapping[category]:
+                                ref_info["reference_info"] = policy_mapping[category]["reference_info"]
+                            
+                            parsed["policy_violations"][i]["reference"] = ref_info
+                        else:
+                            # Try partial matching if exact category not found
+                            for mapped_category, mapping_info in policy_mapping.items():
+                                if any(word.lower() in mapped_category.lower() for word in category.lower().split()):
+                                    parsed["policy_violations"][i]["reference"] = {
+                                        "policy_content": mapping_info["policy_content"],
+                                        "document_name": mapping_info["document_name"],
+                                        "document_url": mapping_info["document_url"],
+                                        "field_name": mapping_info["field_name"]
+                                    }
+                                    if "reference_info" in mapping_info:
+                                        parsed["policy_violations"][i]["reference"]["reference_info"] = mapping_info["reference_info"]
+                                    break
+            
+            return json.dumps(parsed, indent=2, ensure_ascii=False)
+            
+        except ValueError:
             return json.dumps({
-                "error": f"Unable to generate policy report for {company_name}: {str(e)}"
+                "error": "Model did not return valid JSON.",
+                "raw_response": response.strip(),
+                "available_policies": policy_mapping
             }, indent=2, ensure_ascii=False)
 
+    def get_company_policy_reports(self, company_names, incident_description, model=DEFAULT_MODEL, max_concurrency=None):
+        """
+        Run get_company_policy_report for several buyer companies concurrently.
+        
+        Args:
+            company_names (list): Buyer company names
+            incident_description (str): The incident summary to analyse
+            model (str): The model to use for the analysis
+            max_concurrency (int): Maximum number of analyses in flight, defaults to REPORT_MAX_CONCURRENT_BUYERS
+            
+        Returns:
+            list: (company_name, result_json) tuples in the same order as company_names
+            
+        Raises:
+            LLMUnavailable: One of the analyses failed
+        """
+        if not company_names:
+            return []
+        
+        max_workers = min(len(company_names), max_concurrency or settings.REPORT_MAX_CONCURRENT_BUYERS)
+        # Each analysis runs in its own copy of the caller's context, so metrics and usage accounting follow it
+        contexts = [contextvars.copy_context() for _ in company_names]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="policy-report") as executor:
+            results = executor.map(
+                lambda context, company_name: context.run(
+                    self.get_company_policy_report, company_name, incident_description, model=model
+                ),
+                contexts, company_names
+            )
+            return list(zip(company_names, results))
+
 # New functions for language and location identification
-    def identify_language(self, user_message, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('identify_language')
+    def identify_language(self, user_message, model=DEFAULT_MODEL):
         """
         Identify the language used in the user's message.
         
@@ -847,6 +938,33 @@ Company Policy Documents:
         Returns:
             str: The identified language
         """
+        language = self._local_language(user_message)
+        if language:
+            return language
+        
+        response = self.query_ollama(self._language_messages(user_message), model=model)
+        print("Language: ", response)
+        return response.strip()
+
+    @llm_method('identify_language')
+    async def aidentify_language(self, user_message, model=DEFAULT_MODEL):
+        """Async variant of identify_language."""
+        language = self._local_language(user_message)
+        if language:
+            return language
+        
+        response = await self.aquery_ollama(self._language_messages(user_message), model=model)
+        return response.strip()
+
+    def _local_language(self, user_message):
+        # Script and n-gram detection settles most first messages without an LLM call
+        language, confidence = detect_language(user_message)
+        if language and confidence >= settings.LANGUAGE_ID_CONFIDENCE_THRESHOLD:
+            logger.debug(f"Language identified locally: {language} (confidence {confidence})")
+            return language
+        return None
+
+    def _language_messages(self, user_message):
         prompt = f"""
         You are a language identification agent. Based on the following user message, identify the language being used.
         Return only the language name in English (e.g., "English", "Spanish", "Chinese", etc.).If no Language is mentioned, return "None".
@@ -854,13 +972,16 @@ Company Policy Documents:
 
         User message: "{user_message}"
         """
-        
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
-        print("Language: ", response)
-        return response.strip()
+        return [{"role": "user", "content": prompt}]
 
-    def extract_location(self, user_message, model="google/gemma-3n-e4b-it:free"):
+    def _optional_result(self, label, response):
+        """Strip an extraction response, mapping "None" to None."""
+        result = response.strip()
+        logger.debug(f"{label}: {result}")
+        return None if result.lower() == "none" else result
+
+    @llm_method('extract_location')
+    def extract_location(self, user_message, model=DEFAULT_MODEL):
         """
         Extract location information from the user's message.
         
@@ -871,6 +992,16 @@ Company Policy Documents:
         Returns:
             str or None: The extracted location or None if no location found
         """
+        response = self.query_ollama(self._location_messages(user_message), model=model)
+        return self._optional_result("Location", response)
+
+    @llm_method('extract_location')
+    async def aextract_location(self, user_message, model=DEFAULT_MODEL):
+        """Async variant of extract_location."""
+        response = await self.aquery_ollama(self._location_messages(user_message), model=model)
+        return self._optional_result("Location", response)
+
+    def _location_messages(self, user_message):
         prompt = f"""
         You are a location extraction agent. Based on the following user message, extract any location information mentioned (country, city, region, etc.).
         Return only the location name. If no location is mentioned, return "None".
@@ -878,14 +1009,10 @@ Company Policy Documents:
 
         User message: "{user_message}"
         """
-        
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
-        result = response.strip()
-        print("Location: ", result)
-        return None if result.lower() == "none" else result
+        return [{"role": "user", "content": prompt}]
 
-    def extract_gender(self, user_message, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('extract_gender')
+    def extract_gender(self, user_message, model=DEFAULT_MODEL):
         """
         Extract gender information from the user's message.
         
@@ -896,6 +1023,16 @@ Company Policy Documents:
         Returns:
             str or None: The extracted gender or None if no gender found
         """
+        response = self.query_ollama(self._gender_messages(user_message), model=model)
+        return self._optional_result("Gender", response)
+
+    @llm_method('extract_gender')
+    async def aextract_gender(self, user_message, model=DEFAULT_MODEL):
+        """Async variant of extract_gender."""
+        response = await self.aquery_ollama(self._gender_messages(user_message), model=model)
+        return self._optional_result("Gender", response)
+
+    def _gender_messages(self, user_message):
         prompt = f"""
         You are a gender extraction agent. Based on the following user message, extract any gender information mentioned.
         Return only the gender (e.g., "Male", "Female", "Non-binary", etc.). If no gender is mentioned, return "None".
@@ -903,14 +1040,10 @@ Company Policy Documents:
 
         User message: "{user_message}"
         """
-        
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
-        result = response.strip()
-        print("Gender: ", result)
-        return None if result.lower() == "none" else result
+        return [{"role": "user", "content": prompt}]
 
-    def extract_nationality(self, user_message, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('extract_nationality')
+    def extract_nationality(self, user_message, model=DEFAULT_MODEL):
         """
         Extract nationality information from the user's message.
         
@@ -921,6 +1054,16 @@ Company Policy Documents:
         Returns:
             str or None: The extracted nationality or None if no nationality found
         """
+        response = self.query_ollama(self._nationality_messages(user_message), model=model)
+        return self._optional_result("Nationality", response)
+
+    @llm_method('extract_nationality')
+    async def aextract_nationality(self, user_message, model=DEFAULT_MODEL):
+        """Async variant of extract_nationality."""
+        response = await self.aquery_ollama(self._nationality_messages(user_message), model=model)
+        return self._optional_result("Nationality", response)
+
+    def _nationality_messages(self, user_message):
         prompt = f"""
         You are a nationality extraction agent. Based on the following user message, extract any nationality information mentioned.
         Return only the nationality name (e.g., "Indonesian", "Thai", "Vietnamese", etc.). If no nationality is mentioned, return "None".
@@ -928,15 +1071,11 @@ Company Policy Documents:
 
         User message: "{user_message}"
         """
-        
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
-        result = response.strip()
-        print("Nationality: ", result)
-        return None if result.lower() == "none" else result
+        return [{"role": "user", "content": prompt}]
 
 
-    def extract_industrial_sector(self, user_message, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('extract_industrial_sector')
+    def extract_industrial_sector(self, user_message, model=DEFAULT_MODEL):
         """
         Extract industrial sector information from the user's message.
         
@@ -947,6 +1086,16 @@ Company Policy Documents:
         Returns:
             str or None: The extracted industrial sector or None if no industrial sector found
         """
+        response = self.query_ollama(self._industrial_sector_messages(user_message), model=model)
+        return self._optional_result("Industrial Sector", response)
+
+    @llm_method('extract_industrial_sector')
+    async def aextract_industrial_sector(self, user_message, model=DEFAULT_MODEL):
+        """Async variant of extract_industrial_sector."""
+        response = await self.aquery_ollama(self._industrial_sector_messages(user_message), model=model)
+        return self._optional_result("Industrial Sector", response)
+
+    def _industrial_sector_messages(self, user_message):
         prompt = f"""
         You are an industrial sector extraction agent. Based on the following user message, extract any industrial sector or factory type information mentioned.
         Return only the industrial sector name (e.g., "Electronics", "Textiles", "Food Processing", "Automotive", etc.). If no industrial sector is mentioned, return "None".
@@ -954,15 +1103,11 @@ Company Policy Documents:
 
         User message: "{user_message}"
         """
-        
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
-        result = response.strip()
-        print("Industrial Sector: ", result)
-        return None if result.lower() == "none" else result
+        return [{"role": "user", "content": prompt}]
 
 
-    def translate_to_English(self, user_message, model="google/gemma-3n-e4b-it:free"):
+    @llm_method('translate_to_English')
+    def translate_to_English(self, user_message, model=DEFAULT_MODEL):
         """
         Translate the non-English user input to English sentence.
         
@@ -973,22 +1118,114 @@ Company Policy Documents:
         Returns:
             str or None: The translated sentence
         """
+        if self._is_confidently_english(user_message):
+            return user_message
+        
+        response = self.query_ollama(self._to_english_messages(user_message), model=model)
+        return response
+
+    @llm_method('translate_to_English')
+    async def atranslate_to_English(self, user_message, model=DEFAULT_MODEL):
+        """Async variant of translate_to_English."""
+        if self._is_confidently_english(user_message):
+            return user_message
+        return await self.aquery_ollama(self._to_english_messages(user_message), model=model)
+
+    def _is_confidently_english(self, user_message):
+        # Messages the local detector is confident are English need no translation
+        language, confidence = detect_language(user_message)
+        return language == ENGLISH and confidence >= settings.LANGUAGE_ID_CONFIDENCE_THRESHOLD
+
+    def _to_english_messages(self, user_message):
         prompt = f"Translate the following text to English: '{user_message}'. Keep the same punctuation as the orignial text. Return only the translated text, without any additional words, punctuation, or explanation."
+        return [{"role": "user", "content": prompt}]
+
+
+    def native_reply_language(self, language):
+        """
+        The language generated replies can be written in directly, skipping the translation call.
         
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
+        Args:
+            language (str): The session language
+            
+        Returns:
+            str or None: The language name, or None when replies are written in English and translated
+        """
+        if settings.REPLY_LANGUAGE_MODE != 'native' or not language:
+            return None
+        language = LANGUAGE_NAMES.get(language.strip().lower(), language.strip())
+        return language if language in settings.NATIVE_REPLY_LANGUAGES else None
+
+    def reply_language_instruction(self, reply_language, field='your response'):
+        """Prompt suffix asking for output in reply_language (empty for English output)"""
+        if not reply_language:
+            return ""
+        return f"\nWrite {field} in {reply_language} as a fluent native speaker, whatever language the instructions and chat history are in."
+
+    def is_reply_in_language(self, text, language):
+        """
+        Check that a reply written directly in the user's language came out in that language.
+        
+        Args:
+            text (str): The generated reply
+            language (str): The language it should be in
+            
+        Returns:
+            bool: True if the local identifier confidently recognises the language
+        """
+        detected, confidence = detect_language(text)
+        return detected == language and confidence >= settings.LANGUAGE_ID_CONFIDENCE_THRESHOLD
+
+    @llm_method('translation_from_English')
+    def translation_from_English(self, english_input, language, model=DEFAULT_MODEL, use_memory=True, on_token=None):
+        """
+        Translate an English bot response to the user's language.
+        
+        Args:
+            english_input (str): The English text
+            language (str): The target language
+            model (str): The model to use for the query
+            use_memory (bool): Look up and store the translation in the translation memory;
+                pass False for one-off generated text that will not repeat
+            on_token (callable): Receives the translation as it streams in; a stored
+                translation is passed in one piece
+            
+        Returns:
+            str: The translated text
+        """
+        memory = get_translation_memory() if use_memory else None
+        if memory:
+            cached = memory.lookup(english_input, language)
+            if cached is not None:
+                if on_token:
+                    on_token(cached)
+                return cached
+        
+        messages = self._from_english_messages(english_input, language)
+        response = self.query_ollama(messages, model=model, on_token=on_token)
+        if memory:
+            memory.store(english_input, language, response)
         return response
 
+    @llm_method('translation_from_English')
+    async def atranslation_from_English(self, english_input, language, model=DEFAULT_MODEL, use_memory=True):
+        """Async variant of translation_from_English."""
+        memory = get_translation_memory() if use_memory else None
+        if memory:
+            cached = await memory.alookup(english_input, language)
+            if cached is not None:
+                return cached
+        
+        response = await self.aquery_ollama(self._from_english_messages(english_input, language), model=model)
+        if memory:
+            await memory.astore(english_input, language, response)
+        return response
 
-    def translation_from_English(self, english_input, language, model="google/gemma-3n-e4b-it:free"):
+    def _from_english_messages(self, english_input, language):
         prompt = (
             f"Please translate the following English text to {language} as a fluent native speaker: '{english_input}'. "
             f"Ensure the translation captures the correct tone, meaning, and is idiomatically accurate. "
             f"Return only the translated text without any additional information, punctuation, or explanation."
             f"If the text provided is already in the target language, return it as it is without any further changes."
         )
-
-        messages = [{"role": "user", "content": prompt}]
-        response = self.query_ollama(messages, model=model)
-        return response
-
+        return [{"role": "user", "content": prompt}]
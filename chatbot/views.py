@@ -1,18 +1,38 @@
+import copy
 import json
+import logging
+import math
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib import messages
+from django.conf import settings
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 
-from .models import ChatSession, ChatMessage, BuyerCompany, PolicyViolation
+from .dashboard_stats import load_dashboard_stats
+from .forms import FilterForm, encode_cursor
+from .history_cache import get_history_cache
+from .llm_scheduler import LLMUnavailable
+from .llm_usage import usage_scope, usage_summary
+from .metrics import get_metrics_registry, get_trace_store
+from .models import ChatSession, ChatMessage, BuyerCompany, PolicyViolation, ReportJob
+from .pdf_generator import generate_session_pdf
+from .report_jobs import get_report_queue
+from .responses import BOT_RESPONSES
 from .session_manager import SessionManager
+from .streaming import EventStream
+from .translation_memory import get_translation_memory
 from .utils import UtilsManager
 import textwrap
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 
+logger = logging.getLogger(__name__)
+
 
 class BaseViewManager:
     """Base class for view managers"""
@@ -33,29 +53,66 @@ class PageViewManager(BaseViewManager):
     
     def dashboard(self, request):
         """Render the dashboard page with metrics"""
-        sessions = ChatSession.objects.all().order_by('-created_at')
-        
-        # Calculate metrics properly in Python
-        total_violations = sum(session.violations.count() for session in sessions)
-        total_incidents = 0
-        
-        for session in sessions:
-            for violation in session.violations.all():
-                incidents_list = violation.get_incidents_list()
-                total_incidents += len(incidents_list)
-        
-        # Calculate unique factories
-        unique_factories = sessions.values('factory_name').distinct().count()
+        # All metrics and charts come from the precomputed counters in a single query;
+        # the LLM usage tables aggregate the recent rows of the usage table
+        stats = load_dashboard_stats()
+        totals = stats['total']
         
         context = {
-            'sessions': sessions,
-            'total_violations': total_violations,
-            'total_incidents': total_incidents,
-            'unique_factories': unique_factories,
+            'total_sessions': totals.get('sessions', 0),
+            'total_violations': totals.get('violations', 0),
+            'total_incidents': totals.get('incidents', 0),
+            'unique_factories': len(stats['factory']),
+            'chart_data': {
+                'days': stats['day'],
+                'companies': stats['company'],
+                'company_violations': stats['company_violations'],
+                'industries': stats['industry'],
+                'categories': stats['category'],
+                'demographics': stats['demographic'],
+                'case_types': stats['case_type'],
+                'locations': len(stats['location']),
+            },
+            'filter_form': FilterForm(),
+            'llm_usage': usage_summary(),
         }
         
         return render(request, 'chatbot/dashboard.html', context)
     
+    def dashboard_sessions(self, request):
+        """Return one page of dashboard sessions as JSON, filtered with FilterForm"""
+        form = FilterForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'error': 'Invalid filters', 'errors': form.errors}, status=400)
+        
+        limit = form.cleaned_data.get('limit') or settings.DASHBOARD_PAGE_SIZE
+        # Fetch one extra row to learn whether another page follows
+        page = list(
+            form.filter_queryset(ChatSession.objects.all())
+            .annotate(violation_count=Count('violations'))
+            .prefetch_related('buyer_companies')[:limit + 1]
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+        
+        results = [{
+            'id': session.id,
+            'factory_name': session.factory_name,
+            'location': session.location,
+            'language': session.language,
+            'case_type': session.case_type,
+            'created_at': session.created_at.isoformat(),
+            'buyer_companies': [company.name for company in session.buyer_companies.all()],
+            'violation_count': session.violation_count,
+            'detail_url': reverse('session_detail', args=[session.id]),
+            'pdf_url': reverse('download_session_pdf', args=[session.id]),
+        } for session in page]
+        
+        return JsonResponse({
+            'results': results,
+            'next_cursor': encode_cursor(page[-1]) if has_more else None,
+        })
+    
     def session_detail(self, request, session_id):
         """Render the session detail page"""
         session = ChatSession.objects.get(id=session_id)
@@ -76,9 +133,11 @@ class ChatViewManager(BaseViewManager):
     def __init__(self):
         super().__init__()
         self.session_manager = SessionManager()
+        self.history_cache = get_history_cache()
+        self.report_queue = get_report_queue()
     
-    @csrf_exempt
-    @require_POST
+    @method_decorator(csrf_exempt)
+    @method_decorator(require_POST)
     def chat_message(self, request):
         """Handle incoming chat messages"""
         # Parse request data
@@ -86,12 +145,7 @@ class ChatViewManager(BaseViewManager):
         user_message = data.get('message', '')
         new_session = data.get('new_session', False)
         
-        print(f"User message: {user_message}")
-        print(f"Session ID: {request.session.get('chat_session_id')}")
-        print(f"New session: {new_session}")
-        
-        # Get or create session using session manager
-        session = self.session_manager.get_or_create_session(request, user_message, force_new=new_session)
+        session, turn = self.start_turn(request, user_message, new_session)
         
         # Handle session creation failure
         if not session:
@@ -99,10 +153,137 @@ class ChatViewManager(BaseViewManager):
                 'error': 'Failed to create or retrieve session. Please try again.'
             }, status=500)
         
-        # Save user message to the session
-        if user_message:
-            ChatMessage.objects.create(session=session, role='user', content=user_message)
+        return self.route_turn(request, session, user_message, new_session, turn)
+    
+    @method_decorator(csrf_exempt)
+    @method_decorator(require_POST)
+    def chat_stream(self, request):
+        """Handle incoming chat messages, streaming the reply as server-sent events"""
+        data = json.loads(request.body)
+        user_message = data.get('message', '')
+        new_session = data.get('new_session', False)
         
+        # Create the session up front so the session middleware sets its cookie on this response
+        session, turn = self.start_turn(request, user_message, new_session)
+        if not session:
+            return JsonResponse({
+                'error': 'Failed to create or retrieve session. Please try again.'
+            }, status=500)
+        
+        stream = EventStream()
+        request.chat_stream = stream.emit
+        
+        def work():
+            response = self.route_turn(request, session, user_message, new_session, turn)
+            # The session middleware has already run, so save state changes made during the turn here
+            request.session.save()
+            return json.loads(response.content)
+        
+        response = StreamingHttpResponse(stream.run(work), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def reply_listener(self, request, stage):
+        """
+        Token callback for a reply stage of a streamed turn.
+        
+        Args:
+            request: The current request
+            stage (str): 'generation' or 'translation'
+            
+        Returns:
+            callable or None: Emits 'token' events, or None when the turn is not streamed
+        """
+        emit = getattr(request, 'chat_stream', None)
+        if emit is None:
+            return None
+        return lambda text: emit('token', {'stage': stage, 'text': text})
+    
+    def reply_language(self, request, session):
+        """The language to generate replies in directly, or None to generate in English and translate"""
+        if request.session.get('reply_language_mode') == 'translate':
+            return None
+        return self.utils_manager.native_reply_language(session.language)
+    
+    def localize_reply(self, request, session, bot_response, reply_language):
+        """
+        Return a generated reply in the user's language.
+        
+        Args:
+            request: The current request
+            session (ChatSession): The chat session
+            bot_response (str): The generated reply
+            reply_language (str or None): The language it was asked to be written in, None for English
+            
+        Returns:
+            str: The reply, translated if it is not yet in the user's language
+        """
+        if reply_language:
+            if self.utils_manager.is_reply_in_language(bot_response, reply_language):
+                return bot_response
+            # Don't keep paying for replies that need translating anyway
+            logger.info(f"Reply not recognised as {reply_language}; translating replies for the rest of this session")
+            request.session['reply_language_mode'] = 'translate'
+        
+        # Translate response if language is not English
+        if session.language and session.language.lower() != 'english':
+            bot_response = self.utils_manager.translation_from_English(bot_response, session.language, use_memory=False, on_token=self.reply_listener(request, 'translation'))
+        return bot_response
+    
+    def start_turn(self, request, user_message, new_session):
+        """
+        Get or create the chat session of a turn and save the user message.
+        
+        Returns:
+            tuple: (ChatSession or None, the turn's starting point for discard_turn)
+        """
+        print(f"User message: {user_message}")
+        print(f"Session ID: {request.session.get('chat_session_id')}")
+        print(f"New session: {new_session}")
+        turn = {'session_state': copy.deepcopy(dict(request.session.items())), 'message': None}
+        
+        # Get or create session using session manager
+        session = self.session_manager.get_or_create_session(request, user_message, force_new=new_session)
+        
+        # Save user message to the session
+        if session and user_message:
+            turn['message'] = self.history_cache.append(session, 'user', user_message)
+        return session, turn
+    
+    def route_turn(self, request, session, user_message, new_session, turn):
+        """Route a turn to the handler of the current conversation state"""
+        # LLM usage of the turn is accounted to this session and its state at each call
+        with usage_scope(request.session):
+            try:
+                response = self.handle_turn(request, session, user_message, new_session)
+            except LLMUnavailable as e:
+                self.discard_turn(request, session, turn)
+                return self.llm_unavailable(session, e)
+        # Older messages are summarised once the turn is answered, so it never waits for the summary
+        self.utils_manager.start_history_summary(session, self.history_cache.get(session))
+        return response
+    
+    def discard_turn(self, request, session, turn):
+        """
+        Undo a turn the LLM could not answer, so that sending the message again starts it afresh.
+        
+        The turn's messages are deleted, or its chat session if the turn created it, and the
+        Django session is saved as it was before the turn, whether the response is streamed or not.
+        """
+        if session.id != turn['session_state'].get('chat_session_id'):
+            self.history_cache.invalidate(session.id)
+            session.delete()
+        elif turn['message'] is not None:
+            self.history_cache.discard_from(turn['message'])
+        request.session.clear()
+        request.session.update(turn['session_state'])
+        # The session middleware does not save sessions of 5xx responses
+        request.session.save()
+    
+    def handle_turn(self, request, session, user_message, new_session):
+        """Call the handler of the current conversation state"""
         # If this is a new session (just created), handle language detection
         if new_session or request.session.get('conversation_state') == 'language_detection':
             return self.handle_language_detection(request, session, user_message)
@@ -123,6 +304,17 @@ class ChatViewManager(BaseViewManager):
         else:
             # Fallback
             return self.handle_fallback(session, user_message)
+    
+    def llm_unavailable(self, session, error):
+        """Ask the user to send the message again when the LLM could not answer in time, instead of failing with a 500"""
+        logger.warning(f"LLM unavailable for session {session.id}: {error}")
+        bot_response = BOT_RESPONSES['LLM_BUSY']
+        if session.language and session.language.lower() != 'english':
+            # Only a stored translation will do: translating needs the LLM that just failed
+            bot_response = get_translation_memory().lookup(bot_response, session.language) or bot_response
+        response = JsonResponse({'message': bot_response, 'retry': True}, status=503)
+        response['Retry-After'] = str(math.ceil(error.retry_after or settings.LLM_RETRY_MAX_DELAY))
+        return response
 
     def handle_language_detection(self, request, session, user_message):
         """Handle language detection phase"""
@@ -147,18 +339,18 @@ class ChatViewManager(BaseViewManager):
             # Move to location detection
             request.session['conversation_state'] = 'location_detection'
             
-            bot_response = "Thank you! Kindly provide your current location (the country or region where you are currently situated)."
+            bot_response = BOT_RESPONSES['ASK_LOCATION']
             
             # Translate response if language is not English
             if detected_language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, detected_language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, detected_language, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         else:
             # Language detection failed, ask explicitly
-            bot_response = "Hello! I am PoBot. I couldn't detect your language. Please tell me which language you prefer to use: English, Bahasa Indonesia, Burmese, Vietnamese, or Thai?"
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            bot_response = BOT_RESPONSES['ASK_LANGUAGE']
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
 
     def handle_location_detection(self, request, session, user_message):
@@ -176,13 +368,13 @@ class ChatViewManager(BaseViewManager):
             print(f"Location already detected: {session.location}")
             # Move to gender and nationality detection
             request.session['conversation_state'] = 'gender_nationality_detection'
-            bot_response = f"Thank you for providing your location in {session.location}! Could you please tell me your gender and nationality?"
+            bot_response = BOT_RESPONSES['LOCATION_RECEIVED'].format(location=session.location)
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, use_memory=False, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         
         # Try to extract location
@@ -197,23 +389,23 @@ class ChatViewManager(BaseViewManager):
             # Move to gender and nationality detection
             request.session['conversation_state'] = 'gender_nationality_detection'
             
-            bot_response = f"Thank you for providing your location in {detected_location}! Could you please tell me your gender and nationality?"
+            bot_response = BOT_RESPONSES['LOCATION_RECEIVED'].format(location=detected_location)
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, use_memory=False, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         else:
             # Location extraction failed, ask again
-            bot_response = "I need to know your location to better assist you. Could you please tell me which country you are in? For example: Indonesia, Thailand, Vietnam, etc."
+            bot_response = BOT_RESPONSES['LOCATION_MISSING']
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
 
     def handle_gender_nationality_detection(self, request, session, user_message):
@@ -231,18 +423,20 @@ class ChatViewManager(BaseViewManager):
             print(f"Gender and nationality already detected: {session.gender}, {session.nationality}")
             # Move to case description
             request.session['conversation_state'] = 'case_description'
-            bot_response = f"Thank you for providing your gender ({session.gender}) and nationality ({session.nationality})! How can I help you?"
+            bot_response = BOT_RESPONSES['PROFILE_RECEIVED'].format(gender=session.gender, nationality=session.nationality)
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, use_memory=False, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         
-        # Try to extract gender and nationality
-        detected_gender = self.utils_manager.extract_gender(translated_message)
-        detected_nationality = self.utils_manager.extract_nationality(translated_message)
+        # Try to extract gender and nationality (independent calls, run together)
+        detected_gender, detected_nationality = self.utils_manager.run_concurrently(
+            lambda: self.utils_manager.extract_gender(translated_message),
+            lambda: self.utils_manager.extract_nationality(translated_message),
+        )
         print(f"Detected gender: {detected_gender}")
         print(f"Detected nationality: {detected_nationality}")
         
@@ -264,13 +458,13 @@ class ChatViewManager(BaseViewManager):
             # Move to case description
             request.session['conversation_state'] = 'case_description'
             
-            bot_response = f"Thank you for providing your gender ({session.gender}) and nationality ({session.nationality})! How can I help you?"
+            bot_response = BOT_RESPONSES['PROFILE_RECEIVED'].format(gender=session.gender, nationality=session.nationality)
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, use_memory=False, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         else:
             # Still missing some information, ask again
@@ -281,13 +475,13 @@ class ChatViewManager(BaseViewManager):
                 missing_info.append("nationality")
             
             missing_str = " and ".join(missing_info)
-            bot_response = f"Could you please tell me your {missing_str}?"
+            bot_response = BOT_RESPONSES['PROFILE_MISSING'].format(missing_str=missing_str)
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
 
     def handle_case_description(self, request, session, user_message):
@@ -315,13 +509,13 @@ class ChatViewManager(BaseViewManager):
         case_info = self.utils_manager.get_graph_for_case(detected_case_type)
         
         if not case_info:
-            bot_response = "I'm sorry, I couldn't identify the type of case you're describing. Could you provide more details about your situation?"
+            bot_response = BOT_RESPONSES['CASE_TYPE_UNKNOWN']
             
             # Translate response if language is not English
             if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                bot_response = self.utils_manager.translation_from_English(bot_response, session.language, on_token=self.reply_listener(request, 'translation'))
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         
         case_type, G = case_info
@@ -336,253 +530,240 @@ class ChatViewManager(BaseViewManager):
         request.session['conversation_state'] = 'case_handling'
         
         # Get message history
-        history = []
-        for msg in session.messages.all():
-            history.append({"role": msg.role, "content": msg.content})
+        history = self.history_cache.get(session)
+        prompt_history = self.utils_manager.get_prompt_history(session, history)
         
         # Generate response for start node
-        prompt = self.utils_manager.build_prompt(case_type, 'start', G, history, translated_message)
-        messages = [{"role": "user", "content": prompt}]
-        bot_response = self.utils_manager.query_ollama(messages)
-        
-        # Translate response if language is not English
-        if session.language and session.language.lower() != 'english':
-            bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+        reply_language = self.reply_language(request, session)
+        messages = self.utils_manager.case_node_messages(case_type, 'start', G, prompt_history, translated_message, reply_language)
+        bot_response = self.utils_manager.query_ollama(messages, on_token=self.reply_listener(request, 'generation'), call_site='build_prompt')
+        bot_response = self.localize_reply(request, session, bot_response, reply_language)
         
-        ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+        self.history_cache.append(session, 'assistant', bot_response)
         return JsonResponse({'message': bot_response})
 
-class PDFManager(BaseViewManager):
-    """Manager for PDF-related functionality"""
-    
-    def __init__(self):
-        super().__init__()
-    
-    def download_session_pdf(self, request, session_id):
-        """Download PDF report for a specific session"""
-        try:
-            # Generate PDF
-            pdf_response = self.utils_manager.generate_session_pdf(session_id)
-            
-            if pdf_response:
-                return pdf_response
-            else:
-                # Return error response
-                return JsonResponse({'error': 'Failed to generate PDF report'}, status=500)
-                
-        except Exception as e:
-            return JsonResponse({'error': f'Error generating PDF: {str(e)}'}, status=500)
-
-
-
-
+    def handle_case_conversation(self, request, session, user_message):
+        """Handle case conversation phase"""
+        print(f"Handling case conversation for message: {user_message}")
         
-        # Get message history
-        history = []
-        for msg in session.messages.all():
-            history.append({"role": msg.role, "content": msg.content})
+        case_type = request.session.get('case_type')
+        current_node = request.session.get('current_node', 'start')
+        is_legal_inquiry = bool(case_type and case_type.lower() == 'legal rights inquiry')
+        reply_language = self.reply_language(request, session)
         
-        # Extract industrial_sector if we're in the collect_basic_info node
+        # Translate user message to English if needed. Replies written in the user's language
+        # take the message as it is; the knowledge base search still needs English
+        translated_message = user_message
+        if session.language and session.language.lower() != 'english' and (is_legal_inquiry or not reply_language):
+            translated_message = self.utils_manager.translate_to_English(user_message)
+            print(f"Translated message: {translated_message}")
+        
+        # Legal rights inquiries are answered from the knowledge base instead of the case graph
+        if is_legal_inquiry:
+            return self.handle_legal_rights_inquiry(request, session, user_message, translated_message)
+        
+        case_info = self.utils_manager.get_graph_for_case(case_type) if case_type else None
+        if not case_info:
+            return self.handle_fallback(session, user_message)
+        
+        case_type, G = case_info
+        
+        # Get message history
+        history = self.history_cache.get(session)
+        prompt_history = self.utils_manager.get_prompt_history(session, history)
+        
+        # Combined mode decides navigation and writes the reply in one structured call
+        if settings.CASE_TURN_MODE == 'combined':
+            turn = self.utils_manager.combined_case_turn(history, current_node, G, prompt_history, translated_message, reply_language=reply_language)
+            if turn is not None:
+                return self.finish_combined_turn(request, session, turn, current_node, G, history, prompt_history, reply_language)
+            logger.warning("Combined turn response was malformed; falling back to separate calls")
+        
+        # Check if we should navigate to next state, extracting industrial_sector
+        # alongside it if we're in the collect_basic_info node
         if current_node == 'collect_basic_info':
-            industrial_sector = self.utils_manager.extract_industrial_sector(translated_message)
+            is_navigate, industrial_sector = self.utils_manager.run_concurrently(
+                lambda: self.utils_manager.check_navigation_to_next_state(history, current_node, G),
+                lambda: self.utils_manager.extract_industrial_sector(translated_message),
+            )
             if industrial_sector:
                 session.industrial_sector = industrial_sector
                 session.save()
                 print(f"Extracted industrial sector: {industrial_sector}")
-        
-        # Check if we should navigate to next state
-        is_navigate = self.utils_manager.check_navigation_to_next_state(history, current_node, G)
+        else:
+            is_navigate = self.utils_manager.check_navigation_to_next_state(history, current_node, G)
         
         # If navigation is approved, move to next node and create a cohesive response
         if is_navigate == "Yes":
-            next_steps = list(G.successors(current_node))
-            if next_steps:
-                next_node = next_steps[0]
+            next_node = G.next_node(current_node)
+            if next_node:
                 print(f"Moving from {current_node} to {next_node}")
                 request.session['current_node'] = next_node
                 
                 # Special handling for report generation
                 if next_node == "generate_report":
                     # Generate acknowledgment response for current node
-                    prompt = self.utils_manager.build_prompt(case_type, current_node, G, history, translated_message)
-                    messages = [{"role": "user", "content": prompt}]
-                    bot_response = self.utils_manager.query_ollama(messages)
-                    
-                    # Translate response if language is not English
-                    if session.language and session.language.lower() != 'english':
-                        bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+                    messages = self.utils_manager.case_node_messages(case_type, current_node, G, prompt_history, translated_message, reply_language)
+                    bot_response = self.utils_manager.query_ollama(messages, on_token=self.reply_listener(request, 'generation'), call_site='build_prompt')
+                    bot_response = self.localize_reply(request, session, bot_response, reply_language)
                     
-                    ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
-                    return self.handle_report_generation(request, session, history)
+                    self.history_cache.append(session, 'assistant', bot_response)
+                    return self.handle_report_generation(request, session, history, prompt_history, bot_response)
                 
                 # For other nodes, create a cohesive response that acknowledges and transitions
-                current_info = G.nodes[current_node]["text"]
-                next_info = G.nodes[next_node]["text"]
-                
-                # Build a cohesive prompt that combines acknowledgment and next question
-                cohesive_prompt = f"""
-You are a helpful legal assistant chatbot. The user has provided information for the current step and you need to acknowledge it and smoothly transition to ask for the next required information.
-
-Current step that was completed: {current_info}
-Next step requirements: {next_info}
-
-Chat history: {history}
-User's latest message: {translated_message}
-
-Create a single, cohesive response that:
-1. Acknowledges and thanks the user for the information they provided
-2. Smoothly transitions to ask for the next required information
-3. Maintains a professional and empathetic tone
-4. Flows naturally as one conversation turn
-
-Make the transition feel natural and connected, not like two separate responses.
-"""
-                messages = [{"role": "user", "content": cohesive_prompt}]
-                bot_response = self.utils_manager.query_ollama(messages)
+                messages = self.utils_manager.cohesive_transition_messages(
+                    current_node, next_node, G, prompt_history, translated_message, reply_language
+                )
+                bot_response = self.utils_manager.query_ollama(messages, on_token=self.reply_listener(request, 'generation'), call_site='cohesive_transition')
             else:
                 # No next steps, just acknowledge
-                prompt = self.utils_manager.build_prompt(case_type, current_node, G, history, translated_message)
-                messages = [{"role": "user", "content": prompt}]
-                bot_response = self.utils_manager.query_ollama(messages)
+                messages = self.utils_manager.case_node_messages(case_type, current_node, G, prompt_history, translated_message, reply_language)
+                bot_response = self.utils_manager.query_ollama(messages, on_token=self.reply_listener(request, 'generation'), call_site='build_prompt')
         else:
             # Stay on current node, just respond to user input
-            prompt = self.utils_manager.build_prompt(case_type, current_node, G, history, translated_message)
-            messages = [{"role": "user", "content": prompt}]
-            bot_response = self.utils_manager.query_ollama(messages)
+            messages = self.utils_manager.case_node_messages(case_type, current_node, G, prompt_history, translated_message, reply_language)
+            bot_response = self.utils_manager.query_ollama(messages, on_token=self.reply_listener(request, 'generation'), call_site='build_prompt')
         
-        # Translate response if language is not English
-        if session.language and session.language.lower() != 'english':
-            bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+        bot_response = self.localize_reply(request, session, bot_response, reply_language)
         
-        ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+        self.history_cache.append(session, 'assistant', bot_response)
         print("Chat history: ", history)
         return JsonResponse({'message': bot_response})
 
+    def finish_combined_turn(self, request, session, turn, current_node, G, history, prompt_history, reply_language=None):
+        """Apply a validated combined turn: slot values, navigation and the reply"""
+        if turn['slots']:
+            # Slot names are ChatSession fields declared on the node in case_graphs.json
+            for field, value in turn['slots'].items():
+                setattr(session, field, value)
+            session.save()
+            logger.debug(f"Extracted slots: {turn['slots']}")
+        
+        next_node = G.next_node(current_node) if turn['advance'] else None
+        if next_node:
+            logger.debug(f"Moving from {current_node} to {next_node}")
+            request.session['current_node'] = next_node
+        
+        bot_response = self.localize_reply(request, session, turn['reply'], reply_language)
+        
+        self.history_cache.append(session, 'assistant', bot_response)
+        if next_node == "generate_report":
+            return self.handle_report_generation(request, session, history, prompt_history, bot_response)
+        return JsonResponse({'message': bot_response})
+
     def handle_legal_rights_inquiry(self, request, session, user_message, translated_message):
         """Handle legal rights inquiry using RAG approach"""
         print(f"Handling legal rights inquiry for message: {translated_message}")
         
         current_node = request.session.get('current_node')
+        reply_language = self.reply_language(request, session)
         
         # Get message history for context
-        history = []
-        for msg in session.messages.all():
-            history.append({"role": msg.role, "content": msg.content})
+        history = self.history_cache.get(session)
+        prompt_history = self.utils_manager.get_prompt_history(session, history)
         
         if current_node == 'start':
             # Move to RAG response node
             request.session['current_node'] = 'rag_response'
             
             # Use the RAG approach to generate response
-            bot_response = self.utils_manager.respond_based_on_the_context_agent(translated_message, history)
-            
-            # Translate response if language is not English
-            if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
+            bot_response = self.utils_manager.respond_based_on_the_context_agent(translated_message, history, prompt_history=prompt_history, on_token=self.reply_listener(request, 'generation'), reply_language=reply_language)
+            bot_response = self.localize_reply(request, session, bot_response, reply_language)
             
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         
         elif current_node == 'rag_response':
             # Continue using RAG for follow-up questions
-            bot_response = self.utils_manager.respond_based_on_the_context_agent(translated_message, history)
+            bot_response = self.utils_manager.respond_based_on_the_context_agent(translated_message, history, prompt_history=prompt_history, on_token=self.reply_listener(request, 'generation'), reply_language=reply_language)
+            bot_response = self.localize_reply(request, session, bot_response, reply_language)
             
-            # Translate response if language is not English
-            if session.language and session.language.lower() != 'english':
-                bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
-            
-            ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+            self.history_cache.append(session, 'assistant', bot_response)
             return JsonResponse({'message': bot_response})
         
         else:
             # Fallback to regular handling
             return self.handle_fallback(session, user_message)
 
-    def handle_report_generation(self, request, session, history):
-        """Handle report generation"""
+    def handle_report_generation(self, request, session, history, prompt_history=None, bot_response=None):
+        """Enqueue report generation and answer right away with the job to poll"""
         print("Handling report generation")
         
-        # Extract factory name
-        factory_name = self.utils_manager.extract_factory_name(history)
-        session.factory_name = factory_name
-        session.save()
-        print("The factory name: ", factory_name)
-        
-        # Get buyer companies
-        buyer_companies = self.utils_manager.search_buyer_company_from_factory(factory_name)
-        print("The buyer companies: ", buyer_companies)
-        
-        # Save buyer companies
-        for buyer in buyer_companies:
-            BuyerCompany.objects.create(session=session, name=buyer)
-        
-        # Collect incident description
-        incident_description_chat = "\n".join(
-            [msg["content"] for msg in history if msg["role"] == "user"]
-        )
-        incident_description = self.utils_manager.extract_incident(incident_description_chat)
-        print("Incident summary: ", incident_description)
-        session.incident_description = incident_description
-        session.save()
+        # Factory extraction, buyer search and policy analyses run in a background worker
+        job = self.report_queue.enqueue(session, history, prompt_history)
         
-        # Generate reports
-        reports = []
-        for buyer in buyer_companies:
-            result_json = self.utils_manager.get_company_policy_report(buyer, incident_description)
-            reports.append(f"Policy Analysis for {buyer}:\n{result_json}")
-            
-            # Parse the JSON result
-            try:
-                result_data = json.loads(result_json)
-                
-                # Extract structured data
-                complaint_summary = result_data.get('complaint_summary', '')
-                incidents = result_data.get('incidents', [])
-                policy_violations = result_data.get('policy_violations', [])
-                
-                # Save violation with structured data
-                PolicyViolation.objects.create(
-                    session=session,
-                    buyer_company=buyer,
-                    violation_text=result_json,
-                    complaint_summary=complaint_summary,
-                    incidents=json.dumps(incidents),
-                    policy_violations=json.dumps(policy_violations)
-                )
-            except json.JSONDecodeError:
-                # Fallback for non-JSON responses
-                PolicyViolation.objects.create(
-                    session=session,
-                    buyer_company=buyer,
-                    violation_text=result_json
-                )
-        
-        # Combine reports
-        if reports:
-            bot_response = "\n\nThank you for sharing your case. We will analyze the policy violations and will follow-up with you very soon!!"
-        else:
-            bot_response = "I couldn't find any buyer companies associated with this factory. Please check the factory name or provide more details."
-        
-        # Translate response if language is not English
-        if session.language and session.language.lower() != 'english':
-            bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
-        
-        ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
-        return JsonResponse({'message': bot_response, 'complete': True})
+        return JsonResponse({
+            'message': bot_response,
+            'report_job': {
+                'id': str(job.id),
+                'status': job.status,
+                'status_url': reverse('report_status', args=[job.id]),
+            },
+        })
+
+    def report_status(self, request, job_id):
+        """Return the status of a report job of the current chat session"""
+        job = get_object_or_404(ReportJob, id=job_id, session_id=request.session.get('chat_session_id'))
+        finished = job.status in (ReportJob.SUCCEEDED, ReportJob.FAILED)
+        
+        return JsonResponse({
+            'status': job.status,
+            'message': job.result_message if finished else None,
+            'complete': job.status == ReportJob.SUCCEEDED,
+        })
 
     def handle_fallback(self, session, user_message):
         """Handle fallback responses"""
         print(f"Handling fallback for message: {user_message}")
         
-        bot_response = "I'm sorry, I'm having trouble understanding. Could you please provide more details about your situation?"
+        bot_response = BOT_RESPONSES['FALLBACK']
         
         # Translate response if language is not English
         if session.language and session.language.lower() != 'english':
             bot_response = self.utils_manager.translation_from_English(bot_response, session.language)
         
-        ChatMessage.objects.create(session=session, role='assistant', content=bot_response)
+        self.history_cache.append(session, 'assistant', bot_response)
         return JsonResponse({'message': bot_response})
 
+class PDFManager(BaseViewManager):
+    """Manager for PDF-related functionality"""
+    
+    def __init__(self):
+        super().__init__()
+    
+    def download_session_pdf(self, request, session_id):
+        """Download PDF report for a specific session"""
+        try:
+            # Generate PDF
+            pdf_response = generate_session_pdf(session_id)
+            
+            if pdf_response:
+                return pdf_response
+            else:
+                # Return error response
+                return JsonResponse({'error': 'Failed to generate PDF report'}, status=500)
+                
+        except Exception as e:
+            return JsonResponse({'error': f'Error generating PDF: {str(e)}'}, status=500)
+
+class MetricsViewManager(BaseViewManager):
+    """Manager for the request metrics endpoints, served to METRICS_ALLOWED_IPS only"""
+    
+    def is_allowed(self, request):
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    
+    def metrics(self, request):
+        """Serve the histograms in the Prometheus text format"""
+        if not self.is_allowed(request):
+            return HttpResponse(status=403)
+        return HttpResponse(get_metrics_registry().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    def session_trace(self, request, session_id):
+        """Return the recent request traces of a chat session"""
+        if not self.is_allowed(request):
+            return JsonResponse({'error': 'Forbidden'}, status=403)
+        return JsonResponse({'session_id': session_id, 'traces': get_trace_store().get(session_id)})
+
 class SessionViewManager(BaseViewManager):
     """Manager for session-related functionality"""
     
@@ -596,6 +777,7 @@ class SessionViewManager(BaseViewManager):
         if request.method == 'POST':
             session_info = f"Session {session.id} - {session.factory_name or 'Unknown Factory'}"
             session.delete()
+            get_history_cache().invalidate(session_id)
             messages.success(request, f"Successfully deleted {session_info}")
             return redirect('dashboard')
         
@@ -5,4 +5,4 @@
 python manage.py migrate --run-syncdb
 
 # Start the Django development server
-python manage.py runserver 0.0.0.0:8000 --noreload
+MODEL_RUNTIME_MODE=${MODEL_RUNTIME_MODE:-eager} python manage.py runserver 0.0.0.0:8000 --noreload
@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pobot_project.settings")
 
 application = get_asgi_application()
+
+# Load the embedding model before serving when MODEL_RUNTIME_MODE=eager
+from chatbot.runtime import warm_up_if_configured  # noqa: E402
+# Resume report jobs left by a previous process when REPORT_WORKER_MODE=thread
+from chatbot.report_jobs import start_report_workers_if_configured  # noqa: E402
+
+warm_up_if_configured()
+start_report_workers_if_configured()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "chatbot.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,6 +79,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Transactions take the write lock up front and wait for it, instead of failing with
+        # "database is locked" when background writers (report jobs, LLM usage) commit meanwhile
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
     }
 }
 
@@ -126,3 +131,115 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# LLM client (OpenRouter, OpenAI-compatible API). Point the base URL at 'manage.py run_mock_llm'
+# to run benchmarks and load tests offline
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_MAX_CONCURRENT_CALLS = int(os.getenv("LLM_MAX_CONCURRENT_CALLS", "8"))
+
+# Maximum number of per-buyer policy analyses run at the same time during report generation
+REPORT_MAX_CONCURRENT_BUYERS = int(os.getenv("REPORT_MAX_CONCURRENT_BUYERS", "5"))
+
+# Embedding model / vector store loading: "lazy" loads on first use, "eager" warms up at startup
+MODEL_RUNTIME_MODE = os.getenv("MODEL_RUNTIME_MODE", "lazy")
+
+# Prompt history: the last N messages are sent verbatim, older ones are folded into a
+# rolling summary in batches, and the whole history is capped at a token budget
+PROMPT_HISTORY_RECENT_MESSAGES = int(os.getenv("PROMPT_HISTORY_RECENT_MESSAGES", "6"))
+PROMPT_HISTORY_SUMMARY_BATCH = int(os.getenv("PROMPT_HISTORY_SUMMARY_BATCH", "6"))
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Number of translations kept in the in-process tier of the translation memory
+TRANSLATION_MEMORY_LRU_SIZE = int(os.getenv("TRANSLATION_MEMORY_LRU_SIZE", "2048"))
+
+# Minimum confidence for the local language identifier; below it the LLM decides
+LANGUAGE_ID_CONFIDENCE_THRESHOLD = float(os.getenv("LANGUAGE_ID_CONFIDENCE_THRESHOLD", "0.85"))
+
+# Embedding case type classifier: predictions below either threshold go to the LLM.
+# Centroids include up to CASE_CLASSIFIER_EXAMPLES_PER_TYPE staff-confirmed examples per type
+# and are recomputed in the background every CASE_CLASSIFIER_REFRESH_SECONDS
+CASE_CLASSIFIER_MIN_SIMILARITY = float(os.getenv("CASE_CLASSIFIER_MIN_SIMILARITY", "0.35"))
+CASE_CLASSIFIER_MIN_MARGIN = float(os.getenv("CASE_CLASSIFIER_MIN_MARGIN", "0.05"))
+CASE_CLASSIFIER_EXAMPLES_PER_TYPE = int(os.getenv("CASE_CLASSIFIER_EXAMPLES_PER_TYPE", "50"))
+CASE_CLASSIFIER_REFRESH_SECONDS = int(os.getenv("CASE_CLASSIFIER_REFRESH_SECONDS", "3600"))
+
+# Number of sessions per page of the dashboard sessions table (at most 100)
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "25"))
+
+# Cache backend. Conversation histories are cached here, so every process that writes chat
+# messages (all web workers, and report workers with REPORT_WORKER_MODE=external) must share it,
+# e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379. The default local-memory cache suits a single process
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Seconds a conversation history stays in the cache before it is loaded from the database again
+HISTORY_CACHE_TIMEOUT = int(os.getenv("HISTORY_CACHE_TIMEOUT", "3600"))
+
+# Background report generation. "thread" runs REPORT_WORKER_THREADS workers inside the web
+# process; "external" leaves the jobs to 'manage.py run_report_worker' processes
+REPORT_WORKER_MODE = os.getenv("REPORT_WORKER_MODE", "thread")
+REPORT_WORKER_THREADS = int(os.getenv("REPORT_WORKER_THREADS", "2"))
+REPORT_WORKER_POLL_INTERVAL = float(os.getenv("REPORT_WORKER_POLL_INTERVAL", "2"))
+# Attempts per job, seconds a worker may hold a job before it is retried elsewhere,
+# and the first retry delay in seconds (doubled on every further attempt)
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+REPORT_JOB_LEASE_SECONDS = int(os.getenv("REPORT_JOB_LEASE_SECONDS", "600"))
+REPORT_JOB_RETRY_DELAY = int(os.getenv("REPORT_JOB_RETRY_DELAY", "30"))
+
+# Chat message pipeline: "sync" (WSGI, one thread per request) or "async" (ASGI, async ORM
+# and non-blocking LLM calls)
+CHAT_VIEW_MODE = os.getenv("CHAT_VIEW_MODE", "sync")
+
+# Case-handling turns: "two_call" checks navigation and writes the reply in separate LLM calls;
+# "combined" does both (plus slot extraction) in one structured-JSON call and falls back to
+# the two calls when the JSON is malformed
+CASE_TURN_MODE = os.getenv("CASE_TURN_MODE", "two_call")
+
+# Generated replies: "translate" writes them in English and translates them into the user's
+# language; "native" writes them directly in the user's language for the languages in
+# NATIVE_REPLY_LANGUAGES (ones the local language identifier can verify). A session whose
+# reply fails that check goes back to translating
+REPLY_LANGUAGE_MODE = os.getenv("REPLY_LANGUAGE_MODE", "translate")
+NATIVE_REPLY_LANGUAGES = [
+    language.strip()
+    for language in os.getenv("NATIVE_REPLY_LANGUAGES", "Bahasa Indonesia,Vietnamese,Thai").split(",")
+    if language.strip()
+]
+
+# Request metrics: /metrics/ and /session/<id>/trace/ answer only these client addresses.
+# The last METRICS_TRACES_PER_SESSION request traces of up to METRICS_TRACE_SESSIONS chat
+# sessions are kept in memory
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()]
+METRICS_TRACES_PER_SESSION = int(os.getenv("METRICS_TRACES_PER_SESSION", "20"))
+METRICS_TRACE_SESSIONS = int(os.getenv("METRICS_TRACE_SESSIONS", "500"))
+
+# LLM token usage accounting: rows are written in batches of up to LLM_USAGE_BATCH_SIZE, at
+# least every LLM_USAGE_FLUSH_INTERVAL seconds; the dashboard sums the last
+# LLM_USAGE_DASHBOARD_DAYS days
+LLM_USAGE_BATCH_SIZE = int(os.getenv("LLM_USAGE_BATCH_SIZE", "200"))
+LLM_USAGE_FLUSH_INTERVAL = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "5"))
+LLM_USAGE_DASHBOARD_DAYS = int(os.getenv("LLM_USAGE_DASHBOARD_DAYS", "30"))
+
+# LLM request scheduling, per process. Requests are admitted at LLM_REQUESTS_PER_MINUTE (0 for
+# no limit; OpenRouter's free models allow 20) in bursts of up to LLM_REQUEST_BURST, and report
+# analysis leaves LLM_INTERACTIVE_RESERVE of the burst to chat turns. Failed requests are tried
+# up to LLM_MAX_ATTEMPTS times with jittered backoff from LLM_RETRY_BASE_DELAY doubling up to
+# LLM_RETRY_MAX_DELAY seconds, and given up after LLM_INTERACTIVE_DEADLINE seconds for chat
+# turns and LLM_BACKGROUND_DEADLINE seconds for report analysis, waiting time included
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "20"))
+LLM_REQUEST_BURST = int(os.getenv("LLM_REQUEST_BURST", "10"))
+LLM_INTERACTIVE_RESERVE = int(os.getenv("LLM_INTERACTIVE_RESERVE", "3"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_INTERACTIVE_DEADLINE = float(os.getenv("LLM_INTERACTIVE_DEADLINE", "45"))
+LLM_BACKGROUND_DEADLINE = float(os.getenv("LLM_BACKGROUND_DEADLINE", "300"))
@@ -4,6 +4,11 @@ $(document).ready(function() {
     // Check if this is a new browser session (cleared on browser refresh/close)
     let startNewSession = !sessionStorage.getItem('chatSessionActive');
     
+    // Milliseconds between report status checks
+    const reportPollInterval = 2000;
+    // Consecutive failed status requests before polling gives up
+    const reportPollMaxErrors = 10;
+    
     // Mark session as active
     if (startNewSession) {
         sessionStorage.setItem('chatSessionActive', 'true');
@@ -28,44 +33,197 @@ $(document).ready(function() {
             // Show typing indicator
             showTypingIndicator();
             
-            // Send message to server
-            $.ajax({
-                url: chatMessageUrl,
-                type: 'POST',
-                contentType: 'application/json',
-                data: JSON.stringify({ 
-                    message: userInput,
-                    new_session: startNewSession
-                }),
-                success: function(response) {
-                    // Hide typing indicator
+            // Send message to server, streaming the reply where the browser supports it
+            const payload = JSON.stringify({ 
+                message: userInput,
+                new_session: startNewSession
+            });
+            if (window.fetch && window.ReadableStream && window.TextDecoder) {
+                streamMessage(payload);
+            } else {
+                sendMessage(payload);
+            }
+        }
+    });
+    
+    // Function to send a message and wait for the complete reply
+    function sendMessage(payload) {
+        $.ajax({
+            url: chatMessageUrl,
+            type: 'POST',
+            contentType: 'application/json',
+            data: payload,
+            success: function(response) {
+                handleChatResponse(response, null);
+            },
+            error: function(xhr) {
+                // The LLM was too busy to answer: show the server's message asking to send again
+                if (xhr.status === 503 && xhr.responseJSON && xhr.responseJSON.message) {
                     hideTypingIndicator();
+                    addBotMessage(xhr.responseJSON.message);
+                } else {
+                    showRequestError();
+                }
+            }
+        });
+    }
+    
+    // Function to send a message and render the reply as server-sent events arrive
+    function streamMessage(payload) {
+        let streamedMessage = null;
+        let stage = null;
+        let text = '';
+        
+        function handleEvent(block) {
+            let eventName = 'message';
+            let data = '';
+            block.split('\n').forEach(function(line) {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (!data) {
+                return;
+            }
+            const eventData = JSON.parse(data);
+            
+            if (eventName === 'token') {
+                // A translated reply replaces the English draft streamed before it
+                if (eventData.stage !== stage) {
+                    stage = eventData.stage;
+                    text = '';
+                }
+                text += eventData.text;
+                if (!streamedMessage) {
+                    hideTypingIndicator();
+                    streamedMessage = addBotMessage('');
+                }
+                streamedMessage.find('.message-content').text(text);
+                scrollToBottom();
+            } else if (eventName === 'done') {
+                handleChatResponse(eventData, streamedMessage);
+            } else if (eventName === 'error') {
+                if (streamedMessage) {
+                    streamedMessage.remove();
+                }
+                showRequestError();
+            }
+        }
+        
+        fetch(chatStreamUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'same-origin',
+            body: payload
+        }).then(function(response) {
+            if (!response.ok || !response.body) {
+                throw new Error('Streaming request failed');
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function read() {
+                return reader.read().then(function(result) {
+                    if (result.done) {
+                        return;
+                    }
+                    buffer += decoder.decode(result.value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        handleEvent(buffer.slice(0, boundary));
+                        buffer = buffer.slice(boundary + 2);
+                    }
+                    return read();
+                });
+            }
+            return read();
+        }).catch(function() {
+            if (streamedMessage) {
+                streamedMessage.remove();
+            }
+            showRequestError();
+        });
+    }
+    
+    // Function to show a finished reply, in the streamed message element if there is one
+    function handleChatResponse(response, messageDiv) {
+        // Hide typing indicator
+        hideTypingIndicator();
+        
+        // Add bot response to chat
+        if (messageDiv) {
+            messageDiv.find('.message-content').html(response.message);
+            scrollToBottom();
+        } else {
+            addBotMessage(response.message);
+        }
+        
+        // After first message, ensure subsequent messages don't create new sessions
+        startNewSession = false;
+        
+        // The report is generated in the background; poll until it has finished
+        if (response.report_job) {
+            showTypingIndicator();
+            pollReportStatus(response.report_job.status_url);
+        }
+        
+        // If conversation is complete, redirect to dashboard
+        if (response.complete) {
+            redirectToDashboard();
+        }
+    }
+    
+    // Function to report a failed request
+    function showRequestError() {
+        // Hide typing indicator
+        hideTypingIndicator();
+        
+        addBotMessage("Sorry, there was an error processing your request. Please try again.");
+    }
+    
+    // Function to poll a background report job until it has finished
+    function pollReportStatus(statusUrl, errors = 0) {
+        setTimeout(function() {
+            $.ajax({
+                url: statusUrl,
+                type: 'GET',
+                success: function(status) {
+                    if (status.status === 'pending' || status.status === 'running') {
+                        pollReportStatus(statusUrl);
+                        return;
+                    }
                     
-                    // Add bot response to chat
-                    addBotMessage(response.message);
-                    
-                    // After first message, ensure subsequent messages don't create new sessions
-                    startNewSession = false;
-                    
-                    // If conversation is complete, redirect to dashboard
-                    if (response.complete) {
-                        setTimeout(function() {
-                            addBotMessage("Redirecting to dashboard...");
-                            setTimeout(function() {
-                                window.location.href = dashboardUrl;
-                            }, 2000);
-                        }, 1000);
+                    hideTypingIndicator();
+                    addBotMessage(status.message);
+                    if (status.complete) {
+                        redirectToDashboard();
                     }
                 },
-                error: function() {
-                    // Hide typing indicator
-                    hideTypingIndicator();
-                    
-                    addBotMessage("Sorry, there was an error processing your request. Please try again.");
+                error: function(xhr) {
+                    // A 4xx will not change (e.g. the chat session was cleared); stop polling
+                    if ((xhr.status >= 400 && xhr.status < 500) || errors + 1 >= reportPollMaxErrors) {
+                        showRequestError();
+                        return;
+                    }
+                    // Keep polling through transient errors; the job itself is unaffected
+                    pollReportStatus(statusUrl, errors + 1);
                 }
             });
-        }
-    });
+        }, reportPollInterval);
+    }
+    
+    // Function to announce and perform the redirect to the dashboard
+    function redirectToDashboard() {
+        setTimeout(function() {
+            addBotMessage("Redirecting to dashboard...");
+            setTimeout(function() {
+                window.location.href = dashboardUrl;
+            }, 2000);
+        }, 1000);
+    }
     
     // Function to add user message to chat
     function addUserMessage(message) {
@@ -103,6 +261,7 @@ $(document).ready(function() {
         `);
         $('#messages').append(messageDiv);
         scrollToBottom();
+        return messageDiv;
     }
     
     // Function to show typing indicator